@@ -0,0 +1,313 @@
+"""
+非同期I/Oのクライアント
+DMM API・WordPress REST API・詳細ページの取得をasyncioで行う。接続はトランスポートごとに
+共有するコネクションプールを使い、ホストごとに同時リクエスト数を制限する。
+
+aiohttpがインストールされていればそれを使い、なければrequestsのセッション（接続プール）を
+専用のスレッドプールで実行する。同期版のDMMClient・WordPressClientはそのまま残しているので、
+GUIなど同期の呼び出し元は変わらない。
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrency import budget
+from dmm_client import DMMClient, MEDIA_HEADERS
+from media_buffer import MediaBuffer, SPOOL_THRESHOLD
+from wp_client import WordPressClient
+import metrics_exporter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# ホストごとの同時リクエスト数と、トランスポート全体の接続数
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_TOTAL_LIMIT = 16
+
+# ストリーミングで受信するときのチャンクサイズ
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class AsyncResponse:
+    """非同期リクエストのレスポンス（requests.Responseと同じ使い方ができる部分だけ）"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes, url: str,
+                 method: str, encoding: Optional[str] = None, elapsed: float = 0.0):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.method = method
+        self.encoding = encoding
+        self.elapsed = elapsed
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error: {self.url}", response=self)
+
+
+class AsyncTransport:
+    """接続プールとホストごとの同時実行数の制限を共有する非同期HTTPトランスポート
+
+    1回の実行（イベントループ）ごとに作成し、終了時にcloseする。
+    """
+
+    def __init__(self, per_host_limit: int = DEFAULT_PER_HOST_LIMIT, total_limit: int = DEFAULT_TOTAL_LIMIT,
+                 host_limits: Optional[Dict[str, int]] = None):
+        self.per_host_limit = max(1, per_host_limit)
+        self.total_limit = max(self.per_host_limit, total_limit)
+        self.host_limits = dict(host_limits or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session = None
+        self._requests_session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def backend(self) -> str:
+        return "aiohttp" if aiohttp is not None else "requests"
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.host_limits.get(host, self.per_host_limit))
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def request(self, method: str, url: str, *, params: Optional[Dict[str, Any]] = None,
+                      headers: Optional[Dict[str, str]] = None, json_body: Any = None, data: Any = None,
+                      timeout: float = 30, sink: Optional[MediaBuffer] = None) -> AsyncResponse:
+        """リクエストを送信（sinkを渡すと本文をそこへストリーミングで書き込み、contentは空になる）"""
+        async with self._semaphore(urlsplit(url).netloc):
+            started = time.perf_counter()
+            if aiohttp is not None:
+                response = await self._aiohttp_request(method, url, params, headers, json_body, data, timeout, sink)
+            else:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(self._get_executor(), partial(
+                    self._requests_request, method, url, params, headers, json_body, data, timeout, sink))
+            response.elapsed = time.perf_counter() - started
+            return response
+
+    async def _aiohttp_request(self, method, url, params, headers, json_body, data, timeout, sink) -> AsyncResponse:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.total_limit, limit_per_host=self.per_host_limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if data is not None and hasattr(data, "iter_chunks"):
+            # MediaBufferは全体をメモリに載せずにチャンクごとに送信する
+            chunks = data.rewind().iter_chunks()
+
+            async def body():
+                for chunk in chunks:
+                    yield chunk
+            data = body()
+        try:
+            async with self._session.request(method, url, params=params, headers=headers, json=json_body, data=data,
+                                             timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if sink is not None:
+                    async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        sink.write(chunk)
+                    content = b""
+                else:
+                    content = await resp.read()
+                return AsyncResponse(resp.status, dict(resp.headers), content, str(resp.url), method, resp.charset)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"タイムアウト: {url}") from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(f"{e}: {url}") from e
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._requests_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.total_limit, pool_maxsize=self.per_host_limit)
+            self._requests_session.mount("http://", adapter)
+            self._requests_session.mount("https://", adapter)
+            self._executor = ThreadPoolExecutor(max_workers=self.total_limit, thread_name_prefix="async-http")
+        return self._executor
+
+    def _requests_request(self, method, url, params, headers, json_body, data, timeout, sink) -> AsyncResponse:
+        if data is not None and hasattr(data, "seek"):
+            data.seek(0)
+        res = self._requests_session.request(method, url, params=params, headers=headers, json=json_body, data=data,
+                                             timeout=timeout, stream=sink is not None)
+        try:
+            if sink is not None:
+                for chunk in res.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if chunk:
+                        sink.write(chunk)
+                content = b""
+            else:
+                content = res.content
+            return AsyncResponse(res.status_code, dict(res.headers), content, res.url, method, res.encoding)
+        finally:
+            res.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._requests_session is not None:
+            self._requests_session.close()
+            self._requests_session = None
+
+    async def __aenter__(self) -> "AsyncTransport":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncDMMClient:
+    """DMMClientの非同期版（設定・レスポンスの検証は同期版と共通）"""
+
+    def __init__(self, dmm: DMMClient, transport: AsyncTransport):
+        self.dmm = dmm
+        self.transport = transport
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """APIリクエストを実行（リトライ機能付き）"""
+        url = f"{self.dmm.base}/{path}"
+        last_exception = None
+        for attempt in range(self.dmm.max_retries):
+            try:
+                # プロセス全体で共有するレート制限（同期版のリクエストとも合算）
+                await asyncio.sleep(budget.dmm_rate.reserve())
+                try:
+                    res = await self.transport.request("GET", url, params=params, timeout=self.dmm.timeout)
+                except requests.exceptions.RequestException:
+                    metrics_exporter.dmm_requests.inc(path, "error")
+                    raise
+                metrics_exporter.dmm_request_seconds.observe(res.elapsed, path)
+                metrics_exporter.dmm_requests.inc(path, "ok" if res.status_code == 200 else str(res.status_code))
+                return self.dmm._check_response(path, res)
+            except Exception as e:
+                last_exception = e
+                print(f"非同期APIリクエストエラー (試行 {attempt + 1}/{self.dmm.max_retries}): {e}")
+                if attempt < self.dmm.max_retries - 1:
+                    await asyncio.sleep(self.dmm.retry_delay * (attempt + 1))
+        raise Exception(f"APIリクエストが失敗しました: {path} - エラー: {last_exception}")
+
+    async def item_list(self, **kwargs) -> Dict[str, Any]:
+        """DMMClient.item_listと同じ引数でアイテムを検索"""
+        return await self._get("ItemList", self.dmm.item_list_params(**kwargs))
+
+    async def download_media_stream(self, url: str, headers: Optional[Dict[str, str]] = None, max_retries: int = 3,
+                                    spool_threshold: int = SPOOL_THRESHOLD) -> Optional[MediaBuffer]:
+        """メディアファイルをMediaBufferにダウンロード（大きいものは一時ファイルに書き出す）"""
+        request_headers = dict(MEDIA_HEADERS)
+        if headers:
+            request_headers.update(headers)
+        for attempt in range(max_retries):
+            media = MediaBuffer(spool_threshold)
+            try:
+                res = await self.transport.request("GET", url, headers=request_headers, timeout=30, sink=media)
+                res.raise_for_status()
+                if media:
+                    print(f"download_media: ダウンロード完了: {len(media)}バイト（{'一時ファイル' if media.spooled_to_disk else 'メモリ'}）")
+                    return media.rewind()
+                print(f"download_media: データが受信されませんでした (試行 {attempt + 1}/{max_retries})")
+            except Exception as e:
+                print(f"download_media: ダウンロードエラー (試行 {attempt + 1}/{max_retries}): {e}")
+            media.close()
+        return None
+
+    async def download_media(self, url: str, headers: Optional[Dict[str, str]] = None, max_retries: int = 3) -> Optional[bytes]:
+        media = await self.download_media_stream(url, headers, max_retries)
+        if not media:
+            return None
+        with media:
+            return media.getvalue()
+
+
+class AsyncWordPressClient:
+    """WordPressClientの非同期版（認証・データの作成は同期版と共通）
+
+    書き込みはmax_writes件まで（省略時は同時実行枠のWordPress書き込み数）に制限する。
+    """
+
+    def __init__(self, wp: WordPressClient, transport: AsyncTransport, max_writes: Optional[int] = None):
+        self.wp = wp
+        self.transport = transport
+        self._writes = asyncio.Semaphore(max_writes or budget.max_wp_writes)
+
+    async def _send(self, method: str, path: str, write: bool = False, headers: Optional[Dict[str, str]] = None,
+                    **kwargs) -> AsyncResponse:
+        url = f"{self.wp.base_url}/wp-json/wp/v2/{path}"
+        if write:
+            async with self._writes:
+                res = await self.transport.request(method, url, headers=headers or self.wp.headers,
+                                                   timeout=self.wp.timeout, **kwargs)
+        else:
+            res = await self.transport.request(method, url, headers=headers or self.wp.headers,
+                                               timeout=self.wp.timeout, **kwargs)
+        metrics_exporter.wp_requests.inc(method, str(res.status_code))
+        metrics_exporter.wp_request_seconds.observe(res.elapsed, method)
+        return res
+
+    async def get_post_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        res = await self._send("GET", "posts", params={"slug": slug})
+        res.raise_for_status()
+        data = res.json()
+        if isinstance(data, list) and data:
+            return data[0]
+        return None
+
+    async def get_post_by_id(self, post_id: int) -> Optional[Dict[str, Any]]:
+        res = await self._send("GET", f"posts/{post_id}")
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        return res.json()
+
+    async def create_post(self, title: str, content: str, status: str = "publish", slug: Optional[str] = None,
+                          excerpt: Optional[str] = None, categories: Optional[List[int]] = None,
+                          tags: Optional[List[int]] = None) -> Dict[str, Any]:
+        data = self.wp.post_data(title, content, status, slug, excerpt, categories, tags)
+        res = await self._send("POST", "posts", write=True, json_body=data)
+        res.raise_for_status()
+        return res.json()
+
+    async def update_post(self, post_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        res = await self._send("PUT", f"posts/{post_id}", write=True, json_body=data)
+        res.raise_for_status()
+        return res.json()
+
+    async def upload_media(self, filename: str, bytes_data: Union[bytes, MediaBuffer],
+                           mime_type: Optional[str] = None) -> Dict[str, Any]:
+        res = await self._send("POST", "media", write=True, headers=self.wp.media_headers(filename, mime_type),
+                               data=bytes_data)
+        res.raise_for_status()
+        return res.json()
+
+    async def set_featured_media(self, post_id: int, media_id: int) -> Dict[str, Any]:
+        res = await self._send("POST", f"posts/{post_id}", write=True, json_body={"featured_media": media_id})
+        res.raise_for_status()
+        return res.json()
+
+
+async def fetch_html_async(transport: AsyncTransport, url: str, timeout: int = 30) -> str:
+    """詳細ページのHTMLを取得（scrape.fetch_htmlのHTTP取得の非同期版。Chromeでの取得は含まない）"""
+    from scrape import HEADERS
+    res = await transport.request("GET", url, headers=HEADERS, timeout=timeout)
+    res.raise_for_status()
+    return res.text
@@ -0,0 +1,252 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """プロセス間で共有する排他ロック（ロック用ファイルを使う）"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BackupStore:
+    """内容ハッシュで重複を排除する設定バックアップストア
+
+    バックアップ本体は objects/<sha256>.json に1つだけ保存し、いつどの内容を
+    バックアップしたかは index.json で管理する。直前のバックアップと内容が同じ場合は
+    何も書き込まない。保持件数・保持日数を超えた版は自動的に削除する。
+
+    同じディレクトリを複数のプロセスが使うため、index.jsonの更新はロックファイルで
+    排他し、更新の直前に読み込み直す。プロセス内では get_backup_store() で
+    ディレクトリごとに1つのインスタンスを共有する。
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+    OBJECTS_DIR = "objects"
+    # 旧形式（settings_YYYYmmdd_HHMMSS.json）のバックアップファイル
+    LEGACY_PATTERN = re.compile(r"^settings_(\d{8}_\d{6})\.json$")
+
+    def __init__(self, backup_dir: str, max_versions: int = 30, max_age_days: int = 90):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, self.OBJECTS_DIR)
+        self.index_file = os.path.join(backup_dir, self.INDEX_FILE)
+        self.lock_file = os.path.join(backup_dir, self.LOCK_FILE)
+        self.max_versions = max_versions
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._entries: List[Dict[str, Any]] = []
+        self._migrate_legacy_files()
+
+    @contextmanager
+    def _locked(self):
+        """スレッド・プロセス間で排他し、他のプロセスの更新を読み込み直す"""
+        with self._lock, _file_lock(self.lock_file):
+            self._entries = self._load_index()
+            yield
+
+    def configure(self, max_versions: Optional[int] = None, max_age_days: Optional[int] = None):
+        """保持件数・保持日数を変更"""
+        if max_versions is not None:
+            self.max_versions = max(1, int(max_versions))
+        if max_age_days is not None:
+            self.max_age_days = max(0, int(max_age_days))
+
+    def _load_index(self) -> List[Dict[str, Any]]:
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                return data.get("versions", [])
+        except Exception as e:
+            logger.error(f"バックアップインデックス読み込みエラー: {e}")
+        return []
+
+    def _save_index(self):
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"versions": self._entries}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.index_file)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.json")
+
+    @staticmethod
+    def _version_id(created_at: datetime, digest: str) -> str:
+        return f"{created_at.strftime('%Y%m%d_%H%M%S')}_{digest[:8]}"
+
+    def _store_object(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            temp_file = path + ".tmp"
+            with open(temp_file, "wb") as f:
+                f.write(data)
+            os.replace(temp_file, path)
+        return digest
+
+    def save(self, source_file: str, label: str = "settings") -> Optional[Dict[str, Any]]:
+        """ファイルをバックアップ。直前の版と同じ内容なら書き込まずにその版を返す"""
+        try:
+            if not os.path.exists(source_file):
+                return None
+            with open(source_file, "rb") as f:
+                data = f.read()
+            with self._locked():
+                digest = hashlib.sha256(data).hexdigest()
+                latest = self._entries[-1] if self._entries else None
+                if latest and latest["hash"] == digest and os.path.exists(self._object_path(digest)):
+                    return latest
+
+                self._store_object(data)
+                created_at = datetime.now()
+                entry = {
+                    "id": self._version_id(created_at, digest),
+                    "hash": digest,
+                    "label": label,
+                    "created_at": created_at.isoformat(),
+                    "size": len(data),
+                }
+                self._entries.append(entry)
+                self._prune_locked()
+                self._save_index()
+                logger.info(f"設定ファイルをバックアップ: {entry['id']}")
+                return entry
+        except Exception as e:
+            logger.error(f"バックアップ作成エラー: {e}")
+            return None
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """バックアップの一覧（新しい順）"""
+        with self._locked():
+            return list(reversed(self._entries))
+
+    def get_path(self, version_id: str) -> Optional[str]:
+        """版IDに対応するバックアップ本体のパス"""
+        with self._locked():
+            for entry in self._entries:
+                if entry["id"] == version_id:
+                    path = self._object_path(entry["hash"])
+                    return path if os.path.exists(path) else None
+        return None
+
+    def restore(self, version_id: str, target_file: str) -> bool:
+        """指定した版をtarget_fileに書き戻す"""
+        path = self.get_path(version_id)
+        if not path:
+            logger.error(f"バックアップが存在しません: {version_id}")
+            return False
+        with open(path, "rb") as f:
+            data = f.read()
+        temp_file = target_file + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(data)
+        os.replace(temp_file, target_file)
+        return True
+
+    def prune(self):
+        """保持件数・保持日数を超えた版を削除"""
+        with self._locked():
+            self._prune_locked()
+            self._save_index()
+
+    def _prune_locked(self):
+        keep = self._entries[-self.max_versions:]
+        if self.max_age_days > 0 and len(keep) > 1:
+            cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+            # 最新の版は日数に関係なく残す
+            keep = [entry for entry in keep[:-1] if entry["created_at"] >= cutoff] + keep[-1:]
+        removed = len(self._entries) - len(keep)
+        self._entries = keep
+        if removed:
+            # どの版からも参照されなくなった本体を削除
+            referenced = {entry["hash"] for entry in self._entries}
+            for name in os.listdir(self.objects_dir):
+                digest = name[:-len(".json")] if name.endswith(".json") else None
+                if digest and digest not in referenced:
+                    try:
+                        os.remove(os.path.join(self.objects_dir, name))
+                    except OSError:
+                        pass
+            logger.info(f"古いバックアップを{removed}件削除しました")
+
+    def _migrate_legacy_files(self):
+        """旧形式のタイムスタンプ付きバックアップをストアに取り込んで削除"""
+        try:
+            with self._locked():
+                if os.path.exists(self.index_file):
+                    # 取り込み済み（他のプロセスが取り込んだ場合を含む）
+                    return
+                legacy = []
+                for name in os.listdir(self.backup_dir):
+                    match = self.LEGACY_PATTERN.match(name)
+                    if match:
+                        legacy.append((datetime.strptime(match.group(1), "%Y%m%d_%H%M%S"), name))
+                legacy.sort()
+
+                last_digest = None
+                for created_at, name in legacy:
+                    path = os.path.join(self.backup_dir, name)
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    digest = self._store_object(data)
+                    if digest != last_digest:
+                        # 連続して同じ内容の版は1つにまとめる
+                        self._entries.append({
+                            "id": self._version_id(created_at, digest),
+                            "hash": digest,
+                            "label": "settings",
+                            "created_at": created_at.isoformat(),
+                            "size": len(data),
+                        })
+                        last_digest = digest
+                    os.remove(path)
+                self._prune_locked()
+                self._save_index()
+            if legacy:
+                logger.info(f"旧形式のバックアップ{len(legacy)}件を取り込み、{len(self._entries)}件の版にまとめました")
+        except Exception as e:
+            logger.error(f"旧形式バックアップの取り込みエラー: {e}")
+
+
+_stores: Dict[str, BackupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_backup_store(backup_dir: str) -> BackupStore:
+    """バックアップディレクトリごとに共有するBackupStoreを返す"""
+    key = os.path.normcase(os.path.abspath(backup_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = BackupStore(backup_dir)
+        return store
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import time
 from dataclasses import dataclass
 from typing import Optional
 from selenium import webdriver
@@ -8,6 +9,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
+import metrics_exporter
 
 
 @dataclass
@@ -26,6 +28,8 @@ class BrowserFetcher:
         return driver
 
     def fetch_after_click(self, url: str, click_xpath: str) -> str:
+        started = time.perf_counter()
+        result = "error"
         driver = self._build_driver()
         try:
             driver.get(url)
@@ -38,7 +42,10 @@ class BrowserFetcher:
                 lambda d: d.execute_script("return document.readyState") == "complete"
             )
             html = driver.page_source
+            result = "ok"
             return html
         finally:
             driver.quit()
+            metrics_exporter.browser_fetches.inc(result)
+            metrics_exporter.browser_fetch_seconds.observe(time.perf_counter() - started)
 
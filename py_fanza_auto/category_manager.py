@@ -3,11 +3,85 @@ import logging
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+import hashlib
 import re
+import unicodedata
 
 logger = logging.getLogger(__name__)
 
 
+# ひらがな→ローマ字（カタカナはひらがなと同じ読みで変換する）
+_KANA_ROMAJI = {
+    'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
+    'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
+    'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
+    'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
+    'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
+    'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
+    'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
+    'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
+    'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
+    'わ': 'wa', 'を': 'wo', 'ん': 'n',
+    'が': 'ga', 'ぎ': 'gi', 'ぐ': 'gu', 'げ': 'ge', 'ご': 'go',
+    'ざ': 'za', 'じ': 'ji', 'ず': 'zu', 'ぜ': 'ze', 'ぞ': 'zo',
+    'だ': 'da', 'ぢ': 'di', 'づ': 'du', 'で': 'de', 'ど': 'do',
+    'ば': 'ba', 'び': 'bi', 'ぶ': 'bu', 'べ': 'be', 'ぼ': 'bo',
+    'ぱ': 'pa', 'ぴ': 'pi', 'ぷ': 'pu', 'ぺ': 'pe', 'ぽ': 'po',
+    'ぁ': 'a', 'ぃ': 'i', 'ぅ': 'u', 'ぇ': 'e', 'ぉ': 'o',
+    'ゃ': 'ya', 'ゅ': 'yu', 'ょ': 'yo', 'っ': 'tsu', 'ゎ': 'wa',
+    'ゐ': 'wi', 'ゑ': 'we', 'ゔ': 'vu',
+}
+
+
+def _build_slug_table() -> Dict[int, Optional[str]]:
+    """スラッグ変換用のstr.translateテーブルを作成"""
+    table: Dict[int, Optional[str]] = {}
+    for kana, romaji in _KANA_ROMAJI.items():
+        table[ord(kana)] = romaji
+        # 対応するカタカナ（ひらがなの0x60後ろ）
+        table[ord(kana) + 0x60] = romaji
+    # 長音・中黒は読みに影響しないので区切りとして扱う
+    table[ord('ー')] = ''
+    table[ord('・')] = '-'
+    for code in range(0x80):
+        char = chr(code)
+        if char.isalnum():
+            table[code] = char.lower()
+        elif char.isspace() or char == '-':
+            table[code] = '-'
+        else:
+            # 英数字以外の記号は除去
+            table[code] = ''
+    return table
+
+
+_SLUG_TABLE = _build_slug_table()
+# 変換後に残った、ローマ字にできない文字（漢字など）
+_UNMAPPED_CHARS = re.compile(r'[^a-z0-9-]+')
+_HYPHENS = re.compile(r'-{2,}')
+# WordPressのスラッグの長さの上限に収まるように切り詰める長さ
+MAX_SLUG_LENGTH = 180
+
+
+@lru_cache(maxsize=8192)
+def make_slug(text: str) -> str:
+    """テキストをスラッグに変換（名前ごとに結果をキャッシュ）
+
+    NFKC正規化（全角英数字・半角カナの統一）の後、変換テーブルで1回で
+    ローマ字・小文字に変換する。漢字などローマ字にできない文字が含まれる場合は、
+    元の名前から求めた安定したハッシュを末尾に付けて、別の名前と同じスラッグに
+    ならないようにする。
+    """
+    normalized = unicodedata.normalize('NFKC', text or '')
+    slug, unmapped = _UNMAPPED_CHARS.subn('', normalized.translate(_SLUG_TABLE))
+    slug = _HYPHENS.sub('-', slug).strip('-')[:MAX_SLUG_LENGTH].strip('-')
+    if unmapped:
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:8]
+        slug = f"{slug}-{digest}" if slug else digest
+    return slug
+
+
 class CategoryType(Enum):
     """カテゴリタイプ"""
     JAN = "jan"           # JANコードベース
@@ -32,18 +106,57 @@ class CategoryConfig:
     mapping_rules: Dict[str, str] = None  # カスタムマッピングルール
 
 
+# 名前をそのままカテゴリにする種別と、カテゴリの説明に付ける見出し
+_CATEGORY_LABELS = {
+    CategoryType.ACTRESS.value: "女優",
+    CategoryType.DIRECTOR.value: "監督",
+    CategoryType.SERIES.value: "シリーズ",
+    CategoryType.GENRE.value: "ジャンル",
+    CategoryType.MAKER.value: "メーカー",
+    CategoryType.LABEL.value: "レーベル",
+}
+
+# 自動タグにする項目（タグのスラッグの接頭辞を兼ねる）
+_AUTO_TAG_KEYS = ("actress", "director", "series", "genre", "maker", "label")
+
+# カテゴリ種別とアイテムの項目名が異なるもの
+_ITEM_KEYS = {CategoryType.ACTRESS.value: "actress", CategoryType.SERIES.value: "series"}
+
+
+def _names_of(item: Dict[str, Any], key: str) -> List[str]:
+    """アイテムの出演者・メーカーなどの名前の一覧（1件だけの辞書にも対応）"""
+    values = item.get(_ITEM_KEYS.get(key, key)) or []
+    if isinstance(values, dict):
+        values = [values]
+    if not isinstance(values, list):
+        return []
+    return [value['name'] for value in values if isinstance(value, dict) and value.get('name')]
+
+
 class CategoryManager:
     """WordPressのカテゴリ・タグ管理クラス"""
     
     def __init__(self, wp_client):
         self.wp_client = wp_client
-        self.category_cache: Dict[str, Dict[str, Any]] = {}
-        self.tag_cache: Dict[str, Dict[str, Any]] = {}
-        self._load_categories()
-        self._load_tags()
+        # 一覧は最初に使うときに読み込む（起動時にWordPressへアクセスしない）
+        self._category_cache: Optional[Dict[str, Dict[str, Any]]] = None
+        self._tag_cache: Optional[Dict[str, Dict[str, Any]]] = None
+    
+    @property
+    def category_cache(self) -> Dict[str, Dict[str, Any]]:
+        if self._category_cache is None:
+            self._load_categories()
+        return self._category_cache
+    
+    @property
+    def tag_cache(self) -> Dict[str, Dict[str, Any]]:
+        if self._tag_cache is None:
+            self._load_tags()
+        return self._tag_cache
     
     def _load_categories(self):
         """カテゴリ一覧を読み込み"""
+        self._category_cache = {}
         try:
             categories = self.wp_client.get_categories()
             if isinstance(categories, list):
@@ -61,6 +174,7 @@ class CategoryManager:
     
     def _load_tags(self):
         """タグ一覧を読み込み"""
+        self._tag_cache = {}
         try:
             tags = self.wp_client.get_tags()
             if isinstance(tags, list):
@@ -80,169 +194,47 @@ class CategoryManager:
         """アイテムに基づいてカテゴリIDを取得"""
         try:
             category_ids = []
-            
-            if category_type == CategoryType.JAN.value:
-                category_ids = self._get_jan_categories(item)
-            elif category_type == CategoryType.ACTRESS.value:
-                category_ids = self._get_actress_categories(item)
-            elif category_type == CategoryType.DIRECTOR.value:
-                category_ids = self._get_director_categories(item)
-            elif category_type == CategoryType.SERIES.value:
-                category_ids = self._get_series_categories(item)
-            elif category_type == CategoryType.GENRE.value:
-                category_ids = self._get_genre_categories(item)
-            elif category_type == CategoryType.MAKER.value:
-                category_ids = self._get_maker_categories(item)
-            elif category_type == CategoryType.LABEL.value:
-                category_ids = self._get_label_categories(item)
-            elif category_type == CategoryType.CUSTOM.value:
-                category_ids = self._get_custom_categories(item)
-            
+            for name, slug, description in self.category_terms_for_item(item, category_type):
+                category_id = self._get_or_create_category(name, slug, description)
+                if category_id:
+                    category_ids.append(category_id)
             return category_ids
             
         except Exception as e:
             logger.error(f"カテゴリ取得エラー: {e}")
             return []
     
-    def _get_jan_categories(self, item: Dict[str, Any]) -> List[int]:
-        """JANコードベースのカテゴリを取得"""
-        category_ids = []
-        jancode = item.get('jancode', '')
-        
-        if jancode:
-            # JANコードの最初の2桁（国コード）でカテゴリを作成
-            country_code = jancode[:2]
-            if country_code == '49':  # 日本
-                category_name = "日本製"
-                category_slug = "japan-made"
-            elif country_code == '45':  # 日本
-                category_name = "日本製"
-                category_slug = "japan-made"
-            else:
-                category_name = "輸入品"
-                category_slug = "imported"
-            
-            category_id = self._get_or_create_category(category_name, category_slug)
-            if category_id:
-                category_ids.append(category_id)
-        
-        return category_ids
-    
-    def _get_actress_categories(self, item: Dict[str, Any]) -> List[int]:
-        """女優ベースのカテゴリを取得"""
-        category_ids = []
-        actresses = item.get('actress', [])
-        
-        if isinstance(actresses, list):
-            for actress in actresses:
-                if isinstance(actress, dict):
-                    name = actress.get('name', '')
-                    if name:
-                        # 女優名をサニタイズしてスラッグを作成
-                        slug = self._sanitize_slug(name)
-                        category_id = self._get_or_create_category(name, slug, f"女優: {name}")
-                        if category_id:
-                            category_ids.append(category_id)
-        
-        return category_ids
-    
-    def _get_director_categories(self, item: Dict[str, Any]) -> List[int]:
-        """監督ベースのカテゴリを取得"""
-        category_ids = []
-        directors = item.get('director', [])
-        
-        if isinstance(directors, list):
-            for director in directors:
-                if isinstance(director, dict):
-                    name = director.get('name', '')
-                    if name:
-                        slug = self._sanitize_slug(name)
-                        category_id = self._get_or_create_category(name, slug, f"監督: {name}")
-                        if category_id:
-                            category_ids.append(category_id)
-        
-        return category_ids
-    
-    def _get_series_categories(self, item: Dict[str, Any]) -> List[int]:
-        """シリーズベースのカテゴリを取得"""
-        category_ids = []
-        series = item.get('series', [])
-        
-        if isinstance(series, list):
-            for ser in series:
-                if isinstance(ser, dict):
-                    name = ser.get('name', '')
-                    if name:
-                        slug = self._sanitize_slug(name)
-                        category_id = self._get_or_create_category(name, slug, f"シリーズ: {name}")
-                        if category_id:
-                            category_ids.append(category_id)
-        
-        return category_ids
-    
-    def _get_genre_categories(self, item: Dict[str, Any]) -> List[int]:
-        """ジャンルベースのカテゴリを取得"""
-        category_ids = []
-        genres = item.get('genre', [])
-        
-        if isinstance(genres, list):
-            for genre in genres:
-                if isinstance(genre, dict):
-                    name = genre.get('name', '')
-                    if name:
-                        slug = self._sanitize_slug(name)
-                        category_id = self._get_or_create_category(name, slug, f"ジャンル: {name}")
-                        if category_id:
-                            category_ids.append(category_id)
-        
-        return category_ids
-    
-    def _get_maker_categories(self, item: Dict[str, Any]) -> List[int]:
-        """メーカーベースのカテゴリを取得"""
-        category_ids = []
-        makers = item.get('maker', [])
-        
-        if isinstance(makers, list):
-            for maker in makers:
-                if isinstance(maker, dict):
-                    name = maker.get('name', '')
-                    if name:
-                        slug = self._sanitize_slug(name)
-                        category_id = self._get_or_create_category(name, slug, f"メーカー: {name}")
-                        if category_id:
-                            category_ids.append(category_id)
-        
-        return category_ids
+    def category_terms_for_item(self, item: Dict[str, Any], category_type: str) -> List[Tuple[str, str, str]]:
+        """アイテムのカテゴリを (名前, スラッグ, 説明) で返す（WordPressにはアクセスしない）"""
+        if category_type == CategoryType.JAN.value:
+            return self._jan_category_terms(item)
+        if category_type == CategoryType.CUSTOM.value:
+            return self._custom_category_terms(item)
+        label = _CATEGORY_LABELS.get(category_type)
+        if label:
+            return [(name, make_slug(name), f"{label}: {name}") for name in _names_of(item, category_type)]
+        return []
     
-    def _get_label_categories(self, item: Dict[str, Any]) -> List[int]:
-        """レーベルベースのカテゴリを取得"""
-        category_ids = []
-        labels = item.get('label', [])
-        
-        for label in labels:
-            name = label.get('name', '')
-            if name:
-                slug = self._sanitize_slug(name)
-                category_id = self._get_or_create_category(name, slug, f"レーベル: {name}")
-                if category_id:
-                    category_ids.append(category_id)
-        
-        return category_ids
+    def _jan_category_terms(self, item: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """JANコードベースのカテゴリ"""
+        jancode = item.get('jancode', '')
+        if not jancode:
+            return []
+        # JANコードの最初の2桁（国コード）でカテゴリを作成
+        if jancode[:2] in ('49', '45'):  # 日本
+            return [("日本製", "japan-made", "")]
+        return [("輸入品", "imported", "")]
     
-    def _get_custom_categories(self, item: Dict[str, Any]) -> List[int]:
-        """カスタムカテゴリを取得"""
-        category_ids = []
+    def _custom_category_terms(self, item: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """カスタムカテゴリ"""
+        terms = []
         
         # コンテンツIDベース
         content_id = item.get('content_id', '')
         if content_id:
             # 品番の最初の文字でカテゴリを作成
             prefix = content_id[:1].upper()
-            category_name = f"品番{prefix}系"
-            category_slug = f"content-prefix-{prefix.lower()}"
-            category_id = self._get_or_create_category(category_name, category_slug)
-            if category_id:
-                category_ids.append(category_id)
+            terms.append((f"品番{prefix}系", f"content-prefix-{prefix.lower()}", ""))
         
         # 価格ベース
         prices = item.get('prices', {})
@@ -250,25 +242,17 @@ class CategoryManager:
             try:
                 price = int(prices['list_price'])
                 if price < 1000:
-                    category_name = "1000円未満"
-                    category_slug = "under-1000"
+                    terms.append(("1000円未満", "under-1000", ""))
                 elif price < 3000:
-                    category_name = "1000-3000円"
-                    category_slug = "1000-3000"
+                    terms.append(("1000-3000円", "1000-3000", ""))
                 elif price < 5000:
-                    category_name = "3000-5000円"
-                    category_slug = "3000-5000"
+                    terms.append(("3000-5000円", "3000-5000", ""))
                 else:
-                    category_name = "5000円以上"
-                    category_slug = "over-5000"
-                
-                category_id = self._get_or_create_category(category_name, category_slug)
-                if category_id:
-                    category_ids.append(category_id)
+                    terms.append(("5000円以上", "over-5000", ""))
             except (ValueError, TypeError):
                 pass
         
-        return category_ids
+        return terms
     
     def _get_or_create_category(self, name: str, slug: str, description: str = "") -> Optional[int]:
         """カテゴリを取得または作成"""
@@ -302,105 +286,41 @@ class CategoryManager:
         """アイテムに基づいてタグIDを取得"""
         try:
             tag_ids = []
-            
-            if tag_type == "auto":
-                # 自動タグ生成
-                tag_ids = self._get_auto_tags(item)
-            elif tag_type == "manual":
-                # 手動タグ生成（設定ファイルから）
-                tag_ids = self._get_manual_tags(item)
-            
+            for name, slug in self.tag_terms_for_item(item, tag_type):
+                tag_id = self._get_or_create_tag(name, slug)
+                if tag_id:
+                    tag_ids.append(tag_id)
             return tag_ids
             
         except Exception as e:
             logger.error(f"タグ取得エラー: {e}")
             return []
     
-    def _get_auto_tags(self, item: Dict[str, Any]) -> List[int]:
-        """自動タグを生成"""
-        tag_ids = []
-        
-        # 出演者タグ
-        actresses = item.get('actress', [])
-        if isinstance(actresses, list):
-            for actress in actresses:
-                if isinstance(actress, dict):
-                    name = actress.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"actress-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
-        
-        # 監督タグ
-        directors = item.get('director', [])
-        if isinstance(directors, list):
-            for director in directors:
-                if isinstance(director, dict):
-                    name = director.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"director-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
-        
-        # シリーズタグ
-        series = item.get('series', [])
-        if isinstance(series, list):
-            for ser in series:
-                if isinstance(ser, dict):
-                    name = ser.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"series-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
-        
-        # ジャンルタグ
-        genres = item.get('genre', [])
-        if isinstance(genres, list):
-            for genre in genres:
-                if isinstance(genre, dict):
-                    name = genre.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"genre-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
-        
-        # メーカータグ
-        makers = item.get('maker', [])
-        if isinstance(makers, list):
-            for maker in makers:
-                if isinstance(maker, dict):
-                    name = maker.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"maker-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
-        
-        # レーベルタグ
-        labels = item.get('label', [])
-        if isinstance(labels, list):
-            for label in labels:
-                if isinstance(label, dict):
-                    name = label.get('name', '')
-                    if name:
-                        tag_id = self._get_or_create_tag(name, f"label-{self._sanitize_slug(name)}")
-                        if tag_id:
-                            tag_ids.append(tag_id)
+    def tag_terms_for_item(self, item: Dict[str, Any], tag_type: str = "auto") -> List[Tuple[str, str]]:
+        """アイテムのタグを (名前, スラッグ) で返す（WordPressにはアクセスしない）"""
+        if tag_type == "auto":
+            # 自動タグ生成
+            return self._auto_tag_terms(item)
+        # 手動タグ生成（設定ファイルから）は設定ファイルの実装後に拡張
+        return []
+    
+    def _auto_tag_terms(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """自動タグ（出演者・監督・シリーズ・ジャンル・メーカー・レーベル・品番・JANコード）"""
+        terms = []
+        for key in _AUTO_TAG_KEYS:
+            terms.extend((name, f"{key}-{make_slug(name)}") for name in _names_of(item, key))
         
         # コンテンツIDタグ
         content_id = item.get('content_id', '')
         if content_id:
-            tag_id = self._get_or_create_tag(content_id, f"content-id-{content_id.lower()}")
-            if tag_id:
-                tag_ids.append(tag_id)
+            terms.append((content_id, f"content-id-{content_id.lower()}"))
         
         # JANコードタグ
         jancode = item.get('jancode', '')
         if jancode:
-            tag_id = self._get_or_create_tag(jancode, f"jancode-{jancode}")
-            if tag_id:
-                tag_ids.append(tag_id)
+            terms.append((jancode, f"jancode-{jancode}"))
         
-        return tag_ids
+        return terms
     
     def _get_manual_tags(self, item: Dict[str, Any]) -> List[int]:
         """手動タグを生成（設定ファイルから）"""
@@ -436,41 +356,8 @@ class CategoryManager:
             return None
     
     def _sanitize_slug(self, text: str) -> str:
-        """テキストをスラッグ用にサニタイズ"""
-        # 日本語をローマ字に変換（簡易版）
-        japanese_map = {
-            'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
-            'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
-            'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
-            'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
-            'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
-            'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
-            'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
-            'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
-            'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
-            'わ': 'wa', 'を': 'wo', 'ん': 'n'
-        }
-        
-        # ひらがなをローマ字に変換
-        for jp, rom in japanese_map.items():
-            text = text.replace(jp, rom)
-        
-        # 英数字以外を除去
-        text = re.sub(r'[^a-zA-Z0-9\s-]', '', text)
-        
-        # スペースをハイフンに変換
-        text = re.sub(r'\s+', '-', text)
-        
-        # 連続するハイフンを単一のハイフンに
-        text = re.sub(r'-+', '-', text)
-        
-        # 先頭と末尾のハイフンを除去
-        text = text.strip('-')
-        
-        # 小文字に変換
-        text = text.lower()
-        
-        return text
+        """テキストをスラッグ用にサニタイズ（make_slugを参照）"""
+        return make_slug(text)
     
     def assign_categories_to_post(self, post_id: int, category_ids: List[int]) -> bool:
         """投稿にカテゴリを割り当て"""
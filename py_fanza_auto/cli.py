@@ -2,29 +2,114 @@ from __future__ import annotations
 import argparse
 import os
 from config import Settings
-from engine import Engine
-from apscheduler.schedulers.background import BackgroundScheduler
+from job_queue import JobQueue
+import multiprocessing
 import time
 
 
+def worker_main(worker_id: str, queue_db: str, wait: bool) -> None:
+    """ワーカープロセスのエントリポイント（プロセスごとにEngineを作成）"""
+    from engine import Engine
+    settings = Settings.load()
+    engine = Engine.from_settings(settings, start_scheduler=False)
+    try:
+        created = engine.run_worker(JobQueue(queue_db), worker_id, wait=wait)
+    finally:
+        engine.close()
+    print(f"[{worker_id}] Created posts: {created}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="FANZA Auto Plugin (Python)")
-    parser.add_argument("run", nargs="?", default="once", choices=["once", "schedule", "test"], help="Run mode")
+    parser.add_argument("run", nargs="?", default="once", choices=["once", "schedule", "test", "plan", "worker", "report", "vacuum-logs"], help="Run mode")
+    parser.add_argument("--setting", default="1", help="投稿設定番号 (plan)")
+    parser.add_argument("--max-items", type=int, default=None, help="登録する最大アイテム数 (plan)")
+    parser.add_argument("--workers", type=int, default=1, help="ワーカープロセス数 (worker)")
+    parser.add_argument("--wait", action="store_true", help="キューが空になっても待機を続ける (worker)")
+    parser.add_argument("--queue-db", default=None, help="ジョブキューのSQLiteファイル")
+    parser.add_argument("--days", type=int, default=14, help="集計する日数 (report)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="DMM・WordPressへの通信を非同期I/Oで行う (once)")
+    parser.add_argument("--profile", action="store_true", help="cProfileで計測し config/profiles に保存する (once/test)")
     args = parser.parse_args()
 
+    if args.run == "report":
+        from run_metrics import MetricsStore, format_report
+        store = MetricsStore()
+        print(format_report(store.daily_summary(args.days), store.recent_profiles(args.days)))
+        return
+
+    if args.run == "vacuum-logs":
+        # logs.dbのインクリメンタルバキュームを有効にする（GUI・scheduleを止めてから実行）
+        from log_manager import DatabaseLogger
+        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs.db")
+        if DatabaseLogger(db_path).enable_auto_vacuum():
+            print(f"インクリメンタルバキュームを有効にしました: {db_path}")
+        else:
+            print(f"インクリメンタルバキュームは有効です: {db_path}")
+        return
+
+    if args.run == "worker":
+        queue = JobQueue(args.queue_db)
+        print(f"Queue: {queue.stats()}")
+        processes = []
+        for i in range(max(1, args.workers)):
+            worker_id = f"worker-{os.getpid()}-{i + 1}"
+            process = multiprocessing.Process(target=worker_main, args=(worker_id, queue.db_path, args.wait))
+            process.start()
+            processes.append(process)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        print(f"Queue: {queue.stats()}")
+        return
+
+    # Engine（requests・lxml等）は実行するときだけ読み込む。内蔵スケジューラーのスレッドは
+    # 常駐する schedule モードでのみ開始し、once/test/plan では起動しない
+    from engine import Engine
     settings = Settings.load()
-    engine = Engine.from_settings(settings)
+    engine = Engine.from_settings(settings, start_scheduler=(args.run == "schedule"))
+    try:
+        run_engine(engine, args)
+    finally:
+        engine.close()
+
+
+def run_engine(engine, args) -> None:
+    """plan/once/test/schedule をEngineで実行"""
+    if args.run == "plan":
+        queue = JobQueue(args.queue_db)
+        added = engine.plan_jobs(queue, args.setting, args.max_items)
+        print(f"Planned jobs: {added}")
+        print(f"Queue: {queue.stats()}")
+        return
 
     if args.run == "once":
-        ids = engine.run_once()
+        if args.use_async:
+            import asyncio
+            run = lambda: asyncio.run(engine.run_once_async())
+        else:
+            run = engine.run_once
+        if args.profile:
+            ids, hotspots = engine.run_profiled("once", run)
+            print(hotspots)
+        else:
+            ids = run()
         print(f"Created posts: {ids}")
         return
     if args.run == "test":
-        report = engine.run_test()
+        if args.profile:
+            report, hotspots = engine.run_profiled("test", engine.run_test)
+            report = f"{report}\n\n{hotspots}"
+        else:
+            report = engine.run_test()
         print(report)
         return
 
     # schedule mode: read minute/hours from env if available
+    from apscheduler.schedulers.background import BackgroundScheduler
     minute = os.getenv("CRON_MINUTE", "0")
     hours = os.getenv("CRON_HOURS", "0")
     scheduler = BackgroundScheduler()
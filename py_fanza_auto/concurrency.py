@@ -0,0 +1,113 @@
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+
+class RateLimiter:
+    """一定間隔でリクエストを通すレートリミッター（スレッドセーフ）"""
+
+    def __init__(self, rate_per_sec: float = 1.0):
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+        self.set_rate(rate_per_sec)
+
+    def set_rate(self, rate_per_sec: float):
+        """1秒あたりの許可数を設定（0以下で無制限）"""
+        with self._lock:
+            self.interval = 1.0 / rate_per_sec if rate_per_sec and rate_per_sec > 0 else 0.0
+
+    def reserve(self) -> float:
+        """次の枠を予約し、その時刻までの待ち時間（秒）を返す（asyncioではこの秒数だけ待つ）"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self.interval
+        return max(0.0, wait)
+
+    def acquire(self):
+        """次のリクエストが許可されるまで待機"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ConcurrencyBudget:
+    """プロセス全体で共有する同時実行枠
+
+    スケジュールから並列に実行される投稿設定が、Chromeの起動数・DMM APIへのリクエスト頻度・
+    WordPressへの書き込み数を合計で超えないようにする。
+    """
+
+    def __init__(self,
+                 max_parallel_posts: int = 3,
+                 max_chrome_instances: int = 2,
+                 max_wp_writes: int = 2,
+                 dmm_requests_per_sec: float = 1.0):
+        self._lock = threading.Lock()
+        self.dmm_rate = RateLimiter(dmm_requests_per_sec)
+        # 使用中の枠の数（メトリクス用）
+        self.chrome_in_use = 0
+        self.wp_writes_in_use = 0
+        self.configure(max_parallel_posts, max_chrome_instances, max_wp_writes, dmm_requests_per_sec)
+
+    def configure(self,
+                  max_parallel_posts: Optional[int] = None,
+                  max_chrome_instances: Optional[int] = None,
+                  max_wp_writes: Optional[int] = None,
+                  dmm_requests_per_sec: Optional[float] = None):
+        """枠の大きさを変更（実行中の処理が保持している枠はそのまま解放される）"""
+        with self._lock:
+            if max_parallel_posts is not None:
+                self.max_parallel_posts = max(1, int(max_parallel_posts))
+            if max_chrome_instances is not None:
+                self.max_chrome_instances = max(1, int(max_chrome_instances))
+                self._chrome = threading.BoundedSemaphore(self.max_chrome_instances)
+            if max_wp_writes is not None:
+                self.max_wp_writes = max(1, int(max_wp_writes))
+                self._wp_writes = threading.BoundedSemaphore(self.max_wp_writes)
+            if dmm_requests_per_sec is not None:
+                self.dmm_requests_per_sec = float(dmm_requests_per_sec)
+                self.dmm_rate.set_rate(self.dmm_requests_per_sec)
+
+    def configure_from_settings(self, settings: Any):
+        """Settingsオブジェクトから枠を設定"""
+        self.configure(
+            max_parallel_posts=getattr(settings, 'max_parallel_posts', None),
+            max_chrome_instances=getattr(settings, 'max_chrome_instances', None),
+            max_wp_writes=getattr(settings, 'max_wp_writes', None),
+            dmm_requests_per_sec=getattr(settings, 'dmm_requests_per_sec', None),
+        )
+
+    @contextmanager
+    def chrome_slot(self) -> Iterator[None]:
+        """Chromeインスタンスの起動枠を確保"""
+        semaphore = self._chrome
+        semaphore.acquire()
+        self._add_in_use("chrome_in_use", 1)
+        try:
+            yield
+        finally:
+            self._add_in_use("chrome_in_use", -1)
+            semaphore.release()
+
+    @contextmanager
+    def wp_write_slot(self) -> Iterator[None]:
+        """WordPressへの書き込み枠を確保"""
+        semaphore = self._wp_writes
+        semaphore.acquire()
+        self._add_in_use("wp_writes_in_use", 1)
+        try:
+            yield
+        finally:
+            self._add_in_use("wp_writes_in_use", -1)
+            semaphore.release()
+
+    def _add_in_use(self, name: str, delta: int):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+
+# グローバルな同時実行枠
+budget = ConcurrencyBudget()
@@ -1,11 +1,15 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 import os
 from settings_manager import SettingsManager
 
 
 class Settings(BaseModel):
+    # 設定スナップショットとして複数のスレッドで共有するため、作成後は変更できない
+    # （変更する場合は model_copy(update=...) で新しいインスタンスを作る）
+    model_config = ConfigDict(frozen=True)
+
     # DMM API
     dmm_api_id: str = Field(default="", alias="DMM_API_ID")
     dmm_affiliate_id: str = Field(default="", alias="DMM_AFFILIATE_ID")
@@ -46,6 +50,38 @@ class Settings(BaseModel):
     click_xpath: str = Field(default='//*[@id=":R6:"]/div[2]/div[2]/div[3]/div[1]/a', alias="CLICK_XPATH")
     page_wait_sec: int = Field(default=5, alias="PAGE_WAIT_SEC")
     
+    # 設定バックアップの保持件数・保持日数
+    backup_max_versions: int = Field(default=30, alias="BACKUP_MAX_VERSIONS")
+    backup_max_age_days: int = Field(default=90, alias="BACKUP_MAX_AGE_DAYS")
+    
+    # 並列実行設定（スケジュール実行時にプロセス全体で共有する枠）
+    max_parallel_posts: int = Field(default=3, alias="MAX_PARALLEL_POSTS")
+    max_chrome_instances: int = Field(default=2, alias="MAX_CHROME_INSTANCES")
+    max_wp_writes: int = Field(default=2, alias="MAX_WP_WRITES")
+    dmm_requests_per_sec: float = Field(default=1.0, alias="DMM_REQUESTS_PER_SEC")
+    
+    # 詳細ページキャッシュ（同じ作品の再取得をローカル読み込みにする）
+    detail_cache_enabled: bool = Field(default=True, alias="DETAIL_CACHE_ENABLED")
+    detail_cache_ttl_hours: float = Field(default=24, alias="DETAIL_CACHE_TTL_HOURS")
+    
+    # アイキャッチ画像の前処理（縮小・再圧縮、Pillowが必要）
+    eyecatch_preprocess: bool = Field(default=False, alias="EYECATCH_PREPROCESS")
+    eyecatch_max_dimension: int = Field(default=1280, alias="EYECATCH_MAX_DIMENSION")
+    eyecatch_quality: int = Field(default=82, alias="EYECATCH_QUALITY")
+    eyecatch_format: str = Field(default="jpeg", alias="EYECATCH_FORMAT")
+    eyecatch_workers: int = Field(default=2, alias="EYECATCH_WORKERS")
+    
+    # WordPressへの接続にHTTP/2を使う（httpx[http2]が必要、使えない場合はHTTP/1.1）
+    wp_http2: bool = Field(default=False, alias="WP_HTTP2")
+    
+    # 起動スナップショット（フロア一覧・カテゴリ/タグ・投稿済みスラッグを次回の起動時に再利用）
+    warm_state_enabled: bool = Field(default=True, alias="WARM_STATE_ENABLED")
+    
+    # Prometheus形式のメトリクス公開（schedule・GUIなど常駐するプロセスのみ）
+    metrics_exporter_enabled: bool = Field(default=False, alias="METRICS_EXPORTER_ENABLED")
+    metrics_exporter_port: int = Field(default=9464, alias="METRICS_EXPORTER_PORT")
+    metrics_exporter_host: str = Field(default="127.0.0.1", alias="METRICS_EXPORTER_HOST")
+    
     # スクレイピング設定
     description_selectors: List[str] = Field(default=[
         "meta[name=description]",
@@ -139,22 +175,29 @@ class Settings(BaseModel):
 
     @classmethod
     def load(cls) -> "Settings":
-        """設定を読み込み"""
+        """設定を読み込み
+        
+        設定スナップショット（settings_snapshot）の保持している設定を返す。
+        ファイルが変更されていなければ再読み込みは行わず、同じ（変更できない）
+        インスタンスを返す。
+        """
+        try:
+            from settings_snapshot import settings_snapshot
+            return settings_snapshot.settings()
+        except Exception as e:
+            print(f"設定読み込みエラー: {e}")
+            # エラーが発生した場合はデフォルト値で初期化
+            return cls()
+    
+    @classmethod
+    def from_data(cls, settings_data: Dict[str, Any]) -> "Settings":
+        """settings.jsonの内容からSettingsを作成"""
         try:
-            # 設定マネージャーを使用して設定を読み込み
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            settings_manager = SettingsManager(base_dir)
-            settings_data = settings_manager.load_settings()
-            
             if not settings_data:
                 # 設定が空の場合はデフォルト値で初期化
                 return cls()
             
-            # 設定データを環境変数として設定（後方互換性のため）
-            for key, value in settings_data.items():
-                if key not in ["last_updated", "version"]:  # メタデータは除外
-                    os.environ[key] = str(value)
-            
+            settings_data = dict(settings_data)
             # 重要な設定値を明示的に設定
             if "USE_BROWSER" in settings_data:
                 settings_data["use_browser"] = settings_data["USE_BROWSER"]
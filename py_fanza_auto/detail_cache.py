@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from config import Settings
+from scrape import fetch_html, fetch_html_conditional
+
+
+DEFAULT_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "detail_cache.db")
+
+
+@dataclass
+class CachedPage:
+    """キャッシュ済みの詳細ページ"""
+    content_id: str
+    url: str
+    html: str
+    source: str  # "browser" または "http"
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def is_fresh(self, ttl_seconds: float) -> bool:
+        return time.time() - self.fetched_at < ttl_seconds
+
+
+class DetailCache:
+    """DMM詳細ページのHTMLキャッシュ
+
+    content_idとURLをキーに、取得したHTMLをzlib圧縮してSQLiteに保存する。
+    TTL内のページはローカルから返し、TTLを過ぎたページはHTTP取得分ならETag/Last-Modifiedで
+    再検証（304なら保存済みのHTMLをそのまま使う）、Chrome取得分は取得し直す。
+    取得に失敗した場合は期限切れでも保存済みのHTMLを返す。
+    """
+
+    # 期限切れ後もこの倍数の期間が過ぎるまでは再検証・障害時用に保持する
+    KEEP_FACTOR = 4
+
+    def __init__(self, db_path: Optional[str] = None, ttl_hours: float = 24):
+        self.db_path = db_path or DEFAULT_CACHE_DB
+        self.ttl_seconds = ttl_hours * 3600
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._init_database()
+        self.prune()
+
+    def _init_database(self):
+        """データベースを初期化"""
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    content_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    html BLOB NOT NULL,
+                    source TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (content_id, url)
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages(fetched_at)')
+            self._conn.commit()
+
+    def get(self, content_id: str, url: str) -> Optional[CachedPage]:
+        """保存済みのページを取得（期限切れも含む）"""
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT html, source, etag, last_modified, fetched_at FROM pages WHERE content_id = ? AND url = ?
+            ''', (content_id or "", url)).fetchone()
+        if not row:
+            return None
+        html, source, etag, last_modified, fetched_at = row
+        try:
+            text = zlib.decompress(html).decode("utf-8")
+        except Exception as e:
+            print(f"詳細ページキャッシュ読み込みエラー: {e}")
+            return None
+        return CachedPage(content_id or "", url, text, source, etag, last_modified, fetched_at)
+
+    def put(self, content_id: str, url: str, html: str, source: str,
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """ページを保存"""
+        data = zlib.compress(html.encode("utf-8"), 6)
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO pages (content_id, url, html, source, etag, last_modified, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (content_id or "", url, data, source, etag, last_modified, time.time()))
+            self._conn.commit()
+
+    def _touch(self, content_id: str, url: str):
+        with self._lock:
+            self._conn.execute('UPDATE pages SET fetched_at = ? WHERE content_id = ? AND url = ?',
+                               (time.time(), content_id or "", url))
+            self._conn.commit()
+
+    def invalidate(self, content_id: str):
+        """アイテムのキャッシュを削除（次回は必ず取得し直す）"""
+        with self._lock:
+            self._conn.execute('DELETE FROM pages WHERE content_id = ?', (content_id or "",))
+            self._conn.commit()
+
+    def prune(self):
+        """保持期間を過ぎたページを削除"""
+        cutoff = time.time() - self.ttl_seconds * self.KEEP_FACTOR
+        try:
+            with self._lock:
+                self._conn.execute('DELETE FROM pages WHERE fetched_at < ?', (cutoff,))
+                self._conn.commit()
+        except Exception as e:
+            print(f"詳細ページキャッシュ整理エラー: {e}")
+
+    def fetch(self, url: str, content_id: str = "", settings: Optional[Settings] = None) -> str:
+        """キャッシュを使って詳細ページのHTMLを取得"""
+        cached = self.get(content_id, url)
+        if cached and cached.is_fresh(self.ttl_seconds):
+            self._hits += 1
+            print(f"詳細ページキャッシュ: ヒット {content_id or url}")
+            return cached.html
+
+        use_browser = bool(settings and getattr(settings, "use_browser", False))
+        try:
+            if not use_browser and cached and cached.source == "http" and (cached.etag or cached.last_modified):
+                # HTTP取得分は条件付きリクエストで再検証
+                status, html, etag, last_modified = fetch_html_conditional(url, cached.etag, cached.last_modified)
+                if status == 304:
+                    self._revalidated += 1
+                    self._touch(content_id, url)
+                    print(f"詳細ページキャッシュ: 再検証OK(304) {content_id or url}")
+                    return cached.html
+                self._misses += 1
+                self.put(content_id, url, html, "http", etag, last_modified)
+                return html
+
+            self._misses += 1
+            if use_browser:
+                html = fetch_html(url, settings=settings)
+                if html:
+                    self.put(content_id, url, html, "browser")
+                return html
+            status, html, etag, last_modified = fetch_html_conditional(url)
+            self.put(content_id, url, html, "http", etag, last_modified)
+            return html
+        except Exception as e:
+            if cached:
+                print(f"詳細ページ取得エラーのため期限切れのキャッシュを使用: {e}")
+                return cached.html
+            raise
+
+    def get_stats(self) -> dict:
+        """ヒット数・取得数・再検証数"""
+        return {"hits": self._hits, "misses": self._misses, "revalidated": self._revalidated}
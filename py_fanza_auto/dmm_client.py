@@ -1,11 +1,104 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 import requests
 import time
 import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
+from concurrency import budget
+import metrics_exporter
+from media_buffer import MediaBuffer, SPOOL_THRESHOLD
+
+
+DEFAULT_CODE_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "dmm_code_cache.json")
+
+# 品番の解決で試すフロア（上から順に試す）
+DEFAULT_RESOLVE_FLOORS: Tuple[Tuple[str, str, str], ...] = (
+    ("FANZA", "digital", "videoc"),
+    ("FANZA", "digital", "videoa"),
+)
+
+# メディアのダウンロードで送るヘッダー
+MEDIA_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Referer': 'https://www.dmm.co.jp/',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,ja;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# content_id形式（小文字英数字と_のみで数字を含む）の品番
+_CID_PATTERN = re.compile(r"^(?=.*\d)[a-z0-9_]+$")
+
+
+class CodeLookupCache:
+    """品番→DMMアイテムの解決結果のキャッシュ
+
+    見つかった結果と見つからなかった結果の両方を保存し、同じ品番を何度リライトしても
+    APIを呼ばないようにする。見つからなかった結果は新作の登録に備えて短めに保持する。
+    """
+
+    POSITIVE_TTL = 7 * 24 * 3600
+    NEGATIVE_TTL = 24 * 3600
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file or DEFAULT_CODE_CACHE_FILE
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"品番キャッシュ読み込みエラー: {e}")
+        return {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """有効なキャッシュを取得（なければNone。見つからなかった結果はitemがNone）"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        ttl = self.POSITIVE_TTL if entry.get("item") else self.NEGATIVE_TTL
+        if time.time() - entry.get("cached_at", 0) > ttl:
+            return None
+        return entry
+
+    def put(self, key: str, floor: Optional[str], item: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._entries[key] = {"floor": floor, "item": item, "cached_at": time.time()}
+            self._dirty = True
+
+    def save(self):
+        """変更があればファイルに保存（期限切れのものは削除）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if now - entry.get("cached_at", 0) <= (self.POSITIVE_TTL if entry.get("item") else self.NEGATIVE_TTL)
+            }
+            data = dict(self._entries)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            print(f"品番キャッシュ保存エラー: {e}")
 
 
 @dataclass
@@ -16,6 +109,9 @@ class DMMClient:
     timeout: int = 30
     max_retries: int = 3
     retry_delay: float = 1.0
+    code_cache: Optional[CodeLookupCache] = field(default=None, repr=False)
+    # 起動スナップショットから読み込んだフロア一覧（あればキャッシュファイルより優先）
+    floor_snapshot: Optional[Dict[str, Any]] = field(default=None, repr=False)
 
     def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """APIリクエストを実行（リトライ機能付き）"""
@@ -32,38 +128,18 @@ class DMMClient:
                 full_url = f"{url}?{urlencode(params)}"
                 print(f"完全なURL: {full_url}")
                 
-                res = requests.get(url, params=params, timeout=self.timeout)
-                
-                # HTTPステータスコードをチェック
-                if res.status_code != 200:
-                    print(f"HTTPエラー: {res.status_code} - {res.text}")
-                    if res.status_code == 401:
-                        raise Exception("API認証エラー: API IDまたはAffiliate IDが無効です")
-                    elif res.status_code == 403:
-                        raise Exception("APIアクセス拒否: 権限が不足しています")
-                    elif res.status_code == 429:
-                        raise Exception("API制限: リクエスト数が上限に達しました")
-                    else:
-                        raise Exception(f"HTTPエラー {res.status_code}: {res.text}")
-                
-                # レスポンスの内容をチェック
+                # プロセス全体で共有するレート制限
+                budget.dmm_rate.acquire()
+                started = time.perf_counter()
                 try:
-                    result = res.json()
-                except json.JSONDecodeError as e:
-                    print(f"JSONデコードエラー: {res.text}")
-                    raise Exception(f"APIレスポンスがJSON形式ではありません: {res.text}")
-                
-                # DMM APIのエラーレスポンスをチェック
-                if "error" in result:
-                    error_info = result["error"]
-                    error_msg = f"DMM APIエラー: {error_info.get('message', 'Unknown error')}"
-                    if 'code' in error_info:
-                        error_msg += f" (コード: {error_info['code']})"
-                    raise Exception(error_msg)
+                    res = requests.get(url, params=params, timeout=self.timeout)
+                except requests.exceptions.RequestException:
+                    metrics_exporter.dmm_requests.inc(path, "error")
+                    raise
+                metrics_exporter.dmm_request_seconds.observe(time.perf_counter() - started, path)
+                metrics_exporter.dmm_requests.inc(path, "ok" if res.status_code == 200 else str(res.status_code))
                 
-                print(f"APIレスポンス取得成功: {path}")
-                print(f"レスポンス件数: {len(result.get('result', {}).get('items', []))}")
-                return result
+                return self._check_response(path, res)
                 
             except requests.exceptions.Timeout as e:
                 last_exception = e
@@ -92,6 +168,39 @@ class DMMClient:
             error_msg += f" - エラー: {last_exception}"
         raise Exception(error_msg)
 
+    def _check_response(self, path: str, res: Any) -> Dict[str, Any]:
+        """APIレスポンスを検証してJSONを返す（非同期クライアントと共通。resはstatus_code・text・json()を持つもの）"""
+        # HTTPステータスコードをチェック
+        if res.status_code != 200:
+            print(f"HTTPエラー: {res.status_code} - {res.text}")
+            if res.status_code == 401:
+                raise Exception("API認証エラー: API IDまたはAffiliate IDが無効です")
+            elif res.status_code == 403:
+                raise Exception("APIアクセス拒否: 権限が不足しています")
+            elif res.status_code == 429:
+                raise Exception("API制限: リクエスト数が上限に達しました")
+            else:
+                raise Exception(f"HTTPエラー {res.status_code}: {res.text}")
+
+        # レスポンスの内容をチェック
+        try:
+            result = res.json()
+        except json.JSONDecodeError as e:
+            print(f"JSONデコードエラー: {res.text}")
+            raise Exception(f"APIレスポンスがJSON形式ではありません: {res.text}")
+
+        # DMM APIのエラーレスポンスをチェック
+        if "error" in result:
+            error_info = result["error"]
+            error_msg = f"DMM APIエラー: {error_info.get('message', 'Unknown error')}"
+            if 'code' in error_info:
+                error_msg += f" (コード: {error_info['code']})"
+            raise Exception(error_msg)
+
+        print(f"APIレスポンス取得成功: {path}")
+        print(f"レスポンス件数: {len(result.get('result', {}).get('items', []))}")
+        return result
+
     def item_list(
         self,
         site: str,
@@ -106,6 +215,24 @@ class DMMClient:
         hits: int = 100,
         offset: int = 1,
     ) -> Dict[str, Any]:
+        return self._get("ItemList", self.item_list_params(
+            site, service, floor, keyword, sort, gte_date, lte_date, article, article_id, hits, offset))
+
+    def item_list_params(
+        self,
+        site: str,
+        service: str,
+        floor: str,
+        keyword: str = "",
+        sort: str = "date",
+        gte_date: Optional[str] = None,
+        lte_date: Optional[str] = None,
+        article: Optional[str] = None,
+        article_id: Optional[str] = None,
+        hits: int = 100,
+        offset: int = 1,
+    ) -> Dict[str, Any]:
+        """ItemListのパラメータを作成（非同期クライアントと共通）"""
         params: Dict[str, Any] = {
             "api_id": self.api_id,
             "affiliate_id": self.affiliate_id,
@@ -125,7 +252,99 @@ class DMMClient:
             params["gte_date"] = gte_date
         if lte_date:
             params["lte_date"] = lte_date
-        return self._get("ItemList", params)
+        return params
+
+    def _lookup_code(self, code: str, floors: Sequence[Tuple[str, str, str]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """1つの品番をフロア順に検索し、(フロア, アイテム) を返す（見つからなければ (None, None)）
+
+        content_id形式の品番はまず全フロアをcid指定で完全一致検索し、見つからない場合や
+        それ以外の品番はキーワード検索する。
+        """
+        attempts = [(floor, {"keyword": code}) for floor in floors]
+        if _CID_PATTERN.match(code):
+            attempts = [(floor, {"cid": code}) for floor in floors] + attempts
+        errors = 0
+        for (site, service, floor), extra in attempts:
+            params: Dict[str, Any] = {
+                "api_id": self.api_id,
+                "affiliate_id": self.affiliate_id,
+                "site": site,
+                "service": service,
+                "floor": floor,
+                "hits": 1,
+                "output": "json",
+            }
+            params.update(extra)
+            try:
+                items = self._get("ItemList", params).get("result", {}).get("items") or []
+            except Exception as e:
+                errors += 1
+                print(f"品番 {code} {floor}検索エラー: {e}")
+                continue
+            if items:
+                return floor, items[0]
+        if errors:
+            # 検索エラーがあった場合は「見つからない」と確定できないので例外にする
+            raise Exception(f"品番 {code} の検索でエラーが発生しました")
+        return None, None
+
+    def resolve_codes(self, codes: Iterable[str], floors: Sequence[Tuple[str, str, str]] = DEFAULT_RESOLVE_FLOORS,
+                      max_workers: int = 4, use_cache: bool = True,
+                      on_progress: Optional[Callable[[int, int], None]] = None,
+                      save_every: int = 50) -> Dict[str, Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+        """品番のリストをまとめてDMMアイテムに解決する
+
+        重複を除いた品番をmax_workers件ずつ並列に検索する（リクエスト間隔はプロセス全体で
+        共有するレート制限に従う）。結果は {品番: (フロア, アイテム)} で、見つからなかった
+        品番は (None, None)、検索エラーになった品番は結果に含めない。
+        見つかった結果・見つからなかった結果の両方をキャッシュし、次回以降は再検索しない。
+        キャッシュはsave_every件ごとにも保存するので、途中で止まっても検索済みの分は残る。
+        on_progressには (処理済み件数, 全件数) が渡される。
+        """
+        if use_cache and self.code_cache is None:
+            self.code_cache = CodeLookupCache()
+        floors_key = ",".join(floor for _, _, floor in floors)
+        results: Dict[str, Tuple[Optional[str], Optional[Dict[str, Any]]]] = {}
+        pending: List[str] = []
+        for code in dict.fromkeys(code for code in codes if code):
+            cached = self.code_cache.get(f"{floors_key}|{code}") if use_cache else None
+            if cached is not None:
+                results[code] = (cached.get("floor"), cached.get("item"))
+            else:
+                pending.append(code)
+        print(f"品番解決: {len(results)}件はキャッシュから取得、{len(pending)}件を検索")
+        total = len(results) + len(pending)
+        done = len(results)
+        if on_progress:
+            on_progress(done, total)
+
+        def lookup(code: str):
+            try:
+                return code, self._lookup_code(code, floors), None
+            except Exception as e:
+                return code, None, e
+
+        if pending:
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                    for code, result, error in executor.map(lookup, pending):
+                        done += 1
+                        if error is None:
+                            results[code] = result
+                            if use_cache:
+                                self.code_cache.put(f"{floors_key}|{code}", result[0], result[1])
+                                if save_every > 0 and done % save_every == 0:
+                                    self.code_cache.save()
+                        if on_progress:
+                            on_progress(done, total)
+            finally:
+                if use_cache:
+                    self.code_cache.save()
+        return results
+
+    def resolve_code(self, code: str, floors: Sequence[Tuple[str, str, str]] = DEFAULT_RESOLVE_FLOORS) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """1つの品番をDMMアイテムに解決する（resolve_codesを参照）"""
+        return self.resolve_codes([code], floors, max_workers=1).get(code, (None, None))
 
     def test_connection(self) -> Dict[str, Any]:
         """DMM APIの接続テスト"""
@@ -178,6 +397,9 @@ class DMMClient:
 
     def floor_list(self, use_cache: bool = True, cache_file: str = "floor_cache.json") -> Dict[str, Any]:
         """フロア一覧を取得（キャッシュ機能付き）"""
+        if use_cache and self.floor_snapshot:
+            return self.floor_snapshot
+        
         # キャッシュファイルのパス
         cache_path = Path(cache_file)
         
@@ -220,6 +442,7 @@ class DMMClient:
                 except Exception as e:
                     print(f"キャッシュ保存エラー: {e}")
             
+            self.floor_snapshot = result
             return result
             
         except Exception as e:
@@ -324,17 +547,21 @@ class DMMClient:
 
     def download_media(self, url: str, headers: Optional[Dict[str, str]] = None, max_retries: int = 3) -> Optional[bytes]:
         """メディアファイルをダウンロードする（リトライ機能付き）"""
+        media = self.download_media_stream(url, headers, max_retries)
+        if not media:
+            return None
+        with media:
+            return media.getvalue()
+
+    def download_media_stream(self, url: str, headers: Optional[Dict[str, str]] = None, max_retries: int = 3,
+                              spool_threshold: int = SPOOL_THRESHOLD) -> Optional[MediaBuffer]:
+        """メディアファイルをMediaBufferにダウンロードする（リトライ機能付き）
+
+        spool_thresholdを超える大きさのメディアは一時ファイルに書き出し、メモリに全体を保持しない。
+        """
         for attempt in range(max_retries):
             try:
-                default_headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Referer': 'https://www.dmm.co.jp/',
-                    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9,ja;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1'
-                }
+                default_headers = dict(MEDIA_HEADERS)
                 
                 if headers:
                     default_headers.update(headers)
@@ -348,16 +575,18 @@ class DMMClient:
                 if not content_type.startswith('image/'):
                     print(f"download_media: 警告 - Content-Typeが画像ではありません: {content_type}")
                 
-                # ストリーミングでダウンロード
-                media_bytes = b""
-                for chunk in response.iter_content(chunk_size=8192):
+                # ストリーミングでダウンロード（チャンクを連結せずに追記）
+                media = MediaBuffer(spool_threshold)
+                for chunk in response.iter_content(chunk_size=64 * 1024):
                     if chunk:
-                        media_bytes += chunk
+                        media.write(chunk)
                 
-                if media_bytes:
-                    print(f"download_media: ダウンロード完了: {len(media_bytes)}バイト")
-                    return media_bytes
+                if media:
+                    location = "一時ファイル" if media.spooled_to_disk else "メモリ"
+                    print(f"download_media: ダウンロード完了: {len(media)}バイト（{location}）")
+                    return media.rewind()
                 else:
+                    media.close()
                     print(f"download_media: ダウンロード失敗 - データが受信されませんでした")
                     if attempt < max_retries - 1:
                         print(f"download_media: リトライ中... ({attempt + 2}/{max_retries})")
@@ -1,7 +1,11 @@
 from __future__ import annotations
+import asyncio
+import functools
 import json
 import os
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
@@ -9,12 +13,29 @@ from config import Settings
 from dmm_client import DMMClient
 from wp_client import WordPressClient
 from template import Renderer
-from scrape import fetch_html, extract_description_and_images, extract_specific_elements
+from scrape import fetch_html, extract_specific_elements
 import requests
 from settings_manager import SettingsManager
 from category_manager import CategoryManager
+from taxonomy import TaxonomyBatcher
 from scheduler import Scheduler
 from log_manager import LogManager, LogType, LogLevel
+from concurrency import budget
+from run_journal import RunJournal, JournalEntry, ItemState
+from detail_cache import DetailCache
+from media_buffer import MediaBuffer, close_media
+from image_preprocess import ImagePreprocessor
+from settings_snapshot import settings_snapshot
+from run_metrics import MetricsStore, RunMetrics, NULL_METRICS
+from warm_state import WarmState
+import metrics_exporter
+import profiling
+
+
+def _is_not_found(error: Exception) -> bool:
+    """WordPressが404・410（投稿が存在しない）を返したエラーか"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in (404, 410)
 
 
 @dataclass
@@ -93,18 +114,138 @@ class Engine:
     scheduler: Scheduler
     log_manager: LogManager
     main_gui: Optional[Any] = None  # GUIへの参照
+    journal: Optional[RunJournal] = None  # 実行ジャーナル（異常終了後の再開用）
+    detail_cache: Optional[DetailCache] = None  # 詳細ページのHTMLキャッシュ
+    image_preprocessor: Optional[ImagePreprocessor] = None  # アイキャッチ画像の前処理（無効ならNone）
+    taxonomy: Optional[TaxonomyBatcher] = None  # カテゴリ・タグの作成と割り当て
+    metrics_store: Optional[MetricsStore] = None  # 実行ごとの計測値の保存先
+    warm_state: Optional[WarmState] = None  # 起動スナップショット（無効ならNone）
+    _warm_floors: Optional[Dict[str, Any]] = field(default=None, repr=False)  # スナップショットから読み込んだフロア一覧
     _posting_settings_cache: Optional[Dict[str, PostingSettings]] = None
     _cache_timestamp: Optional[datetime] = None
+    _cache_version: Optional[int] = None  # キャッシュ作成時の設定スナップショットのバージョン
+    _settings_version: Optional[int] = None
     _cache_ttl: timedelta = timedelta(minutes=5)
+    # 投稿設定を並列実行するため、アイテム単位の作業状態はスレッドごとに保持
+    _local: threading.local = field(default_factory=threading.local, repr=False)
+
+    @property
+    def _chrome_description(self) -> str:
+        return getattr(self._local, 'chrome_description', "")
+
+    @_chrome_description.setter
+    def _chrome_description(self, value: str):
+        self._local.chrome_description = value
+
+    @property
+    def _chrome_review(self) -> str:
+        return getattr(self._local, 'chrome_review', "")
+
+    @_chrome_review.setter
+    def _chrome_review(self, value: str):
+        self._local.chrome_review = value
+
+    @property
+    def last_post_error(self) -> Optional[str]:
+        """このスレッドで最後に実行したpost_oneが失敗としてNoneを返した場合の理由（重複のスキップはNone）"""
+        return getattr(self._local, 'post_error', None)
+
+    @property
+    def _metrics(self):
+        """このスレッドで実行中の計測値（計測中でなければ何もしない計測値）"""
+        return getattr(self._local, 'metrics', None) or NULL_METRICS
+
+    def _begin_metrics(self, kind: str, post_setting: str = "") -> RunMetrics:
+        metrics = RunMetrics(kind, post_setting)
+        self._local.metrics = metrics
+        return metrics
+
+    def _end_metrics(self, metrics: RunMetrics):
+        self._local.metrics = None
+        self._local.last_run_id = metrics.run_id
+        metrics.finish()
+        if self.metrics_store:
+            self.metrics_store.record(metrics)
+        self._save_warm_state()
+
+    def _load_warm_state(self) -> List[str]:
+        """起動スナップショットを読み込み、期限切れで取得し直すコンポーネントを返す"""
+        if not self.warm_state:
+            return []
+        stale = []
+        floors, fresh = self.warm_state.get("floors")
+        if floors:
+            self.dmm.floor_snapshot = floors
+            self._warm_floors = floors
+            if not fresh:
+                stale.append("floors")
+        terms, fresh = self.warm_state.get("terms")
+        if terms and self.taxonomy:
+            self.taxonomy.load_snapshot(terms)
+            if not fresh:
+                stale.append("terms")
+        print(f"起動スナップショット: floors={'あり' if floors else 'なし'} terms={'あり' if terms else 'なし'} 取得し直すもの={stale}")
+        return stale
+
+    def _refresh_warm_state(self, stale: List[str]):
+        """期限切れのコンポーネントを取得し直して保存（起動後にバックグラウンドで実行）"""
+        try:
+            if "floors" in stale:
+                self.dmm.floor_list(use_cache=False)
+            if "terms" in stale and self.taxonomy:
+                for taxonomy in self.warm_state.get("terms")[0] or {}:
+                    count = self.taxonomy.refresh(taxonomy)
+                    print(f"起動スナップショット: {taxonomy} {count}件を取得し直しました")
+            self._save_warm_state()
+        except Exception as e:
+            print(f"起動スナップショット更新エラー: {e}")
+
+    def _forget_post(self, slug: Optional[str]):
+        """WordPress側で削除・ゴミ箱移動されていた投稿のスラッグを起動スナップショットから削除"""
+        if self.warm_state and slug:
+            self.warm_state.forget_post(slug)
+
+    def _save_warm_state(self):
+        """フロア一覧とカテゴリ・タグのIDを起動スナップショットに保存"""
+        if not self.warm_state:
+            return
+        try:
+            floors = self.dmm.floor_snapshot
+            if floors:
+                self.warm_state.put("floors", floors, fetched=floors is not self._warm_floors)
+            if self.taxonomy:
+                terms = self.taxonomy.snapshot()
+                if terms:
+                    self.warm_state.put("terms", terms, fetched=set(terms) <= self.taxonomy.fetched)
+            self.warm_state.save()
+        except Exception as e:
+            print(f"起動スナップショット保存エラー: {e}")
+
+    def run_profiled(self, kind: str, func, *args, **kwargs) -> Tuple[Any, str]:
+        """funcをcProfileで計測しながら実行し、(戻り値, 累積時間の上位の要約) を返す
+
+        結果は実行計測と同じ実行IDで config/profiles に保存し、上位は実行レポートにも記録する。
+        """
+        self._local.last_run_id = None
+        result, profiler = profiling.run_profiled(func, *args, **kwargs)
+        run_id = getattr(self._local, 'last_run_id', None) or f"{kind}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        path, summary = profiling.save_profile(profiler, run_id)
+        if self.metrics_store:
+            self.metrics_store.record_profile(run_id, kind, path, profiling.hotspots(profiler))
+        return result, summary
 
     @classmethod
-    def from_settings(cls, s: Settings) -> "Engine":
+    def from_settings(cls, s: Settings, start_scheduler: bool = True) -> "Engine":
         # SettingsManagerのインスタンスを作成
         base_dir = os.path.dirname(os.path.abspath(__file__))
         settings_manager = SettingsManager(base_dir)
         
-        # 新しい機能のインスタンスを作成
-        category_manager = CategoryManager(settings_manager)
+        # 並列実行時の共有枠（Chrome・DMM API・WordPress書き込み）を設定
+        budget.configure_from_settings(s)
+        
+        # 新しい機能のインスタンスを作成（カテゴリ管理はWordPressクライアントを使う）
+        wp = WordPressClient(s.wp_base_url, s.wp_username, s.wp_app_password, http2=s.wp_http2)
+        category_manager = CategoryManager(wp)
         
         # Scheduler用のデフォルト設定を作成
         from scheduler import ScheduleConfig
@@ -120,22 +261,55 @@ class Engine:
         engine_instance = cls(
             settings=s,
             dmm=DMMClient(s.dmm_api_id, s.dmm_affiliate_id),
-            wp=WordPressClient(s.wp_base_url, s.wp_username, s.wp_app_password),
+            wp=wp,
             renderer=Renderer(),
             settings_manager=settings_manager,
             category_manager=category_manager,
             scheduler=scheduler,
             log_manager=LogManager(log_dir=str(base_dir)),
+            journal=RunJournal(),
+            detail_cache=DetailCache(ttl_hours=s.detail_cache_ttl_hours) if s.detail_cache_enabled else None,
+            image_preprocessor=ImagePreprocessor.from_settings(s),
+            taxonomy=TaxonomyBatcher(wp),
+            metrics_store=MetricsStore(),
+            warm_state=WarmState() if s.warm_state_enabled else None,
         )
         
+        # 起動スナップショットを読み込み、期限切れのものは起動後にバックグラウンドで取得し直す
+        stale = engine_instance._load_warm_state()
+        if stale:
+            threading.Thread(target=engine_instance._refresh_warm_state, args=(stale,),
+                             name="warm-state-refresh", daemon=True).start()
+        
         # スケジューラーにエンジンオブジェクトを設定
         scheduler.engine = engine_instance
         
-        # スケジューラーを開始
-        scheduler.start()
+        # スケジューラーを開始（ワーカープロセスなどでは開始しない）
+        if start_scheduler:
+            scheduler.start()
+            # ログの保守処理も常駐するプロセスでのみ行う
+            engine_instance.log_manager.start_maintenance()
+            # 常駐するプロセスでのみメトリクスを公開（ワーカーが同じポートを取り合わないように）
+            if s.metrics_exporter_enabled:
+                metrics_exporter.registry.start(s.metrics_exporter_port, s.metrics_exporter_host)
         
         return engine_instance
 
+    def close(self):
+        """終了時の後片付け（画像前処理のプロセスプールを停止）"""
+        if self.image_preprocessor is not None:
+            self.image_preprocessor.shutdown()
+
+    def refresh_settings(self) -> bool:
+        """設定スナップショットが更新されていればエンジンの設定を差し替える"""
+        snapshot = settings_snapshot.get()
+        if self._settings_version == snapshot.version:
+            return False
+        self.settings = snapshot.settings
+        self._settings_version = snapshot.version
+        budget.configure_from_settings(snapshot.settings)
+        return True
+
     def _get_default_posting_settings(self) -> PostingSettings:
         """デフォルトの投稿設定を取得"""
         # 基本設定から値を取得（存在しない場合はデフォルト値を使用）
@@ -189,11 +363,13 @@ class Engine:
         """投稿設定を読み込み"""
         print(f"_load_posting_settings: ファイルから設定{post_setting_num}を読み込み")
         
-        # キャッシュをチェック
+        # キャッシュをチェック（設定ファイルが変わるまで有効）
+        snapshot = settings_snapshot.get()
+        if self._cache_version != snapshot.version:
+            self._posting_settings_cache = None
+            self._cache_version = snapshot.version
         if (self._posting_settings_cache and 
-            post_setting_num in self._posting_settings_cache and
-            self._cache_timestamp and 
-            (datetime.now() - self._cache_timestamp).seconds < 300):  # 5分間キャッシュ
+            post_setting_num in self._posting_settings_cache):
             print(f"_load_posting_settings: キャッシュから設定{post_setting_num}を取得")
             return self._posting_settings_cache[post_setting_num]
         
@@ -204,16 +380,10 @@ class Engine:
         else:
             actual_setting_num = post_setting_num
         
-        # 優先度1: config/post_settings.jsonから直接読み込み
+        # 優先度1: config/post_settings.json（設定スナップショットが保持）
         try:
-            import json
-            import os
-            post_settings_file = os.path.join(os.path.dirname(__file__), 'config', 'post_settings.json')
-            print(f"_load_posting_settings: post_settings.jsonファイルパス: {post_settings_file}")
-            if os.path.exists(post_settings_file):
-                with open(post_settings_file, 'r', encoding='utf-8') as f:
-                    post_settings_data = json.load(f)
-                print(f"_load_posting_settings: post_settings.jsonから読み込み成功")
+            post_settings_data = snapshot.post_settings
+            if post_settings_data:
                 print(f"_load_posting_settings: ファイル内容のキー: {list(post_settings_data.keys())}")
                 if 'post_settings' in post_settings_data and actual_setting_num in post_settings_data['post_settings']:
                     setting_data = post_settings_data['post_settings'][actual_setting_num]
@@ -357,12 +527,12 @@ class Engine:
                 break
         return items[: posting_settings.hits], total_count
 
-    def download_media(self, url: str) -> Optional[bytes]:
-        """URLからメディアをダウンロードする"""
+    def download_media(self, url: str) -> Optional[MediaBuffer]:
+        """URLからメディアをダウンロードする（大きいメディアは一時ファイルに保持）"""
         try:
-            # DMMクライアントのdownload_mediaメソッドを使用
+            # DMMクライアントのdownload_media_streamメソッドを使用
             print(f"download_media: ダウンロード開始: {url}")
-            media_bytes = self.dmm.download_media(url)
+            media_bytes = self.dmm.download_media_stream(url)
             if media_bytes:
                 print(f"download_media: ダウンロード完了: {len(media_bytes)}バイト")
             else:
@@ -372,7 +542,7 @@ class Engine:
             print(f"download_media: ダウンロードエラー: {e}")
             return None
 
-    def build_content(self, item: Dict[str, Any], posting_settings: Optional[PostingSettings] = None) -> Tuple[str, str, Optional[bytes], Optional[str]]:
+    def build_content(self, item: Dict[str, Any], posting_settings: Optional[PostingSettings] = None) -> Tuple[str, str, Optional[MediaBuffer], Optional[str]]:
         try:
             print(f"build_content: 開始: {item.get('title', 'No title')}")
             
@@ -391,15 +561,20 @@ class Engine:
                     if detail_url:
                         print(f"build_content: Chromeで詳細情報を取得中: {detail_url}")
                         # GUIの設定を使用（設定ファイルから読み込み）
-                        browser_settings = Settings.load()
+                        browser_settings = settings_snapshot.settings()
                         print(f"build_content: ブラウザ設定読み込み - headless={browser_settings.headless}, use_browser={browser_settings.use_browser}")
                         print(f"build_content: 設定オブジェクト詳細 - {browser_settings}")
                         
-                        # ChromeでHTMLを取得
-                        html = fetch_html(detail_url, settings=browser_settings)
+                        # ChromeでHTMLを取得（キャッシュがあればローカルから読み込む）
+                        if self.detail_cache is not None:
+                            html = self.detail_cache.fetch(detail_url, item.get('content_id', ''), settings=browser_settings)
+                        else:
+                            html = fetch_html(detail_url, settings=browser_settings)
                         if html:
                             # 説明文とレビューを抽出
-                            chrome_description, chrome_review = extract_specific_elements(html)
+                            # フロアごとの抽出プロファイルを使用
+                            profile = f"{item.get('service_code', '')}/{item.get('floor_code', '')}"
+                            chrome_description, chrome_review = extract_specific_elements(html, profile=profile)
                             print(f"build_content: Chrome取得完了 - 説明文: {len(chrome_description)}文字, レビュー: {len(chrome_review)}文字")
                             
                             # インスタンス変数に保存（LLM変数タグ処理で使用）
@@ -537,6 +712,9 @@ class Engine:
                     media_bytes = self.download_media(media_url)
                     if media_bytes:
                         print(f"build_content: メディアダウンロード完了: {len(media_bytes)}バイト")
+                        if self.image_preprocessor is not None:
+                            # アップロード前に縮小・再圧縮
+                            media_bytes, media_name = self.image_preprocessor.process(media_bytes, media_name)
                     else:
                         print(f"build_content: メディアダウンロード失敗 - データが受信されませんでした")
                         media_name = None
@@ -605,42 +783,43 @@ class Engine:
         html += '</table>'
         return html
 
-    def _extract_tags(self, item: Dict[str, Any]) -> List[str]:
-        """アイテムからタグを抽出する"""
-        tags = []
-        
-        # 出演者名をタグとして追加
-        actresses = item.get('actress', [])
-        for actress in actresses:
-            name = actress.get('name', '')
-            if name:
-                tags.append(name)
-        
-        # ジャンルをタグとして追加
-        genres = item.get('genre', [])
-        for genre in genres:
-            name = genre.get('name', '')
-            if name:
-                tags.append(name)
-        
-        # シリーズ名をタグとして追加
-        series = item.get('series', [])
-        for series_item in series:
-            name = series_item.get('name', '')
-            if name:
-                tags.append(name)
-        
-        # メーカー名をタグとして追加
-        maker = item.get('maker', {})
-        if maker and 'name' in maker:
-            tags.append(maker['name'])
-        
-        # レーベル名をタグとして追加
-        label = item.get('label', {})
-        if label and 'name' in label:
-            tags.append(label['name'])
-        
-        return tags
+    def _taxonomy_names(self, item: Dict[str, Any], posting_settings: PostingSettings) -> Dict[str, List[Tuple[str, str]]]:
+        """アイテムのカテゴリ・タグを {タクソノミー: [(名前, スラッグ)]} で返す
+
+        カテゴリ・タグの決め方はCategoryManagerと同じ（投稿設定のカテゴリ種別と自動タグ）で、
+        ここでは作成と割り当てをまとめて行うためにタームだけを求める。
+        """
+        categories = self.category_manager.category_terms_for_item(item, posting_settings.category)
+        return {
+            "categories": [(name, slug) for name, slug, _ in categories],
+            "tags": self.category_manager.tag_terms_for_item(item, "auto"),
+        }
+
+    def _prepare_taxonomy(self, items: List[Dict[str, Any]], posting_settings: PostingSettings):
+        """バッチ内のアイテムが使うカテゴリ・タグのうち未作成のものをまとめて作成する"""
+        if not self.taxonomy or not items:
+            return
+        try:
+            names: Dict[str, List[Tuple[str, str]]] = {"categories": [], "tags": []}
+            for item in items:
+                for taxonomy, item_names in self._taxonomy_names(item, posting_settings).items():
+                    names[taxonomy].extend(item_names)
+            with self._metrics.stage("taxonomy"):
+                self.taxonomy.prepare_items(names)
+        except Exception as e:
+            print(f"カテゴリ・タグの一括作成エラー: {e}")
+            self.log_manager.warning(LogType.CATEGORY, f"カテゴリ・タグの一括作成エラー: {e}")
+
+    def _taxonomy_payload(self, item: Dict[str, Any], posting_settings: PostingSettings) -> Dict[str, Any]:
+        """投稿の作成・更新データに含めるカテゴリ・タグIDを取得する（取得できなければ空）"""
+        if not self.taxonomy:
+            return {}
+        try:
+            return self.taxonomy.payload(self._taxonomy_names(item, posting_settings))
+        except Exception as e:
+            print(f"post_one: カテゴリ・タグ設定エラー: {e}")
+            self.log_manager.warning(LogType.CATEGORY, f"カテゴリ・タグ設定エラー: {e}")
+            return {}
 
     def _get_item_description(self, item: Dict[str, Any]) -> str:
         """アイテムから説明文を取得（複数のソースから）"""
@@ -711,187 +890,219 @@ class Engine:
             print(f"_get_item_description: 説明文内容: {description[:200]}...")
         return description.strip()
 
-    def post_one(self, item: Dict[str, Any], posting_settings: Optional[PostingSettings] = None) -> Optional[int]:
+    def post_one(self, item: Dict[str, Any], posting_settings: Optional[PostingSettings] = None,
+                 journal_entry: Optional[JournalEntry] = None) -> Optional[int]:
+        """1アイテムを投稿する
+        
+        journal_entryを渡すと各段階の完了を記録し、記録済みの段階（生成・投稿作成・
+        カテゴリ/タグ・アイキャッチ）は再実行せずに続きから処理する。
+        処理手順は_post_stepsで非同期版（_post_one_async）と共通にしている。
+        """
+        def run(op):
+            kind, target, args, kwargs = op
+            func = getattr(self.wp, target) if kind == "wp" else target
+            return func(*args, **kwargs)
+        
+        steps = self._post_steps(item, posting_settings, journal_entry)
+        value, error = None, None
+        while True:
+            try:
+                op = steps.throw(error) if error else steps.send(value)
+            except StopIteration as done:
+                return done.value
+            try:
+                value, error = run(op), None
+            except Exception as e:
+                value, error = None, e
+
+    def _apply_llm_vartags(self, content: str, item: Dict[str, Any]) -> str:
+        """GUIから実行している場合はLLM変数タグを処理する"""
+        print(f"post_one: LLM変数タグ処理開始")
+        if not self.main_gui:
+            print(f"post_one: main_guiが利用できないため、LLM変数タグ処理をスキップ")
+            return content
         try:
-            print(f"post_one: コンテンツ構築開始: {item.get('title', 'No title')}")
-            title, content, media_bytes, media_name = self.build_content(item, posting_settings)
-            
-            # LLM変数タグ処理
-            print(f"post_one: LLM変数タグ処理開始")
-            print(f"post_one: main_gui存在チェック: {hasattr(self, 'main_gui')}")
-            print(f"post_one: main_gui値: {self.main_gui}")
-            
-            if hasattr(self, 'main_gui') and self.main_gui:
-                try:
-                    # 説明文を複数のソースから取得
-                    description = self._get_item_description(item)
-                    print(f"post_one: 説明文長: {len(description) if description else 0}")
-                    print(f"post_one: 説明文内容: {description[:200] if description else 'None'}...")
-                    print(f"post_one: 処理前コンテンツ: {content[:100]}...")
-                    
-                    content = self.main_gui.process_llm_vartags(content, item, description)
-                    print(f"post_one: LLM変数タグ処理完了")
-                    print(f"post_one: 処理後コンテンツ: {content[:100]}...")
-                except Exception as e:
-                    print(f"post_one: LLM変数タグ処理エラー: {e}")
-                    import traceback
-                    print(f"post_one: エラー詳細: {traceback.format_exc()}")
-            else:
-                print(f"post_one: main_guiが利用できないため、LLM変数タグ処理をスキップ")
-            
-            print(f"post_one: タイトル: {title}")
-            print(f"post_one: コンテンツ長: {len(content)}")
-            
-            slug = item.get("content_id")
-            print(f"post_one: スラッグ: {slug}")
-            
-            # 投稿設定から上書き設定を取得
-            overwrite_enabled = False
-            if posting_settings:
-                overwrite_enabled = posting_settings.overwrite_existing
-            else:
+            # 説明文を複数のソースから取得
+            description = self._get_item_description(item)
+            print(f"post_one: 説明文長: {len(description) if description else 0}")
+            print(f"post_one: 処理前コンテンツ: {content[:100]}...")
+            content = self.main_gui.process_llm_vartags(content, item, description)
+            print(f"post_one: LLM変数タグ処理完了")
+            print(f"post_one: 処理後コンテンツ: {content[:100]}...")
+        except Exception as e:
+            print(f"post_one: LLM変数タグ処理エラー: {e}")
+            import traceback
+            print(f"post_one: エラー詳細: {traceback.format_exc()}")
+        return content
+
+    def _post_steps(self, item: Dict[str, Any], posting_settings: Optional[PostingSettings],
+                    journal_entry: Optional[JournalEntry]):
+        """1アイテムの投稿手順（post_oneと_post_one_asyncで共通）
+        
+        WordPressへのリクエストは ("wp", メソッド名, 引数, キーワード引数)、本文の生成など
+        時間のかかる処理は ("call", 関数, 引数, キーワード引数) をyieldし、呼び出し側が実行した
+        結果（例外の場合はthrow）を受け取って続ける。戻り値は投稿ID（重複・更新失敗はNone）。
+        """
+        def wp(method: str, *args, **kwargs):
+            return ("wp", method, args, kwargs)
+        
+        def call(func, *args, **kwargs):
+            return ("call", func, args, kwargs)
+        
+        media_bytes = None
+        metrics = self._metrics
+        metrics.count("scanned")
+        self._local.post_error = None
+        started = time.perf_counter()
+        try:
+            if posting_settings is None:
                 # 投稿設定が指定されていない場合は、デフォルト設定を使用
-                posting_settings = self._get_default_posting_settings() # デフォルト設定を使用
-                overwrite_enabled = posting_settings.overwrite_existing
+                posting_settings = self._get_default_posting_settings()
+            overwrite_enabled = posting_settings.overwrite_existing
+            slug = item.get("content_id")
+            print(f"post_one: スラッグ: {slug}, 上書き設定: {overwrite_enabled}")
             
-            print(f"post_one: 上書き設定: {overwrite_enabled}")
+            # ジャーナルに作成済みの投稿があれば、重複チェックと作成をせずに続きから処理
+            resumed_post_id = journal_entry.post_id if journal_entry and journal_entry.reached(ItemState.POST_CREATED) else None
             
-            # 重複チェックと上書き処理
+            # 本文を生成する前に重複をチェック（上書きしない重複なら生成とメディアの取得を省略）
             existing_post_id = None
-            if slug:
+            if slug and not resumed_post_id:
                 print(f"post_one: 重複チェック中...")
-                exists = self.wp.get_post_by_slug(slug)
+                # 上書きしない場合は、起動スナップショットに記録済みの投稿を問い合わせずに重複とする
+                known_post_id = self.warm_state.known_post(slug) if self.warm_state and not overwrite_enabled else None
+                exists = {"id": known_post_id} if known_post_id else (yield wp("get_post_by_slug", slug))
+                if exists and exists.get("status") == "trash":
+                    # ゴミ箱の投稿は重複として扱わない
+                    print(f"post_one: ゴミ箱の投稿のため新規作成します: ID {exists.get('id')}")
+                    exists = None
+                if not exists:
+                    self._forget_post(slug)
                 if exists:
                     existing_post_id = exists.get('id')
-                    if overwrite_enabled:
-                        print(f"post_one: 既存投稿を上書きします: ID {existing_post_id}")
-                        # 既存の投稿を更新
-                        try:
-                            # LLM変数タグ処理（更新時）
-                            print(f"post_one: 更新時LLM変数タグ処理開始")
-                            if hasattr(self, 'main_gui') and self.main_gui:
-                                try:
-                                    # 説明文を複数のソースから取得
-                                    description = self._get_item_description(item)
-                                    print(f"post_one: 更新時説明文長: {len(description) if description else 0}")
-                                    print(f"post_one: 更新時説明文内容: {description[:200] if description else 'None'}...")
-                                    print(f"post_one: 更新時処理前コンテンツ: {content[:100]}...")
-                                    
-                                    content = self.main_gui.process_llm_vartags(content, item, description)
-                                    print(f"post_one: 更新時LLM変数タグ処理完了")
-                                    print(f"post_one: 更新時処理後コンテンツ: {content[:100]}...")
-                                except Exception as e:
-                                    print(f"post_one: 更新時LLM変数タグ処理エラー: {e}")
-                                    import traceback
-                                    print(f"post_one: エラー詳細: {traceback.format_exc()}")
-                            else:
-                                print(f"post_one: 更新時main_guiが利用できないため、LLM変数タグ処理をスキップ")
-                            
-                            # 更新用のデータを準備
-                            update_data = {
-                                "title": title,
-                                "content": content,
-                                "status": posting_settings.status
-                            }
-                            
-                            print(f"post_one: 更新データ準備完了 - タイトル: {title}, ステータス: {update_data['status']}")
-                            
-                            # 投稿を更新
-                            updated_post = self.wp.update_post(existing_post_id, update_data)
-                            print(f"post_one: 既存投稿を更新しました: ID {existing_post_id}")
-                            
-                            # カテゴリとタグの設定（新規作成時と同様）
-                            try:
-                                if posting_settings.category == "jan":
-                                    # JANコードベースのカテゴリ設定
-                                    jan_code = item.get("JANCode")
-                                    if jan_code:
-                                        self.category_manager.set_categories_by_jan(existing_post_id, jan_code)
-                                        print(f"post_one: JANコードベースのカテゴリ設定完了: {jan_code}")
-                                elif posting_settings.category == "custom":
-                                    # カスタムカテゴリ設定
-                                    custom_categories = getattr(posting_settings, 'custom_categories', [])
-                                    if custom_categories:
-                                        self.category_manager.set_custom_categories(existing_post_id, custom_categories)
-                                        print(f"post_one: カスタムカテゴリ設定完了: {custom_categories}")
-                                
-                                # タグの設定
-                                tags = self._extract_tags(item)
-                                if tags:
-                                    self.wp.set_post_tags(existing_post_id, tags)
-                                    print(f"post_one: タグ設定完了: {tags}")
-                                    
-                            except Exception as e:
-                                print(f"post_one: カテゴリ・タグ設定エラー: {e}")
-                                self.log_manager.warning(LogType.CATEGORY, f"カテゴリ・タグ設定エラー: {e}")
-                            
-                            # サムネイルも更新
-                            if media_bytes and media_name:
-                                try:
-                                    self.wp.upload_media(media_name, media_bytes)
-                                    print(f"post_one: サムネイル更新完了")
-                                except Exception as e:
-                                    print(f"post_one: サムネイル更新エラー: {e}")
-                            
-                            # ログに記録
-                            self.log_manager.info(LogType.POSTING, f"投稿更新完了: ID {existing_post_id}, タイトル: {title}")
-                            
-                            return existing_post_id
-                        except Exception as e:
-                            print(f"post_one: 投稿更新エラー: {e}")
-                            import traceback
-                            print(f"post_one: エラー詳細: {traceback.format_exc()}")
-                            self.log_manager.error(LogType.ERROR, f"投稿更新エラー: {e}")
-                            return None
-                    else:
+                    if self.warm_state:
+                        self.warm_state.remember_post(slug, existing_post_id)
+                    if not overwrite_enabled:
                         print(f"post_one: 既に存在する投稿: {existing_post_id} (上書き無効)")
-                        self.log_manager.info(LogType.POSTING, f"既存投稿スキップ: ID {existing_post_id}, タイトル: {title}")
+                        metrics.count("duplicates")
+                        metrics_exporter.posts.inc("duplicate")
+                        self.log_manager.info(LogType.POSTING, f"既存投稿スキップ: ID {existing_post_id}, タイトル: {item.get('title', 'No title')}")
                         return None
                 else:
                     print(f"post_one: 重複なし、新規作成可能")
             
-            print(f"post_one: WordPressに投稿作成中...")
-            post_status = posting_settings.status if posting_settings else "publish"
-            post = self.wp.create_post(title=title, content=content, status=post_status, slug=slug)
-            post_id = int(post.get("id"))
-            print(f"post_one: 投稿作成成功: ID {post_id}")
+            if journal_entry and journal_entry.reached(ItemState.RENDERED):
+                print(f"post_one: ジャーナルの生成結果を再利用: {item.get('title', 'No title')}")
+                title, content, media_bytes, media_name = journal_entry.rendered()
+            else:
+                print(f"post_one: コンテンツ構築開始: {item.get('title', 'No title')}")
+                title, content, media_bytes, media_name = yield call(self._render_content, item, posting_settings)
+                if journal_entry:
+                    journal_entry.mark_rendered(title, content, media_bytes, media_name)
+            
+            print(f"post_one: タイトル: {title}")
+            print(f"post_one: コンテンツ長: {len(content)}")
             
-            # カテゴリとタグの設定
-            try:
-                if posting_settings.category == "jan":
-                    # JANコードベースのカテゴリ設定
-                    jan_code = item.get("JANCode")
-                    if jan_code:
-                        self.category_manager.set_categories_by_jan(post_id, jan_code)
-                        print(f"post_one: JANコードベースのカテゴリ設定完了: {jan_code}")
-                elif posting_settings.category == "custom":
-                    # カスタムカテゴリ設定
-                    custom_categories = getattr(posting_settings, 'custom_categories', [])
-                    if custom_categories:
-                        self.category_manager.set_custom_categories(post_id, custom_categories)
-                        print(f"post_one: カスタムカテゴリ設定完了: {custom_categories}")
-                
-                # タグの設定
-                tags = self._extract_tags(item)
-                if tags:
-                    self.wp.set_post_tags(post_id, tags)
-                    print(f"post_one: タグ設定完了: {tags}")
+            if existing_post_id:
+                print(f"post_one: 既存投稿を上書きします: ID {existing_post_id}")
+                try:
+                    # 更新用のデータを準備（カテゴリ・タグも同じリクエストで設定）
+                    update_data = {
+                        "title": title,
+                        "content": content,
+                        "status": posting_settings.status
+                    }
+                    update_data.update((yield call(self._taxonomy_payload, item, posting_settings)))
+                    with metrics.stage("wp_post"):
+                        yield wp("update_post", existing_post_id, update_data)
+                    metrics.count("updated")
+                    metrics_exporter.posts.inc("updated")
+                    print(f"post_one: 既存投稿を更新しました: ID {existing_post_id}")
                     
-            except Exception as e:
-                print(f"post_one: カテゴリ・タグ設定エラー: {e}")
-                self.log_manager.warning(LogType.CATEGORY, f"カテゴリ・タグ設定エラー: {e}")
+                    # サムネイルも更新
+                    if media_bytes and media_name:
+                        try:
+                            yield wp("upload_media", media_name, media_bytes)
+                            print(f"post_one: サムネイル更新完了")
+                        except Exception as e:
+                            print(f"post_one: サムネイル更新エラー: {e}")
+                    
+                    self.log_manager.info(LogType.POSTING, f"投稿更新完了: ID {existing_post_id}, タイトル: {title}")
+                    return existing_post_id
+                except Exception as e:
+                    if _is_not_found(e):
+                        # 記録していた投稿がWordPress側で削除されていたので新規作成する
+                        print(f"post_one: 既存投稿が見つからないため新規作成します: ID {existing_post_id}")
+                        self._forget_post(slug)
+                        existing_post_id = None
+                    else:
+                        self._local.post_error = f"投稿更新エラー: {e}"
+                        print(f"post_one: 投稿更新エラー: {e}")
+                        import traceback
+                        print(f"post_one: エラー詳細: {traceback.format_exc()}")
+                        self.log_manager.error(LogType.ERROR, f"投稿更新エラー: {e}")
+                        metrics.count("failed")
+                        metrics_exporter.posts.inc("failed")
+                        return None
             
-            if media_bytes and media_name:
-                print(f"post_one: メディアアップロード中: {media_name}")
-                media = self.wp.upload_media(media_name, media_bytes)
-                media_id = int(media.get("id"))
-                print(f"post_one: メディアアップロード成功: ID {media_id}")
-                
-                print(f"post_one: アイキャッチ画像設定中...")
-                self.wp.set_featured_media(post_id, media_id)
-                print(f"post_one: アイキャッチ画像設定完了")
+            if resumed_post_id:
+                post_id = resumed_post_id
+                print(f"post_one: ジャーナルから作成済みの投稿を再開: ID {post_id}")
             else:
-                print(f"post_one: メディアなし")
+                print(f"post_one: WordPressに投稿作成中...")
+                # カテゴリ・タグは作成データに含めて1回のリクエストで設定
+                taxonomy = yield call(self._taxonomy_payload, item, posting_settings)
+                with metrics.stage("wp_post"):
+                    post = yield wp("create_post", title=title, content=content, status=posting_settings.status,
+                                    slug=slug, **taxonomy)
+                post_id = int(post.get("id"))
+                if self.warm_state:
+                    self.warm_state.remember_post(slug, post_id)
+                metrics.count("created")
+                metrics_exporter.posts.inc("created")
+                print(f"post_one: 投稿作成成功: ID {post_id} (カテゴリ・タグ: {taxonomy})")
+                if journal_entry:
+                    journal_entry.mark(ItemState.POST_CREATED, post_id=post_id)
+                    journal_entry.mark(ItemState.TAXONOMY_SET)
+            
+            # 作成済みの投稿から再開した場合で、カテゴリ・タグが未設定なら設定
+            if journal_entry and not journal_entry.reached(ItemState.TAXONOMY_SET):
+                taxonomy = yield call(self._taxonomy_payload, item, posting_settings)
+                if taxonomy:
+                    try:
+                        yield wp("update_post", post_id, taxonomy)
+                        print(f"post_one: カテゴリ・タグ設定完了: {taxonomy}")
+                    except Exception as e:
+                        if _is_not_found(e):
+                            self._forget_post(slug)
+                        print(f"post_one: カテゴリ・タグ設定エラー: {e}")
+                        self.log_manager.warning(LogType.CATEGORY, f"カテゴリ・タグ設定エラー: {e}")
+                journal_entry.mark(ItemState.TAXONOMY_SET)
+            
+            if not (journal_entry and journal_entry.reached(ItemState.MEDIA_ATTACHED)):
+                # アップロード済みで設定前に止まった場合は、記録したメディアIDを使う
+                media_id = journal_entry.media_id if journal_entry else None
+                if media_id or (media_bytes and media_name):
+                    with metrics.stage("media"):
+                        if not media_id:
+                            print(f"post_one: メディアアップロード中: {media_name}")
+                            media = yield wp("upload_media", media_name, media_bytes)
+                            media_id = int(media.get("id"))
+                            print(f"post_one: メディアアップロード成功: ID {media_id}")
+                            if journal_entry:
+                                journal_entry.mark_media_uploaded(media_id)
+                        try:
+                            yield wp("set_featured_media", post_id, media_id)
+                        except Exception as e:
+                            if _is_not_found(e):
+                                # 作成した投稿が処理中に削除された
+                                self._forget_post(slug)
+                            raise
+                    print(f"post_one: アイキャッチ画像設定完了")
+                else:
+                    print(f"post_one: メディアなし")
+                if journal_entry:
+                    journal_entry.mark(ItemState.MEDIA_ATTACHED)
             
             # ログに記録
             self.log_manager.info(LogType.POSTING, f"投稿作成完了: ID {post_id}, タイトル: {title}")
@@ -903,13 +1114,47 @@ class Engine:
             import traceback
             print(f"post_one: エラー詳細: {traceback.format_exc()}")
             self.log_manager.error(LogType.ERROR, f"post_one error: {e}")
+            metrics.count("failed")
+            metrics_exporter.posts.inc("failed")
             raise
+        finally:
+            # 一時ファイルに書き出したメディアを削除
+            close_media(media_bytes)
+            elapsed = time.perf_counter() - started
+            metrics.observe("item", elapsed * 1000)
+            metrics_exporter.post_seconds.observe(elapsed)
 
-    def run_once(self, post_setting_num: str = "1") -> List[int]:
-        created: List[int] = []
-        offset = 1
+    def _target_count(self, posting_settings: PostingSettings) -> int:
+        """投稿設定の目標投稿数（未設定や不正な値は0）"""
+        target_count = posting_settings.target_new_posts
+        # 文字列の場合は数値に変換
+        if isinstance(target_count, str):
+            try:
+                target_count = int(target_count)
+            except (ValueError, TypeError):
+                target_count = 0
+        elif not isinstance(target_count, int):
+            target_count = 0
+        return target_count
+
+    def run_once(self, post_setting_num: str = "1", target_count: Optional[int] = None) -> List[int]:
+        """投稿設定で1回実行する（target_countを指定すると投稿設定の目標投稿数の代わりに使う）"""
+        metrics = self._begin_metrics("once", post_setting_num)
+        try:
+            return self._run_once(post_setting_num, target_count)
+        finally:
+            self._end_metrics(metrics)
+
+    def _run_once(self, post_setting_num: str = "1", target_count: Optional[int] = None) -> List[int]:
         batch_size = 100  # 一度に処理するアイテム数
         
+        # 実行ジャーナルを開始（前回の実行が途中で止まっていれば引き継ぐ）
+        if self.journal is None:
+            self.journal = RunJournal()
+        journal_run = self.journal.start_run(post_setting_num)
+        created: List[int] = journal_run.created_post_ids()
+        offset = journal_run.offset
+        
         # ログに実行開始を記録
         self.log_manager.info(LogType.SYSTEM, f"run_once開始: 設定番号 {post_setting_num}")
         
@@ -925,20 +1170,28 @@ class Engine:
             print(f"run_once: デフォルト設定を使用")
         
         # 目標投稿数が設定されている場合の処理
-        target_count = posting_settings.target_new_posts
-        # 文字列の場合は数値に変換
-        if isinstance(target_count, str):
-            try:
-                target_count = int(target_count)
-            except (ValueError, TypeError):
-                target_count = 0
-        elif not isinstance(target_count, int):
-            target_count = 0
-            
+        if target_count is None:
+            target_count = self._target_count(posting_settings)
         if target_count > 0:
             print(f"run_once: 目標投稿数: {target_count}件")
             self.log_manager.info(LogType.SYSTEM, f"目標投稿数: {target_count}件")
         
+        # 前回中断した実行を再開する場合、途中のアイテムを先に完了させる
+        if journal_run.resumed:
+            unfinished = journal_run.unfinished_entries()
+            self._prepare_taxonomy([entry.item for entry in unfinished], posting_settings)
+            print(f"run_once: 中断された実行 {journal_run.run_id} を再開 - 作成済み: {len(created)}件, 途中: {len(unfinished)}件, オフセット: {offset}")
+            self.log_manager.info(LogType.SYSTEM, f"中断された実行を再開: {journal_run.run_id}, 作成済み {len(created)}件, 途中 {len(unfinished)}件")
+            for entry in unfinished:
+                try:
+                    post_id = self.post_one(entry.item, posting_settings, journal_entry=entry)
+                    entry.mark_done(post_id)
+                    if post_id:
+                        created.append(post_id)
+                except Exception as e:
+                    print(f"run_once: 再開アイテム {entry.content_id} でエラー: {e}")
+                    entry.record_error(str(e))
+        
         # 目標投稿数に達するまで繰り返し処理
         consecutive_failures = 0  # 連続失敗回数
         max_consecutive_failures = 5  # 最大連続失敗回数
@@ -970,12 +1223,21 @@ class Engine:
                 print(f"run_once: バッチ {offset}: {len(items)}件のアイテムを取得")
                 self.log_manager.info(LogType.SYSTEM, f"バッチ {offset}: {len(items)}件のアイテムを取得")
                 
+                # バッチ内で使うカテゴリ・タグをまとめて作成
+                self._prepare_taxonomy(items, posting_settings)
+                
                 # アイテムを順次処理
                 batch_created = 0  # このバッチで作成された投稿数
                 for i, item in enumerate(items, 1):
+                    entry = journal_run.entry(item)
+                    if entry and entry.state == ItemState.DONE:
+                        # この実行で処理済み（再開時）
+                        continue
                     try:
                         print(f"run_once: アイテム{i}を処理中: {item.get('title', 'No title')}")
-                        post_id = self.post_one(item, posting_settings)
+                        post_id = self.post_one(item, posting_settings, journal_entry=entry)
+                        if entry:
+                            entry.mark_done(post_id)
                         
                         if post_id:
                             created.append(post_id)
@@ -988,6 +1250,7 @@ class Engine:
                             if target_count > 0 and len(created) >= target_count:
                                 print(f"run_once: 目標投稿数 {target_count}件に達しました")
                                 self.log_manager.info(LogType.SYSTEM, f"目標投稿数 {target_count}件に達しました")
+                                journal_run.finish()
                                 return created
                         else:
                             print(f"run_once: アイテム{i}は既に存在するか、作成に失敗")
@@ -998,6 +1261,8 @@ class Engine:
                         import traceback
                         print(f"run_once: エラー詳細: {traceback.format_exc()}")
                         self.log_manager.error(LogType.ERROR, f"アイテム{i}でエラー: {e}")
+                        if entry:
+                            entry.record_error(str(e))
                         consecutive_failures += 1
                         continue
                 
@@ -1008,6 +1273,7 @@ class Engine:
                 
                 # 次のバッチに進む
                 offset += batch_size
+                journal_run.set_offset(offset)
                 
                 # 進捗状況をログに記録
                 print(f"run_once: 現在の進捗 - 作成済み: {len(created)}件, 目標: {target_count}件, 連続失敗: {consecutive_failures}回")
@@ -1024,37 +1290,296 @@ class Engine:
         
         print(f"run_once: 完了。{len(created)}件の投稿を作成")
         self.log_manager.info(LogType.SYSTEM, f"run_once完了: {len(created)}件の投稿を作成")
+        journal_run.finish()
         return created
 
-    def search_items_with_offset(self, offset: int, batch_size: int, posting_settings: PostingSettings) -> Tuple[List[Dict[str, Any]], int]:
-        """指定されたオフセットからアイテムを検索する"""
+    async def run_once_async(self, post_setting_num: str = "1", concurrency: Optional[int] = None,
+                             target_count: Optional[int] = None) -> List[int]:
+        """run_onceの非同期版（asyncio.runから呼ぶ）
+
+        DMM APIの検索・重複チェック・投稿の作成・メディアのアップロードを非同期クライアントで行い、
+        バッチ内のアイテムをconcurrency件（省略時は同時実行枠の並列投稿数）ずつ並行して処理する。
+        本文の生成（Chrome・詳細ページ・画像の取得を含む）は同期版の処理をスレッドで実行する。
+        """
+        from async_http import AsyncTransport, AsyncDMMClient, AsyncWordPressClient
+        metrics = self._begin_metrics("once_async", post_setting_num)
+        try:
+            async with AsyncTransport() as transport:
+                print(f"run_once_async: 非同期トランスポート: {transport.backend}")
+                dmm = AsyncDMMClient(self.dmm, transport)
+                wp = AsyncWordPressClient(self.wp, transport)
+                return await self._run_once_async(post_setting_num, dmm, wp, metrics,
+                                                  concurrency or budget.max_parallel_posts, target_count)
+        finally:
+            self._end_metrics(metrics)
+
+    def _in_thread(self, metrics: RunMetrics, func, *args, **kwargs):
+        """スレッドプールで同期の処理を実行するときに、計測値をそのスレッドに引き継ぐ"""
+        self._local.metrics = metrics
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.metrics = None
+
+    async def _run_once_async(self, post_setting_num: str, dmm, wp, metrics: RunMetrics, concurrency: int,
+                              target_count: Optional[int] = None) -> List[int]:
+        loop = asyncio.get_running_loop()
+        batch_size = 100
+        if self.journal is None:
+            self.journal = RunJournal()
+        journal_run = self.journal.start_run(post_setting_num)
+        created: List[int] = journal_run.created_post_ids()
+        offset = journal_run.offset
+        self.log_manager.info(LogType.SYSTEM, f"run_once_async開始: 設定番号 {post_setting_num}")
+        
         try:
-            # 投稿設定から検索設定を取得
-            floor = posting_settings.floor
-            keyword = posting_settings.keyword
-            sort = posting_settings.sort
-            article_type = posting_settings.article_type
-            article_id = posting_settings.article_id
-            from_date = posting_settings.from_date
-            to_date = posting_settings.to_date
+            posting_settings = self._load_posting_settings(post_setting_num)
+        except Exception as e:
+            print(f"run_once_async: 投稿設定読み込みエラー: {e}")
+            self.log_manager.error(LogType.ERROR, f"投稿設定読み込みエラー: {e}")
+            posting_settings = self._get_default_posting_settings()
+        if target_count is None:
+            target_count = self._target_count(posting_settings)
+        
+        # 中断された実行の途中のアイテムは同期版と同じ処理で完了させる
+        if journal_run.resumed:
+            unfinished = journal_run.unfinished_entries()
+            await loop.run_in_executor(None, self._in_thread, metrics, self._prepare_taxonomy,
+                                       [entry.item for entry in unfinished], posting_settings)
+            for entry in unfinished:
+                try:
+                    post_id = await self._post_one_async(entry.item, posting_settings, entry, dmm, wp, metrics)
+                    entry.mark_done(post_id)
+                    if post_id:
+                        created.append(post_id)
+                except Exception as e:
+                    print(f"run_once_async: 再開アイテム {entry.content_id} でエラー: {e}")
+                    entry.record_error(str(e))
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        # 目標数の枠：作成済みと処理中の件数の合計が目標数を超えないよう、処理を始める前に確保する
+        slots = asyncio.Condition()
+        in_flight = 0
+        
+        async def reserve_slot() -> bool:
+            nonlocal in_flight
+            async with slots:
+                while target_count > 0 and len(created) + in_flight >= target_count:
+                    if len(created) >= target_count:
+                        # 目標数に達したので、残りは次回に回す
+                        return False
+                    # 処理中のアイテムが重複・失敗で終わったら枠が空く
+                    await slots.wait()
+                in_flight += 1
+                return True
+        
+        async def release_slot():
+            nonlocal in_flight
+            async with slots:
+                in_flight -= 1
+                slots.notify_all()
+        
+        async def process(item: Dict[str, Any]) -> Optional[int]:
+            async with semaphore:
+                entry = journal_run.entry(item)
+                if entry and entry.state == ItemState.DONE:
+                    return None
+                if not await reserve_slot():
+                    return None
+                try:
+                    post_id = await self._post_one_async(item, posting_settings, entry, dmm, wp, metrics)
+                    if entry:
+                        entry.mark_done(post_id)
+                    if post_id:
+                        created.append(post_id)
+                        self.log_manager.info(LogType.POSTING, f"投稿作成成功: ID {post_id}, タイトル: {item.get('title', 'No title')}")
+                    return post_id
+                except Exception as e:
+                    print(f"run_once_async: アイテム {item.get('content_id')} でエラー: {e}")
+                    self.log_manager.error(LogType.ERROR, f"アイテム {item.get('content_id')} でエラー: {e}")
+                    if entry:
+                        entry.record_error(str(e))
+                    return None
+                finally:
+                    await release_slot()
+        
+        consecutive_failures = 0
+        max_consecutive_failures = 5
+        while not (target_count > 0 and len(created) >= target_count):
+            if consecutive_failures >= max_consecutive_failures:
+                print(f"run_once_async: 連続失敗回数が上限({max_consecutive_failures}回)に達しました。処理を停止します")
+                self.log_manager.warning(LogType.SYSTEM, f"連続失敗回数が上限({max_consecutive_failures}回)に達しました")
+                break
+            try:
+                with metrics.stage("search"):
+                    resp = await dmm.item_list(**self._item_list_args(posting_settings, offset, batch_size))
+                items = resp.get("result", {}).get("items", [])
+            except Exception as e:
+                print(f"run_once_async: DMM API呼び出しでエラー: {e}")
+                self.log_manager.error(LogType.ERROR, f"DMM API呼び出しエラー: {e}")
+                items = []
+            if not items:
+                consecutive_failures += 1
+                offset += batch_size
+                continue
             
-            # サービスパラメータの処理を改善
-            service_param = self._convert_service_to_english(posting_settings.service)
-            print(f"search_items_with_offset: サービスパラメータ: {posting_settings.service} -> {service_param}")
+            print(f"run_once_async: バッチ {offset}: {len(items)}件のアイテムを {concurrency}件ずつ並行して処理")
+            await loop.run_in_executor(None, self._in_thread, metrics, self._prepare_taxonomy, items, posting_settings)
+            results = await asyncio.gather(*(process(item) for item in items))
+            consecutive_failures = 0 if any(results) else consecutive_failures + 1
+            offset += batch_size
+            journal_run.set_offset(offset)
+            print(f"run_once_async: 現在の進捗 - 作成済み: {len(created)}件, 目標: {target_count}件, 連続失敗: {consecutive_failures}回")
+        
+        print(f"run_once_async: 完了。{len(created)}件の投稿を作成")
+        self.log_manager.info(LogType.SYSTEM, f"run_once_async完了: {len(created)}件の投稿を作成")
+        journal_run.finish()
+        return created
+
+    async def _post_one_async(self, item: Dict[str, Any], posting_settings: PostingSettings,
+                              journal_entry: Optional[JournalEntry], dmm, wp, metrics: RunMetrics) -> Optional[int]:
+        """post_oneの非同期版（手順は_post_stepsで共通）
+
+        WordPressへのリクエストは非同期クライアントで送り、本文の生成などはスレッドで実行する。
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def run(op):
+            kind, target, args, kwargs = op
+            if kind == "wp":
+                return await getattr(wp, target)(*args, **kwargs)
+            return await loop.run_in_executor(None, functools.partial(self._in_thread, metrics, target, *args, **kwargs))
+        
+        steps = self._post_steps(item, posting_settings, journal_entry)
+        value, error = None, None
+        while True:
+            try:
+                op = steps.throw(error) if error else steps.send(value)
+            except StopIteration as done:
+                return done.value
+            try:
+                value, error = await run(op), None
+            except Exception as e:
+                value, error = None, e
+
+    def _build_content_timed(self, item: Dict[str, Any], posting_settings: PostingSettings):
+        with self._metrics.stage("build"):
+            return self.build_content(item, posting_settings)
+
+    def _render_content(self, item: Dict[str, Any], posting_settings: PostingSettings):
+        """本文を生成してLLM変数タグを処理する
+
+        build_contentで取得したChromeの詳細説明はスレッドごとに保持しているため、
+        非同期実行でも同じスレッドでLLM変数タグを処理するよう1回の呼び出しで行う。
+        """
+        title, content, media_bytes, media_name = self._build_content_timed(item, posting_settings)
+        return title, self._apply_llm_vartags(content, item), media_bytes, media_name
+
+    def plan_jobs(self, queue, post_setting_num: str = "1", max_items: Optional[int] = None) -> int:
+        """DMM APIからアイテムを取得してジョブキューに登録する（cli.py plan）
+        
+        max_items未指定時は投稿設定の目標投稿数（未設定なら1バッチ分）を登録する。
+        登録済みのcontent_idは無視されるため、何度実行しても重複しない。
+        """
+        posting_settings = self._load_posting_settings(post_setting_num)
+        if max_items is None:
+            try:
+                max_items = int(posting_settings.target_new_posts or 0)
+            except (ValueError, TypeError):
+                max_items = 0
+        batch_size = 100
+        if max_items <= 0:
+            max_items = batch_size
+        
+        self.log_manager.info(LogType.SYSTEM, f"plan開始: 設定番号 {post_setting_num}, 最大{max_items}件")
+        planned = 0
+        offset = 1
+        while planned < max_items:
+            items, total = self.search_items_with_offset(offset, min(batch_size, max_items - planned), posting_settings)
+            if not items:
+                break
+            planned += queue.enqueue(items, post_setting_num)
+            offset += len(items)
+            if total and offset > total:
+                break
+        
+        print(f"plan_jobs: {planned}件のジョブを登録")
+        self.log_manager.info(LogType.SYSTEM, f"plan完了: {planned}件のジョブを登録")
+        return planned
+
+    def run_worker(self, queue, worker_id: str, wait: bool = False, poll_interval: float = 5.0) -> List[int]:
+        """ジョブキューからアイテムを取り出して投稿する（cli.py worker）
+        
+        wait=Falseの場合はキューが空になった時点で終了する。
+        """
+        metrics = self._begin_metrics("worker")
+        try:
+            return self._run_worker(queue, worker_id, wait, poll_interval)
+        finally:
+            self._end_metrics(metrics)
+
+    def _run_worker(self, queue, worker_id: str, wait: bool = False, poll_interval: float = 5.0) -> List[int]:
+        created: List[int] = []
+        posting_settings_by_num: Dict[str, PostingSettings] = {}
+        self.log_manager.info(LogType.SYSTEM, f"worker開始: {worker_id}")
+        
+        while True:
+            job = queue.lease(worker_id)
+            if job is None:
+                if not wait and not queue.has_remaining():
+                    break
+                time.sleep(poll_interval)
+                continue
             
-            resp = self.dmm.item_list(
-                site=posting_settings.site,
-                service=service_param,
-                floor=floor,
-                keyword=keyword,
-                sort=self._convert_sort_to_english(sort),
-                gte_date=(from_date + "T00:00:00") if from_date else None,
-                lte_date=(to_date + "T23:59:59") if to_date else None,
-                article=self._convert_article_to_english(article_type) if article_type else None,
-                article_id=article_id or None,
-                hits=batch_size,
-                offset=offset,
-            )
+            try:
+                if job.post_setting not in posting_settings_by_num:
+                    posting_settings_by_num[job.post_setting] = self._load_posting_settings(job.post_setting)
+                print(f"run_worker[{worker_id}]: {job.content_id} を処理中 (試行{job.attempts}/{job.max_attempts})")
+                with queue.heartbeat(job.content_id, worker_id):
+                    post_id = self.post_one(job.item, posting_settings_by_num[job.post_setting])
+                if post_id is None and self.last_post_error:
+                    # 更新に失敗した場合は完了にせず、試行回数が残っていれば再実行する
+                    queue.fail(job.content_id, worker_id, self.last_post_error)
+                    continue
+                queue.complete(job.content_id, worker_id, post_id)
+                if post_id:
+                    created.append(post_id)
+                    self.log_manager.info(LogType.POSTING, f"投稿作成成功: ID {post_id}, content_id: {job.content_id}")
+            except Exception as e:
+                print(f"run_worker[{worker_id}]: {job.content_id} でエラー: {e}")
+                self.log_manager.error(LogType.ERROR, f"worker {worker_id}: {job.content_id} でエラー: {e}")
+                queue.fail(job.content_id, worker_id, str(e))
+        
+        self.log_manager.info(LogType.SYSTEM, f"worker終了: {worker_id}, {len(created)}件の投稿を作成")
+        return created
+
+    def _item_list_args(self, posting_settings: PostingSettings, offset: int, batch_size: int) -> Dict[str, Any]:
+        """投稿設定からDMMClient.item_listの引数を作成"""
+        # サービスパラメータの処理を改善
+        service_param = self._convert_service_to_english(posting_settings.service)
+        print(f"_item_list_args: サービスパラメータ: {posting_settings.service} -> {service_param}")
+        from_date = posting_settings.from_date
+        to_date = posting_settings.to_date
+        article_type = posting_settings.article_type
+        return dict(
+            site=posting_settings.site,
+            service=service_param,
+            floor=posting_settings.floor,
+            keyword=posting_settings.keyword,
+            sort=self._convert_sort_to_english(posting_settings.sort),
+            gte_date=(from_date + "T00:00:00") if from_date else None,
+            lte_date=(to_date + "T23:59:59") if to_date else None,
+            article=self._convert_article_to_english(article_type) if article_type else None,
+            article_id=posting_settings.article_id or None,
+            hits=batch_size,
+            offset=offset,
+        )
+
+    def search_items_with_offset(self, offset: int, batch_size: int, posting_settings: PostingSettings) -> Tuple[List[Dict[str, Any]], int]:
+        """指定されたオフセットからアイテムを検索する"""
+        try:
+            with self._metrics.stage("search"):
+                resp = self.dmm.item_list(**self._item_list_args(posting_settings, offset, batch_size))
             result = resp.get("result", {})
             total_count = int(result.get("total_count", 0))
             items = result.get("items", [])
@@ -1099,6 +1624,7 @@ class Engine:
             
             # コンテンツを構築
             title, content, media_bytes, media_name = self.build_content(item, posting_settings)
+            close_media(media_bytes)
             
             result = []
             result.append(f"--- Item 1 ---")
@@ -1187,6 +1713,7 @@ class Engine:
                         print(f"rewrite_post: メディアアップロード成功: {media_id}")
                 except Exception as e:
                     print(f"rewrite_post: メディアアップロードエラー: {e}")
+            close_media(media_bytes)
             
             # 投稿を更新
             self.wp.update_post(post_id, update_data)
@@ -0,0 +1,401 @@
+"""
+詳細ページからの説明文・レビュー抽出用のコンパイル済みプロファイル
+セレクタはlxmlのXPathとして一度だけコンパイルし、フロア・サイトごとに
+セレクタのヒット率を記録して、よく当たるセレクタから試行する。
+"""
+from __future__ import annotations
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lxml import etree
+
+try:
+    # cssselectがインストールされていれば任意のCSSセレクタを扱える
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+
+# テキスト抽出で無視する要素（BeautifulSoupのget_textと同様）
+SKIP_TEXT_TAGS = {"script", "style", "template"}
+# 最長テキスト検索で除外する語
+SKIP_WORDS = ("copyright", "利用規約", "プライバシー", "cookie")
+# 説明文として十分な長さ
+MIN_DESCRIPTION_LENGTH = 50
+# 説明文を探すJSONフィールド
+DESCRIPTION_FIELDS = ("description", "comment", "summary", "text", "content", "detail", "info")
+# 説明文が短い場合に試す追加セレクタ
+DETAILED_SELECTORS = (
+    "div.productComment",
+    "div.product-comment",
+    "div.product_comment",
+    "div.comment",
+    "div.description",
+    "div.detail",
+    "div.info",
+    "div.content",
+    "p.comment",
+    "p.description",
+    "p.detail",
+    "p.info",
+)
+# 最長テキスト検索の対象要素
+LONGEST_TEXT_TAGS = {"div", "p", "span"}
+
+_SIMPLE_CSS = re.compile(
+    r"^(?P<tag>[a-zA-Z][\w-]*|\*)?"
+    r"(?P<id>#[\w-]+)?"
+    r"(?P<classes>(?:\.[\w-]+)*)"
+    r"(?:\[(?P<attr>[\w-]+)(?:(?P<op>[*^$~|]?=)(?P<quote>['\"]?)(?P<value>[^'\"\]]*)(?P=quote))?\])?$"
+)
+
+
+def css_to_xpath(selector: str) -> Optional[str]:
+    """単純なCSSセレクタ（tag / #id / .class / [attr op value]）をXPathに変換"""
+    match = _SIMPLE_CSS.match(selector.strip())
+    if not match or not selector.strip():
+        return None
+    conditions = []
+    if match.group("id"):
+        conditions.append(f"@id='{match.group('id')[1:]}'")
+    for cls in filter(None, match.group("classes").split(".")):
+        conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')")
+    attr = match.group("attr")
+    if attr:
+        op, value = match.group("op"), match.group("value") or ""
+        if not op:
+            conditions.append(f"@{attr}")
+        elif op == "=":
+            conditions.append(f"@{attr}='{value}'")
+        elif op == "*=":
+            conditions.append(f"contains(@{attr}, '{value}')")
+        elif op == "^=":
+            conditions.append(f"starts-with(@{attr}, '{value}')")
+        elif op == "$=":
+            conditions.append(f"substring(@{attr}, string-length(@{attr}) - {len(value) - 1})='{value}'")
+        elif op == "~=":
+            conditions.append(f"contains(concat(' ', normalize-space(@{attr}), ' '), ' {value} ')")
+        else:
+            return None
+    xpath = f"descendant-or-self::{match.group('tag') or '*'}"
+    for condition in conditions:
+        xpath += f"[{condition}]"
+    return xpath
+
+
+class CompiledSelector:
+    """一度だけコンパイルしたセレクタ"""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.is_meta = selector.startswith("meta")
+        self._xpath = None
+        if CSSSelector is not None:
+            try:
+                self._xpath = CSSSelector(selector)
+            except Exception:
+                self._xpath = None
+        if self._xpath is None:
+            xpath = css_to_xpath(selector)
+            if xpath:
+                self._xpath = etree.XPath(xpath)
+        if self._xpath is None:
+            print(f"extract_profile: 未対応のセレクタのためスキップします: {selector}")
+
+    def text_of(self, element) -> str:
+        """一致した要素から取り出すテキスト"""
+        return (element.get("content") or "") if self.is_meta else element_text(element)
+
+    def first(self, root) -> Optional[Any]:
+        """最初に一致した要素（select_one相当）"""
+        if self._xpath is None:
+            return None
+        result = self._xpath(root)
+        return result[0] if result else None
+
+
+def element_text(element, strip: bool = True) -> str:
+    """要素のテキストを取得
+
+    strip=TrueはBeautifulSoupのget_text(strip=True)、Falseは.text相当。
+    """
+    parts: List[str] = []
+
+    def add(text: Optional[str]):
+        if not text:
+            return
+        if strip:
+            text = text.strip()
+            if not text:
+                return
+        parts.append(text)
+
+    stack = [(element, False)]
+    while stack:
+        node, tail_only = stack.pop()
+        if tail_only:
+            add(node.tail)
+            continue
+        if isinstance(node.tag, str) and node.tag not in SKIP_TEXT_TAGS:
+            add(node.text)
+            # 子要素とそのtailを文書順に処理するため逆順に積む
+            for child in reversed(node):
+                stack.append((child, True))
+                stack.append((child, False))
+    return "".join(parts)
+
+
+def find_longest_text(root) -> Tuple[str, str, int]:
+    """除外語を含まない最長テキストのdiv/p/spanを1回の走査で探す
+
+    各要素のテキスト長と除外語の有無を子から親へ積み上げて求め、
+    最終的に選ばれた要素のテキストだけを組み立てる。
+    """
+    lengths: Dict[Any, int] = {}
+    has_skip: Dict[Any, bool] = {}
+    order: Dict[Any, int] = {}
+    best = None
+
+    # 行きがけ順の番号（同じ長さの場合は文書順で先の要素を優先）
+    for index, node in enumerate(root.iter()):
+        order[node] = index
+
+    # 帰りがけ順で長さと除外語の有無を集計
+    for _, node in etree.iterwalk(root, events=("end",)):
+        if not isinstance(node.tag, str) or node.tag in SKIP_TEXT_TAGS:
+            lengths[node] = 0
+            has_skip[node] = False
+            continue
+        length = 0
+        skip = False
+        pieces = [node.text] + [child.tail for child in node]
+        for piece in pieces:
+            if piece:
+                stripped = piece.strip()
+                if stripped:
+                    length += len(stripped)
+                    if not skip:
+                        lowered = stripped.lower()
+                        skip = any(word in lowered for word in SKIP_WORDS)
+        for child in node:
+            length += lengths.get(child, 0)
+            skip = skip or has_skip.get(child, False)
+        lengths[node] = length
+        has_skip[node] = skip
+        if node.tag in LONGEST_TEXT_TAGS and length > MIN_DESCRIPTION_LENGTH and not skip:
+            if best is None or length > lengths[best] or (length == lengths[best] and order[node] < order[best]):
+                best = node
+
+    if best is None:
+        return "", "", 0
+    return element_text(best), best.tag, lengths[best]
+
+
+def is_product_script(text: Optional[str]) -> bool:
+    """商品情報を含んでいそうなscriptの内容か"""
+    if not text:
+        return False
+    lowered = text.lower()
+    return "product" in lowered or "description" in lowered or "comment" in lowered
+
+
+def find_description_in_scripts(root) -> Tuple[str, str]:
+    """商品情報らしい最初のscriptタグのJSONから説明文を探す"""
+    for script in root.iter("script"):
+        if is_product_script(script.text):
+            return description_from_script(script.text)
+    return "", ""
+
+
+def description_from_script(target: str) -> Tuple[str, str]:
+    """scriptの内容に含まれるJSONから説明文を取り出す"""
+    content = target.strip()
+    json_start = content.find('{')
+    json_end = content.rfind('}')
+    if json_start == -1 or json_end == -1 or json_end <= json_start:
+        return "", ""
+    try:
+        json_data = json.loads(content[json_start:json_end + 1])
+    except json.JSONDecodeError as e:
+        print(f"extract_specific_elements: JSONパースエラー: {e}")
+        return "", ""
+    if not isinstance(json_data, dict):
+        return "", ""
+
+    for field in DESCRIPTION_FIELDS:
+        if field in json_data and json_data[field]:
+            return str(json_data[field]), f"JSON - {field}"
+    # ネストされたオブジェクトも探す
+    for key, value in json_data.items():
+        if isinstance(value, dict):
+            for sub_field in DESCRIPTION_FIELDS:
+                if sub_field in value and value[sub_field]:
+                    return str(value[sub_field]), f"JSON - {key}.{sub_field}"
+    return "", ""
+
+
+class ExtractionProfile:
+    """フロア・サイトごとのコンパイル済み抽出プロファイル
+
+    セレクタごとの試行回数・ヒット数を記録し、ヒット率の高い順に試行する。
+    """
+
+    def __init__(self, name: str, description_selectors: Sequence[str], review_selectors: Sequence[str]):
+        self.name = name
+        self._lock = threading.Lock()
+        self._groups: Dict[str, List[CompiledSelector]] = {
+            "description": [CompiledSelector(s) for s in description_selectors],
+            "detailed": [CompiledSelector(s) for s in DETAILED_SELECTORS],
+            "review": [CompiledSelector(s) for s in review_selectors],
+        }
+        self._stats: Dict[str, List[int]] = {}  # セレクタ -> [試行回数, ヒット数]
+
+    def _ordered(self, group: str) -> List[CompiledSelector]:
+        """ヒット率の高い順（同率なら設定順）に並べたセレクタ"""
+        selectors = self._groups[group]
+        with self._lock:
+            def hit_rate(item):
+                index, compiled = item
+                tries, hits = self._stats.get(f"{group}:{compiled.selector}", (0, 0))
+                return (-(hits + 1) / (tries + 2), index)
+            return [compiled for _, compiled in sorted(enumerate(selectors), key=hit_rate)]
+
+    def _record(self, group: str, selector: str, hit: bool):
+        with self._lock:
+            stats = self._stats.setdefault(f"{group}:{selector}", [0, 0])
+            stats[0] += 1
+            if hit:
+                stats[1] += 1
+
+    def match(self, group: str, root, min_length: int = 0,
+              selectors: Optional[List[CompiledSelector]] = None) -> Tuple[str, str]:
+        """グループのセレクタを順に試し、最初に条件を満たしたテキストを返す
+
+        selectorsを指定した場合はその順序で試す（ストリーミング解析時と同じ順序にするため）。
+        """
+        for compiled in (selectors if selectors is not None else self._ordered(group)):
+            element = compiled.first(root)
+            text = compiled.text_of(element) if element is not None else ""
+            hit = bool(text) and len(text) > min_length
+            self._record(group, compiled.selector, hit)
+            if hit:
+                return text, compiled.selector
+        return "", ""
+
+    def ordered(self, group: str) -> List[CompiledSelector]:
+        return self._ordered(group)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """セレクタごとの試行回数・ヒット率"""
+        with self._lock:
+            return {key: {"tries": tries, "hits": hits, "hit_rate": hits / tries if tries else 0.0}
+                    for key, (tries, hits) in self._stats.items()}
+
+
+_profiles: Dict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ExtractionProfile] = {}
+_profiles_lock = threading.Lock()
+
+
+def get_profile(name: str, description_selectors: Sequence[str], review_selectors: Sequence[str]) -> ExtractionProfile:
+    """プロファイルを取得（セレクタ設定が変わった場合は作り直す）"""
+    key = (name or "default", tuple(description_selectors), tuple(review_selectors))
+    with _profiles_lock:
+        profile = _profiles.get(key)
+        if profile is None:
+            profile = ExtractionProfile(key[0], description_selectors, review_selectors)
+            _profiles[key] = profile
+        return profile
+
+
+# ストリーミング解析で一度にパーサーへ渡す文字数
+STREAM_CHUNK_SIZE = 32 * 1024
+
+
+def open_elements(root) -> set:
+    """解析途中のツリーでまだ閉じていない可能性のある要素（最後の要素とその祖先）"""
+    node = root
+    elements = {node}
+    while len(node):
+        node = node[-1]
+        elements.add(node)
+    return elements
+
+
+def resolve_group(selectors: List[CompiledSelector], root, opened: set, min_length: int = 0) -> Optional[Tuple[str, str]]:
+    """解析途中のツリーでグループの結果が確定していれば (テキスト, セレクタ) を返す
+
+    select_oneは文書順で最初の要素を返すため、優先順位の高いセレクタから順に、最初に一致した
+    要素が閉じていればそのセレクタの結果は確定する。一致なしは最後まで解析しないと
+    確定しないため、ここでは条件を満たす結果が確定した場合のみ返す（未確定ならNone）。
+    """
+    for compiled in selectors:
+        element = compiled.first(root)
+        if element is None or element in opened:
+            return None
+        text = compiled.text_of(element)
+        if text and len(text) > min_length:
+            return text, compiled.selector
+    return None
+
+
+class StreamResolver:
+    """extract_specific_elementsの結果が解析途中のツリーで確定したかを判定"""
+
+    def __init__(self, profile: ExtractionProfile):
+        self.script_checked = False
+        self.script_description = ""
+        self.description = profile.ordered("description")
+        self.detailed = profile.ordered("detailed")
+        self.review = profile.ordered("review")
+
+    def resolved(self, root) -> bool:
+        """説明文とレビューが確定したらTrue"""
+        opened = open_elements(root)
+        if not self.script_checked:
+            # 商品情報のscriptが現れるまでは、後からJSONの説明文が見つかる可能性がある
+            for script in root.iter("script"):
+                if script in opened:
+                    return False
+                if is_product_script(script.text):
+                    self.script_checked = True
+                    self.script_description, _ = description_from_script(script.text)
+                    break
+            if not self.script_checked:
+                return False
+        if resolve_group(self.review, root, opened) is None:
+            return False
+        if self.script_description:
+            # JSONの説明文は長さに関係なくそのまま使う
+            return True
+        description = resolve_group(self.description, root, opened)
+        if description is None:
+            return False
+        if len(description[0]) >= MIN_DESCRIPTION_LENGTH:
+            return True
+        # 短い場合は追加セレクタで見つかれば確定（見つからなければ全体の最長テキストが必要）
+        return resolve_group(self.detailed, root, opened, min_length=MIN_DESCRIPTION_LENGTH) is not None
+
+
+def parse_streaming(html: str, resolved=None, chunk_size: int = STREAM_CHUNK_SIZE):
+    """HTMLを少しずつ解析し、resolved(解析途中のルート)がTrueを返した時点で打ち切る
+
+    判定は解析済みの量が倍になるごとに行うため、最後まで解析する場合でも判定の負荷は
+    ツリー全体を2回走査する程度に収まる。
+    戻り値は (ルート要素, 打ち切ったか)。打ち切った場合のツリーはそこまでの部分のみ。
+    """
+    parser = etree.HTMLPullParser(events=("start",), tag="html")
+    root = None
+    next_check = chunk_size
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        for _, element in parser.read_events():
+            if root is None:
+                root = element
+        fed = start + chunk_size
+        if resolved is not None and root is not None and fed >= next_check and fed < len(html):
+            next_check *= 2
+            if resolved(root):
+                return root, True
+    return parser.close(), False
@@ -108,6 +108,17 @@ class ExecutionTab:
                        variable=self.vars['retry_on_error']).grid(
             row=row, column=1, sticky=tk.W, padx=(0, 10), pady=5)
         
+        row += 1
+        ttk.Label(right_settings_frame, text="プロファイル:", font=("Arial", 10, "bold")).grid(
+            row=row, column=0, sticky=tk.W, padx=(0, 15), pady=5)
+        self.vars['profile_run'] = tk.BooleanVar()
+        ttk.Checkbutton(right_settings_frame, text="1回実行をcProfileで計測する", 
+                       variable=self.vars['profile_run']).grid(
+            row=row, column=1, sticky=tk.W, padx=(0, 10), pady=5)
+        ttk.Label(right_settings_frame, text="(config/profilesに保存)", 
+                 font=("Arial", 8), foreground="gray").grid(
+            row=row, column=2, sticky=tk.W, padx=(5, 0), pady=5)
+        
         # 実行状況フレーム
         status_frame = ttk.LabelFrame(execution_frame, text="実行状況", padding="15")
         status_frame.pack(fill=tk.X, padx=15, pady=(0, 10))
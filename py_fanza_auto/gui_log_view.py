@@ -0,0 +1,266 @@
+"""
+メインGUIのログ表示クラス
+ワーカースレッドからはキューに積むだけにし、メインスレッドの定期処理で
+まとめてウィジェットへ反映する。ウィジェットには直近の行だけを保持し、
+過去ログの検索・エクスポートはログDBから行う。ログDBへの記録は
+書き込み用のスレッドで行い、DBが混んでいてもメインスレッドを待たせない。
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+import threading
+import queue
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from log_manager import LogType
+
+
+class LogView:
+    """リングバッファ付きのログ表示"""
+
+    # ウィジェットに保持する最大行数
+    MAX_LINES = 1000
+    # 1回の更新で反映する最大件数
+    BATCH_SIZE = 200
+    # 更新間隔（ミリ秒）
+    TICK_MS = 100
+    # 検索結果の最大件数
+    SEARCH_LIMIT = 500
+
+    def __init__(self, parent, main_gui, log_queue: "queue.Queue[Tuple[datetime, str]]"):
+        self.parent = parent
+        self.main_gui = main_gui
+        self.log_queue = log_queue
+        # ログDBへ記録するバッチ（書き込み用のスレッドが取り出す）
+        self.db_queue: "queue.Queue[Optional[List[Tuple[datetime, str]]]]" = queue.Queue()
+        self._db_writer: Optional[threading.Thread] = None
+        self.create_frame()
+
+    def create_frame(self):
+        """ログ表示フレームの作成"""
+        log_frame = ttk.LabelFrame(self.parent, text="ログ", padding="15")
+        log_frame.grid(row=3, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 15))
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+
+        # ログテキストエリア
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=80)
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(0, 10))
+
+        # ログ操作ボタン
+        log_buttons_frame = ttk.Frame(log_frame)
+        log_buttons_frame.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        clear_log_button = ttk.Button(log_buttons_frame, text="ログクリア",
+                                      command=self.clear, style="Accent.TButton")
+        clear_log_button.pack(pady=(0, 5))
+
+        search_log_button = ttk.Button(log_buttons_frame, text="ログ検索",
+                                       command=self.show_search_dialog, style="Accent.TButton")
+        search_log_button.pack(pady=(0, 5))
+
+        export_log_button = ttk.Button(log_buttons_frame, text="ログ出力",
+                                       command=self.export, style="Accent.TButton")
+        export_log_button.pack(pady=(0, 5))
+
+        report_button = ttk.Button(log_buttons_frame, text="実行統計",
+                                   command=self.show_metrics_report, style="Accent.TButton")
+        report_button.pack(pady=(0, 5))
+
+        # ログレベル選択
+        self.log_level_var = tk.StringVar(value="INFO")
+        log_level_combo = ttk.Combobox(log_buttons_frame, textvariable=self.log_level_var,
+                                       values=["DEBUG", "INFO", "WARNING", "ERROR"],
+                                       state="readonly", width=10)
+        log_level_combo.pack(pady=(0, 5))
+
+    def _get_log_manager(self):
+        """エンジンのLogManagerを取得"""
+        engine = getattr(self.main_gui, 'engine', None)
+        return getattr(engine, 'log_manager', None)
+
+    def flush(self) -> int:
+        """キューに溜まったログをまとめて反映（メインスレッド専用）"""
+        batch: List[Tuple[datetime, str]] = []
+        try:
+            while len(batch) < self.BATCH_SIZE:
+                batch.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if not batch:
+            return 0
+
+        new_lines = [f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n" for timestamp, message in batch]
+
+        # 1回のinsertで反映し、上限を超えた古い行を削除
+        self.log_text.insert(tk.END, "".join(new_lines))
+        line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if line_count > self.MAX_LINES:
+            self.log_text.delete('1.0', f'{line_count - self.MAX_LINES + 1}.0')
+        self.log_text.see(tk.END)
+
+        # 検索・エクスポート用のログDBへの記録は書き込み用のスレッドに任せる
+        self._start_db_writer()
+        self.db_queue.put(batch)
+
+        return len(batch)
+
+    def _start_db_writer(self):
+        if self._db_writer is None or not self._db_writer.is_alive():
+            self._db_writer = threading.Thread(target=self._write_db_loop, name="log-db-writer", daemon=True)
+            self._db_writer.start()
+
+    def _write_db_loop(self):
+        """キューのバッチをまとめてログDBへ記録（Noneで終了）"""
+        while True:
+            batch = self.db_queue.get()
+            if batch is None:
+                return
+            # 溜まっているバッチも1回の書き込みにまとめる
+            stop = False
+            try:
+                while True:
+                    more = self.db_queue.get_nowait()
+                    if more is None:
+                        stop = True
+                        break
+                    batch.extend(more)
+            except queue.Empty:
+                pass
+            try:
+                log_manager = self._get_log_manager()
+                if log_manager:
+                    log_manager.log_messages(LogType.SYSTEM, batch)
+            except Exception as e:
+                print(f"ログDB記録エラー: {e}")
+            if stop:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """残りのログをログDBへ記録して書き込み用のスレッドを終了"""
+        if self._db_writer and self._db_writer.is_alive():
+            self.db_queue.put(None)
+            self._db_writer.join(timeout)
+
+    def clear(self):
+        """表示中のログをクリア（ログDBは保持）"""
+        try:
+            self.log_text.delete('1.0', tk.END)
+            self.main_gui.log_message("ログをクリアしました")
+        except Exception as e:
+            print(f"ログクリアエラー: {e}")
+
+    def show_search_dialog(self):
+        """ログDBを検索するダイアログを表示"""
+        window = tk.Toplevel(self.main_gui.root)
+        window.title("ログ検索")
+        window.geometry("800x500")
+
+        search_frame = ttk.Frame(window, padding="10")
+        search_frame.pack(fill=tk.X)
+
+        keyword_var = tk.StringVar()
+        ttk.Label(search_frame, text="キーワード:").pack(side=tk.LEFT)
+        keyword_entry = ttk.Entry(search_frame, textvariable=keyword_var, width=40)
+        keyword_entry.pack(side=tk.LEFT, padx=(5, 10))
+
+        status_var = tk.StringVar(value="")
+        result_text = scrolledtext.ScrolledText(window, height=25, width=100)
+
+        def show_results(logs):
+            result_text.delete('1.0', tk.END)
+            lines = [f"[{log.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] [{log.level.value}] {log.message}\n"
+                     for log in reversed(logs)]
+            result_text.insert(tk.END, "".join(lines))
+            status_var.set(f"{len(logs)}件")
+
+        def run_search(event=None):
+            log_manager = self._get_log_manager()
+            if not log_manager:
+                status_var.set("ログDBが利用できません")
+                return
+            keyword = keyword_var.get().strip()
+            status_var.set("検索中...")
+
+            def search_thread():
+                logs = log_manager.get_logs(limit=self.SEARCH_LIMIT, keyword=keyword or None)
+                self.main_gui.root.after(0, show_results, logs)
+
+            threading.Thread(target=search_thread, daemon=True).start()
+
+        ttk.Button(search_frame, text="検索", command=run_search).pack(side=tk.LEFT)
+        ttk.Label(search_frame, textvariable=status_var).pack(side=tk.LEFT, padx=(10, 0))
+        keyword_entry.bind("<Return>", run_search)
+
+        result_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        keyword_entry.focus_set()
+
+    def show_metrics_report(self):
+        """実行ごとの計測値の日別レポートを表示"""
+        window = tk.Toplevel(self.main_gui.root)
+        window.title("実行統計")
+        window.geometry("800x600")
+
+        option_frame = ttk.Frame(window, padding="10")
+        option_frame.pack(fill=tk.X)
+
+        days_var = tk.StringVar(value="14")
+        ttk.Label(option_frame, text="集計日数:").pack(side=tk.LEFT)
+        ttk.Combobox(option_frame, textvariable=days_var, values=["7", "14", "30", "90"],
+                     state="readonly", width=5).pack(side=tk.LEFT, padx=(5, 10))
+
+        report_text = scrolledtext.ScrolledText(window, height=30, width=100, font=("Courier", 10))
+
+        def show_report(text):
+            report_text.delete('1.0', tk.END)
+            report_text.insert(tk.END, text)
+
+        def load_report(event=None):
+            days = int(days_var.get())
+
+            def report_thread():
+                try:
+                    from run_metrics import MetricsStore, format_report
+                    engine = getattr(self.main_gui, 'engine', None)
+                    store = getattr(engine, 'metrics_store', None) or MetricsStore()
+                    text = format_report(store.daily_summary(days))
+                except Exception as e:
+                    text = f"実行統計の取得に失敗しました: {e}"
+                self.main_gui.root.after(0, show_report, text)
+
+            threading.Thread(target=report_thread, daemon=True).start()
+
+        ttk.Button(option_frame, text="更新", command=load_report).pack(side=tk.LEFT)
+        report_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        load_report()
+
+    def export(self):
+        """ログDBの内容をファイルへエクスポート"""
+        try:
+            log_manager = self._get_log_manager()
+            if not log_manager:
+                messagebox.showerror("エラー", "ログDBが利用できません")
+                return
+
+            filename = filedialog.asksaveasfilename(
+                title="ログを保存",
+                defaultextension=".jsonl",
+                filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")]
+            )
+            if not filename:
+                return
+
+            # 未反映のログも含めるため、先にキューを反映
+            self.flush()
+
+            def export_thread():
+                success = log_manager.export_logs(filename)
+                if success:
+                    self.main_gui.root.after(0, lambda: messagebox.showinfo("完了", f"ログを {filename} に保存しました"))
+                else:
+                    self.main_gui.root.after(0, lambda: messagebox.showerror("エラー", "ログのエクスポートに失敗しました"))
+
+            threading.Thread(target=export_thread, daemon=True).start()
+        except Exception as e:
+            messagebox.showerror("エラー", f"ログのエクスポートに失敗しました:\n{e}")
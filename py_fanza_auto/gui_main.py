@@ -16,6 +16,7 @@ import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Settings
+from settings_snapshot import settings_snapshot
 from engine import Engine
 from settings_manager import SettingsManager
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -26,6 +27,7 @@ from gui_execution import ExecutionTab
 from gui_chrome_settings import ChromeSettingsTab
 from gui_llm_settings import LLMSettingsTab
 from gui_rewrite_tab import RewriteTab
+from gui_log_view import LogView
 import gui_utils
 
 class FanzaAutoGUI:
@@ -50,8 +52,8 @@ class FanzaAutoGUI:
                 # 新しい設定管理システムから設定を読み込み
                 loaded_settings = self.settings_manager.load_settings()
                 if loaded_settings:
-                    # PydanticのSettingsクラスで正しく設定を読み込み
-                    self.settings = Settings(**loaded_settings)
+                    # プロセス共有の設定スナップショットを使用
+                    self.settings = settings_snapshot.settings()
                     print(f"設定読み込み成功: {len(loaded_settings)}件")
                 else:
                     self.settings = Settings()
@@ -78,7 +80,7 @@ class FanzaAutoGUI:
         self.is_running = False
         self.monitoring_active = False  # 監視状態を管理
         
-        # ログ用のキュー
+        # ログ用のキュー（(時刻, メッセージ)を保持し、update_logでまとめて反映）
         self.log_queue = queue.Queue()
         
         # 手動投稿状態管理用の変数
@@ -689,29 +691,9 @@ class FanzaAutoGUI:
     
     def create_log_frame(self, parent):
         """ログ表示フレームの作成"""
-        log_frame = ttk.LabelFrame(parent, text="ログ", padding="15")
-        log_frame.grid(row=3, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 15))
-        log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
-        
-        # ログテキストエリア
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=80)
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(0, 10))
-        
-        # ログ操作ボタン
-        log_buttons_frame = ttk.Frame(log_frame)
-        log_buttons_frame.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        
-        clear_log_button = ttk.Button(log_buttons_frame, text="ログクリア", 
-                                     command=self.clear_log, style="Accent.TButton")
-        clear_log_button.pack(pady=(0, 5))
-        
-        # ログレベル選択
-        self.log_level_var = tk.StringVar(value="INFO")
-        log_level_combo = ttk.Combobox(log_buttons_frame, textvariable=self.log_level_var, 
-                                      values=["DEBUG", "INFO", "WARNING", "ERROR"], 
-                                      state="readonly", width=10)
-        log_level_combo.pack(pady=(0, 5))
+        self.log_view = LogView(parent, self, self.log_queue)
+        self.log_text = self.log_view.log_text
+        self.log_level_var = self.log_view.log_level_var
     
     def save_all_settings(self):
         """全設定を保存する"""
@@ -817,11 +799,11 @@ class FanzaAutoGUI:
             if self.execution_tab:
                 self.execution_tab.load_from_settings(loaded_settings)
                 
-                # 設定オブジェクトも更新
+                # 設定オブジェクトも更新（共有スナップショットは書き換えずに取得し直す）
                 if self.settings:
-                    for key, value in loaded_settings.items():
-                        if hasattr(self.settings, key.lower()):
-                            setattr(self.settings, key.lower(), value)
+                    self.settings = settings_snapshot.settings()
+                    if getattr(self, 'engine', None):
+                        self.engine.refresh_settings()
                 
                 self.log_message("設定をGUIに読み込みました")
             else:
@@ -1432,13 +1414,8 @@ class FanzaAutoGUI:
                 messagebox.showerror("エラー", "SettingsManagerが利用できません")
                 return
             
-            # バックアップファイルの選択
-            backup_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "backups")
-            if not os.path.exists(backup_dir):
-                messagebox.showerror("エラー", "バックアップディレクトリが見つかりません")
-                return
-            
-            backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.json')]
+            # バックアップの選択（インデックスから新しい順に取得）
+            backup_files = self.settings_manager.get_backup_files()
             if not backup_files:
                 messagebox.showerror("エラー", "バックアップファイルが見つかりません")
                 return
@@ -1457,7 +1434,7 @@ class FanzaAutoGUI:
             listbox = tk.Listbox(restore_window, height=10)
             listbox.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
             
-            for backup_file in sorted(backup_files, reverse=True):
+            for backup_file in backup_files:
                 listbox.insert(tk.END, backup_file)
             
             # 復元ボタン
@@ -1562,57 +1539,42 @@ class FanzaAutoGUI:
             self.log_message(f"設定状態更新エラー: {e}")
     
     def log_message(self, message):
-        """ログメッセージを追加"""
+        """ログメッセージを追加（どのスレッドからでも呼び出し可能）"""
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = f"[{timestamp}] {message}\n"
-            
-            # ログキューに追加
-            self.log_queue.put(log_entry)
-            
-            # ログテキストエリアに直接追加（即座に表示）
-            if hasattr(self, 'log_text'):
-                self.log_text.insert(tk.END, log_entry)
-                self.log_text.see(tk.END)
-                
-                # ログが長すぎる場合は古いログを削除
-                lines = int(self.log_text.index('end-1c').split('.')[0])
-                if lines > 1000:
-                    self.log_text.delete('1.0', f'{lines-500}.0')
+            # ウィジェットへの反映はupdate_logがメインスレッドでまとめて行う
+            self.log_queue.put((datetime.now(), message))
         except Exception as e:
             print(f"ログメッセージ追加エラー: {e}")
     
     def update_log(self):
         """ログの更新"""
         try:
-            while not self.log_queue.empty():
-                log_entry = self.log_queue.get_nowait()
-                if hasattr(self, 'log_text'):
-                    self.log_text.insert(tk.END, log_entry)
-                    self.log_text.see(tk.END)
+            if hasattr(self, 'log_view'):
+                self.log_view.flush()
         except Exception as e:
             print(f"ログ更新エラー: {e}")
         
-        # 100ms後に再度実行
-        self.root.after(100, self.update_log)
+        # 一定間隔で再度実行
+        self.root.after(LogView.TICK_MS, self.update_log)
     
     def clear_log(self):
         """ログをクリア"""
-        try:
-            if hasattr(self, 'log_text'):
-                self.log_text.delete('1.0', tk.END)
-                self.log_message("ログをクリアしました")
-        except Exception as e:
-            print(f"ログクリアエラー: {e}")
+        if hasattr(self, 'log_view'):
+            self.log_view.clear()
     
     def start_monitoring(self):
-        """自動監視の開始"""
+        """自動監視の開始（エンジンのスケジューラーに次回実行時刻まで待機させる）"""
         try:
             if not self.monitoring_active:
                 self.monitoring_active = True
-                self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-                self.monitor_thread.start()
-                self.log_message("自動監視を開始しました")
+                scheduler = getattr(self.engine, 'scheduler', None)
+                if scheduler:
+                    scheduler.resume_hourly()
+                    next_run = scheduler.get_next_run()
+                    if next_run:
+                        self.log_message(f"自動監視を開始しました（次回実行: {next_run.strftime('%Y-%m-%d %H:%M')}）")
+                        return
+                self.log_message("自動監視を開始しました（有効なスケジュールはありません）")
         except Exception as e:
             self.log_message(f"自動監視開始エラー: {e}")
     
@@ -1620,49 +1582,25 @@ class FanzaAutoGUI:
         """自動監視の停止"""
         try:
             self.monitoring_active = False
+            scheduler = getattr(self.engine, 'scheduler', None)
+            if scheduler:
+                # 時間別スケジュールのタイマーだけを止める（従来のスケジュールは継続）
+                scheduler.pause_hourly()
             self.log_message("自動監視を停止しました")
         except Exception as e:
             self.log_message(f"自動監視停止エラー: {e}")
     
-    def monitor_loop(self):
-        """監視ループ"""
+    def notify_schedule_changed(self):
+        """スケジュール設定の保存をスケジューラーに通知"""
         try:
-            while self.monitoring_active:
-                # 現在時刻を取得
-                now = datetime.now()
-                current_hour = now.hour
-                current_minute = now.minute
-                
-                # デバッグログ（毎分出力）
-                self.log_message(f"監視ループ: {current_hour:02d}:{current_minute:02d}")
-                
-                # 自動実行設定をチェック
-                if hasattr(self, 'auto_on_var') and self.auto_on_var.get() == "on":
-                    # 24時間分のチェックボックスをチェック
-                    hour_key = f"h{current_hour:02d}"
-                    if hasattr(self, 'hour_vars') and hour_key in self.hour_vars and self.hour_vars[hour_key].get():
-                        # 指定された分に実行
-                        if hasattr(self, 'exe_min_var') and str(current_minute) == self.exe_min_var.get():
-                            # 投稿設定を取得
-                            post_setting_num = "1"  # デフォルト値
-                            if hasattr(self, 'hour_select_vars') and hour_key in self.hour_select_vars:
-                                post_setting_num = self.hour_select_vars[hour_key].get()
-                            
-                            self.log_message(f"自動実行: {current_hour:02d}:{current_minute:02d} - 投稿設定{post_setting_num}")
-                            
-                            # 非同期で実行
-                            self.root.after(0, lambda: self.run_auto_execution(post_setting_num))
-                        else:
-                            self.log_message(f"時間チェック: {current_hour:02d}:{current_minute:02d} != {getattr(self, 'exe_min_var', 'N/A')}")
-                    else:
-                        self.log_message(f"時間チェック: {hour_key} = {getattr(self, 'hour_vars', {}).get(hour_key, 'N/A')}")
-                
-                # 1分間隔
-                time.sleep(60)
+            scheduler = getattr(self.engine, 'scheduler', None)
+            if scheduler and self.monitoring_active:
+                scheduler.notify_config_changed()
+                next_run = scheduler.get_next_run()
+                if next_run:
+                    self.log_message(f"スケジュールを更新しました（次回実行: {next_run.strftime('%Y-%m-%d %H:%M')}）")
         except Exception as e:
-            self.log_message(f"監視ループエラー: {e}")
-            import traceback
-            self.log_message(f"エラー詳細: {traceback.format_exc()}")
+            self.log_message(f"スケジュール更新通知エラー: {e}")
     
     def manual_post(self, setting_num):
         """指定された投稿設定で手動投稿を実行"""
@@ -1711,7 +1649,7 @@ class FanzaAutoGUI:
                     
                     # エンジンの設定を更新
                     try:
-                        self.settings = Settings(**loaded_settings)
+                        self.settings = settings_snapshot.settings()
                         self.log_message("Settingsオブジェクトの作成完了")
                         self.log_message(f"self.settingsの型: {type(self.settings)}")
                         
@@ -1810,8 +1748,14 @@ class FanzaAutoGUI:
                 else:
                     self.log_message("エンジンに_load_posting_settingsメソッドがありません")
                 
-                # 実行
-                created_posts = self.engine.run_once(selected_setting)
+                # 実行（プロファイル指定時はcProfileで計測）
+                profile_var = self.execution_tab.vars.get('profile_run') if self.execution_tab else None
+                if profile_var is not None and profile_var.get():
+                    created_posts, hotspots = self.engine.run_profiled("once", self.engine.run_once, selected_setting)
+                    for line in hotspots.splitlines():
+                        self.log_message(line)
+                else:
+                    created_posts = self.engine.run_once(selected_setting)
                 
                 # 実行結果をログに表示
                 if created_posts:
@@ -1948,6 +1892,11 @@ class FanzaAutoGUI:
                 self.scheduler.shutdown()
             
             self.log_message("アプリケーションを終了します")
+            if getattr(self, 'engine', None):
+                self.engine.close()
+            if hasattr(self, 'log_view'):
+                self.log_view.flush()
+                self.log_view.close()
             self.root.quit()
         except Exception as e:
             print(f"終了処理エラー: {e}")
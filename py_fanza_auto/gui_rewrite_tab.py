@@ -11,8 +11,16 @@ import os
 import json
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from product_code import (
+    PRODUCT_CODE_PATTERNS, ProductCodeExtractor,
+    find_product_code as _find_product_code, is_valid_product_code as _is_valid_product_code,
+)
 
 class RewriteTab:
+    # 差分取得では削除・非公開になった投稿がわからないため、この間隔（秒）ごとに
+    # 公開中の投稿IDだけを全件取得して一覧から取り除く
+    ID_PRUNE_INTERVAL = 600
+
     def __init__(self, parent_notebook, engine, settings_manager):
         self.parent_notebook = parent_notebook
         self.engine = engine
@@ -21,14 +29,11 @@ class RewriteTab:
         parent_notebook.add(self.frame, text="リライト")
         
         # 品番抽出用の正規表現パターン
-        self.product_code_patterns = [
-            r'[A-Z]{2,4}-\d{3,4}',  # ABC-123, ABCD-1234
-            r'[A-Z]{2,4}\d{3,4}',   # ABC123, ABCD1234
-            r'[A-Z]{2,4}_\d{3,4}',  # ABC_123, ABCD_1234
-            r'[A-Z]{2,4}-\d{2,5}',  # ABC-12, ABCD-12345
-            r'[A-Z]{2,5}-\d{2,5}',  # ABCDE-12, ABC-12345
-            r'[A-Z]{2,5}\d{2,5}',   # ABCDE12, ABC12345
-        ]
+        self.product_code_patterns = PRODUCT_CODE_PATTERNS
+        # 投稿ID→品番の対応表（抽出済みの投稿は次回以降抽出し直さない）
+        self.code_extractor = ProductCodeExtractor()
+        # 公開中の投稿IDで一覧を確認した時刻
+        self._last_id_prune = 0.0
         
         self.create_widgets()
         
@@ -275,6 +280,10 @@ class RewriteTab:
             import traceback
             print(f"詳細エラー: {traceback.format_exc()}")
     
+    def _resolve_progress(self, done: int, total: int):
+        """品番検索の進捗を表示（ワーカースレッドから呼ばれる）"""
+        self.parent_notebook.after(0, lambda: self.progress_var.set(f"品番をDMM APIで検索中... {done}/{total}件"))
+    
     def fetch_existing_posts(self):
         """既存投稿を取得"""
         self.progress_var.set("投稿取得中...")
@@ -285,22 +294,45 @@ class RewriteTab:
                 print("投稿取得を開始...")
                 print(f"WordPress URL: {self.engine.wp.base_url}")
                 
-                # WordPressから投稿を取得（段階的にパラメータを追加）
-                print("get_posts呼び出し中...")
+                # 前回取得済みなら、それ以降に更新された投稿だけを取得して差分を反映
+                modified_after = None
+                if self.existing_posts:
+                    modified_after = max((p.get('modified', '') for p in self.existing_posts), default='') or None
                 
-                # まず基本的なパラメータでテスト
+                # WordPressから全投稿をページ単位で取得（本文は取得しない）
+                print(f"iter_post_pages呼び出し中... (modified_after={modified_after})")
+                fetched = []
                 try:
-                    posts = self.engine.wp.get_posts(per_page=100, status='publish')
-                    print(f"基本パラメータで投稿取得成功: {len(posts)}件")
+                    for page, total_pages, page_posts in self.engine.wp.iter_post_pages(status='publish', modified_after=modified_after):
+                        fetched.extend(page_posts)
+                        self.parent_notebook.after(0, lambda p=page, t=total_pages, n=len(fetched):
+                                                   self.progress_var.set(f"投稿取得中... {p}/{t}ページ ({n}件)"))
+                    print(f"投稿取得成功: {len(fetched)}件")
                 except Exception as e:
-                    print(f"基本パラメータで失敗: {e}")
-                    # 基本パラメータで失敗した場合は、さらにシンプルに
-                    try:
-                        posts = self.engine.wp.get_posts(per_page=100)
-                        print(f"最小パラメータで投稿取得成功: {len(posts)}件")
-                    except Exception as e2:
-                        print(f"最小パラメータでも失敗: {e2}")
-                        raise e2
+                    if fetched:
+                        raise
+                    print(f"statusパラメータ付きで失敗: {e}")
+                    # statusを指定せずに再試行
+                    fetched = list(self.engine.wp.iter_posts(status='', modified_after=modified_after))
+                    print(f"最小パラメータで投稿取得成功: {len(fetched)}件")
+                
+                if modified_after:
+                    merged = {p['id']: p for p in self.existing_posts}
+                    merged.update({p['id']: p for p in fetched})
+                    print(f"差分取得: 更新{len(fetched)}件を反映（全{len(merged)}件）")
+                    if time.monotonic() - self._last_id_prune >= self.ID_PRUNE_INTERVAL:
+                        # 削除・非公開になった投稿を取り除く（IDだけなので本文・タイトルは取得しない）
+                        self.parent_notebook.after(0, lambda: self.progress_var.set("公開中の投稿IDを確認中..."))
+                        live_ids = {p['id'] for p in self.engine.wp.iter_posts(status='publish', fields=('id',))}
+                        removed = [post_id for post_id in merged if post_id not in live_ids]
+                        for post_id in removed:
+                            del merged[post_id]
+                        self._last_id_prune = time.monotonic()
+                        print(f"削除・非公開になった投稿を{len(removed)}件除外しました")
+                    posts = list(merged.values())
+                else:
+                    posts = fetched
+                    self._last_id_prune = time.monotonic()
                 
                 # 投稿日順でソート（Python側で処理）
                 if posts:
@@ -360,7 +392,9 @@ class RewriteTab:
                 except:
                     pass
             
-            self.posts_tree.insert("", "end", values=(
+            # 品番抽出結果を投稿IDから直接反映できるよう、行IDに投稿IDを使う
+            iid = str(post_id) if isinstance(post_id, int) else ""
+            self.posts_tree.insert("", "end", iid=iid or None, values=(
                 post_id,
                 title[:50] + "..." if len(title) > 50 else title,
                 slug,
@@ -379,17 +413,16 @@ class RewriteTab:
         self.progress_var.set("品番抽出中...")
         self.extract_codes_btn.config(state="disabled")
         
+        def on_progress(found, done, total):
+            # チャンクごとの結果を逐次画面に反映
+            self.parent_notebook.after(0, lambda: self.apply_extracted_codes(found, done, total))
+        
         def extract_thread():
             try:
-                extracted_count = 0
-                
-                for post in self.existing_posts:
-                    # slugから品番を取得
-                    slug = post.get('slug', '')
-                    
-                    if slug and self.is_valid_product_code(slug):
-                        self.extracted_codes[post['id']] = slug
-                        extracted_count += 1
+                # slugから品番を取得（対応表にある投稿はスキップ、多い場合は並列処理）
+                codes = self.code_extractor.extract(self.existing_posts, on_progress=on_progress)
+                self.extracted_codes.update(codes)
+                extracted_count = len(codes)
                 
                 # GUIスレッドで結果を更新
                 self.parent_notebook.after(0, lambda: self.update_extraction_results(extracted_count))
@@ -912,55 +945,25 @@ class RewriteTab:
     
     def find_product_code(self, text: str) -> Optional[str]:
         """テキストから品番を検索"""
-        # まず、より厳密なパターンで検索
-        for pattern in self.product_code_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                code = match.group()
-                # 品番として妥当かチェック
-                if self.is_valid_product_code(code):
-                    return code
-        
-        # 厳密なパターンで見つからない場合、より緩いパターンで検索
-        loose_patterns = [
-            r'[A-Z]{2,6}[-_]?\d{2,6}',  # より柔軟なパターン
-            r'[A-Z]{2,6}\s*\d{2,6}',    # スペース区切り
-        ]
-        
-        for pattern in loose_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                code = match.group()
-                if self.is_valid_product_code(code):
-                    return code
-        
-        return None
+        return _find_product_code(text)
     
     def is_valid_product_code(self, code: str) -> bool:
         """品番として妥当かチェック"""
-        # 基本的な長さチェック
-        if len(code) < 4 or len(code) > 15:
-            return False
-        
-        # 文字と数字の両方を含むかチェック
-        has_letters = bool(re.search(r'[A-Z]', code, re.IGNORECASE))
-        has_digits = bool(re.search(r'\d', code))
-        
-        if not (has_letters and has_digits):
-            return False
-        
-        # 一般的でない品番パターンを除外
-        exclude_patterns = [
-            r'^[A-Z]{1,2}$',  # 単純な略語
-            r'^\d+$',          # 数字のみ
-            r'^[A-Z]+$',       # 文字のみ
-        ]
-        
-        for pattern in exclude_patterns:
-            if re.match(pattern, code, re.IGNORECASE):
-                return False
-        
-        return True
+        return _is_valid_product_code(code)
+    
+    def apply_extracted_codes(self, found: Dict[int, str], done: int, total: int):
+        """抽出途中の結果を該当する行だけに反映"""
+        self.extracted_codes.update(found)
+        for post_id, code in found.items():
+            iid = str(post_id)
+            if not self.posts_tree.exists(iid):
+                continue
+            values = list(self.posts_tree.item(iid)['values'])
+            values[4] = code
+            values[5] = "抽出済み"
+            values[6] = "リライト可能"
+            self.posts_tree.item(iid, values=values)
+        self.progress_var.set(f"品番抽出中... {done}/{total}件")
     
     def update_extraction_results(self, extracted_count: int):
         """抽出結果を更新"""
@@ -1005,6 +1008,14 @@ class RewriteTab:
     
     def show_post_details(self, post: Dict[str, Any]):
         """投稿詳細を表示"""
+        if 'content' not in post:
+            # 一覧取得では本文を取得していないため、表示時に取得する
+            try:
+                full_post = self.engine.wp.get_post_by_id(post['id'])
+                if full_post:
+                    post['content'] = full_post.get('content', {})
+            except Exception as e:
+                print(f"投稿本文取得エラー: {e}")
         title = post.get('title', {}).get('rendered', 'N/A')
         content = post.get('content', {}).get('rendered', 'N/A')
         post_id = post['id']
@@ -1078,42 +1089,11 @@ class RewriteTab:
             
             def rewrite_thread():
                 try:
-                    # DMM APIで品番検索（videocとvideoaで試行）
-                    search_result = None
-                    floor_used = None
-                    
-                    # まずvideocで試行
-                    try:
-                        search_result = self.engine.dmm.item_list(
-                            site="FANZA",
-                            service="digital",
-                            floor="videoc",
-                            keyword=product_code,
-                            hits=1
-                        )
-                        if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                            floor_used = "videoc"
-                    except Exception as e:
-                        print(f"投稿 {post_id} (品番: {product_code}) videoc検索エラー: {e}")
-                    
-                    # videocで見つからない場合はvideoaで試行
-                    if not floor_used:
-                        try:
-                            search_result = self.engine.dmm.item_list(
-                                site="FANZA",
-                                service="digital",
-                                floor="videoa",
-                                keyword=product_code,
-                                hits=1
-                            )
-                            if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                floor_used = "videoa"
-                        except Exception as e:
-                            print(f"投稿 {post_id} (品番: {product_code}) videoa検索エラー: {e}")
+                    # DMM APIで品番検索（videoc→videoaの順に試行、結果はキャッシュされる）
+                    floor_used, item = self.engine.dmm.resolve_code(product_code)
                     
                     # リライト実行
-                    if floor_used and search_result.get('result', {}).get('items') and search_result['result']['items']:
-                        item = search_result['result']['items'][0]
+                    if floor_used and item:
                         
                         # 選択された投稿設定でリライト実行
                         selected_settings = self.settings_var.get()
@@ -1211,42 +1191,11 @@ class RewriteTab:
             
             def test_thread():
                 try:
-                    # DMM APIで品番検索（videocとvideoaで試行）
-                    search_result = None
-                    floor_used = None
-                    
-                    # まずvideocで試行
-                    try:
-                        search_result = self.engine.dmm.item_list(
-                            site="FANZA",
-                            service="digital",
-                            floor="videoc",
-                            keyword=product_code,
-                            hits=1
-                        )
-                        if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                            floor_used = "videoc"
-                    except Exception as e:
-                        print(f"投稿 {post_id} (品番: {product_code}) videoc検索エラー: {e}")
-                    
-                    # videocで見つからない場合はvideoaで試行
-                    if not floor_used:
-                        try:
-                            search_result = self.engine.dmm.item_list(
-                                site="FANZA",
-                                service="digital",
-                                floor="videoa",
-                                keyword=product_code,
-                                hits=1
-                            )
-                            if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                floor_used = "videoa"
-                        except Exception as e:
-                            print(f"投稿 {post_id} (品番: {product_code}) videoc検索エラー: {e}")
+                    # DMM APIで品番検索（videoc→videoaの順に試行、結果はキャッシュされる）
+                    floor_used, item = self.engine.dmm.resolve_code(product_code)
                     
                     # 結果表示
-                    if floor_used and search_result.get('result', {}).get('items') and search_result['result']['items']:
-                        item = search_result['result']['items'][0]
+                    if floor_used and item:
                         
                         # 成功メッセージ
                         self.parent_notebook.after(0, lambda: messagebox.showinfo(
@@ -1575,6 +1524,14 @@ class RewriteTab:
                 error_count = 0
                 total_batches = (len(target_posts) + batch_size - 1) // batch_size
                 
+                # 対象の品番をまとめてDMM APIで解決（重複は1回だけ、キャッシュ済みの品番は検索しない）
+                self.parent_notebook.after(0, lambda: self.progress_var.set(
+                    f"品番をDMM APIで検索中... ({len(target_posts)}件)"
+                ))
+                resolved = self.engine.dmm.resolve_codes(
+                    (self.extracted_codes[post['id']] for post in target_posts),
+                    on_progress=self._resolve_progress)
+                
                 for batch_num in range(total_batches):
                     start_idx = batch_num * batch_size
                     end_idx = min(start_idx + batch_size, len(target_posts))
@@ -1590,52 +1547,11 @@ class RewriteTab:
                             post_id = post['id']
                             product_code = self.extracted_codes[post_id]
                             
-                            # DMM APIで品番検索（videocとvideoaで試行）
-                            search_result = None
-                            floor_used = None
-                            
-                            # まずvideocで試行
-                            try:
-                                search_result = self.engine.dmm.item_list(
-                                    site="FANZA",
-                                    service="digital",
-                                    floor="videoc",
-                                    keyword=product_code,
-                                    hits=1
-                                )
-                                if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                    floor_used = "videoc"
-                            except Exception as e:
-                                print(f"投稿 {post_id} (品番: {product_code}) videoc検索エラー: {e}")
-                            
-                            # videocで見つからない場合はvideoaで試行
-                            if not floor_used:
-                                try:
-                                    search_result = self.engine.dmm.item_list(
-                                        site="FANZA",
-                                        service="digital",
-                                        floor="videoa",
-                                        keyword=product_code,
-                                        hits=1
-                                    )
-                                    if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                        floor_used = "videoa"
-                                except Exception as e:
-                                    print(f"投稿 {post_id} (品番: {product_code}) videoa検索エラー: {e}")
+                            # 事前にまとめて解決した結果を使用
+                            floor_used, item = resolved.get(product_code, (None, None))
+                            print(f"投稿 {post_id} (品番: {product_code}) 使用フロア: {floor_used or 'なし'}")
                             
-                            # デバッグ情報を出力
-                            print(f"投稿 {post_id} (品番: {product_code}) のAPIレスポンス:")
-                            print(f"  使用フロア: {floor_used or 'なし'}")
-                            print(f"  レスポンス構造: {list(search_result.keys()) if isinstance(search_result, dict) else type(search_result)}")
-                            if isinstance(search_result, dict):
-                                print(f"  resultキーの存在: {'result' in search_result}")
-                                if 'result' in search_result:
-                                    print(f"  result.itemsキーの存在: {'items' in search_result['result']}")
-                                    if 'items' in search_result['result']:
-                                        print(f"  itemsの内容: {len(search_result['result']['items'])}件")
-                            
-                            if floor_used and search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                item = search_result['result']['items'][0]
+                            if floor_used and item:
                                 
                                 # 選択された投稿設定でリライト実行
                                 selected_settings = self.settings_var.get()
@@ -1700,57 +1616,21 @@ class RewriteTab:
                 error_count = 0
                 test_results = []
                 
+                # 対象の品番をまとめてDMM APIで解決（重複は1回だけ、キャッシュ済みの品番は検索しない）
+                resolved = self.engine.dmm.resolve_codes(
+                    (self.extracted_codes[post['id']] for post in target_posts),
+                    on_progress=self._resolve_progress)
+                
                 for i, post in enumerate(target_posts):
                     try:
                         post_id = post['id']
                         product_code = self.extracted_codes[post_id]
                         
-                        # DMM APIで品番検索（videocとvideoaで試行）
-                        search_result = None
-                        floor_used = None
-                        
-                        # まずvideocで試行
-                        try:
-                            search_result = self.engine.dmm.item_list(
-                                site="FANZA",
-                                service="digital",
-                                floor="videoc",
-                                keyword=product_code,
-                                hits=1
-                            )
-                            if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                floor_used = "videoc"
-                        except Exception as e:
-                            print(f"投稿 {post_id} (品番: {product_code}) videoc検索エラー: {e}")
-                        
-                        # videocで見つからない場合はvideoaで試行
-                        if not floor_used:
-                            try:
-                                search_result = self.engine.dmm.item_list(
-                                    site="FANZA",
-                                    service="digital",
-                                    floor="videoa",
-                                    keyword=product_code,
-                                    hits=1
-                                )
-                                if search_result.get('result', {}).get('items') and search_result['result']['items']:
-                                    floor_used = "videoa"
-                            except Exception as e:
-                                print(f"投稿 {post_id} (品番: {product_code}) videoa検索エラー: {e}")
-                        
-                        # デバッグ情報を出力
-                        print(f"投稿 {post_id} (品番: {product_code}) のAPIレスポンス:")
-                        print(f"  使用フロア: {floor_used or 'なし'}")
-                        print(f"  レスポンス構造: {list(search_result.keys()) if isinstance(search_result, dict) else type(search_result)}")
-                        if isinstance(search_result, dict):
-                            print(f"  resultキーの存在: {'result' in search_result}")
-                            if 'result' in search_result:
-                                print(f"  result.itemsキーの存在: {'items' in search_result['result']}")
-                                if 'items' in search_result['result']:
-                                    print(f"  itemsの内容: {len(search_result['result']['items'])}件")
+                        # 事前にまとめて解決した結果を使用
+                        floor_used, item = resolved.get(product_code, (None, None))
+                        print(f"投稿 {post_id} (品番: {product_code}) 使用フロア: {floor_used or 'なし'}")
                         
-                        if floor_used and search_result.get('result', {}).get('items') and search_result['result']['items']:
-                            item = search_result['result']['items'][0]
+                        if floor_used and item:
                             test_results.append({
                                 'post_id': post_id,
                                 'product_code': product_code,
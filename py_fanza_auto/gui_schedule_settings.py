@@ -234,17 +234,44 @@ class ScheduleSettingsTab:
             ttk.Checkbutton(hour_item_frame, text=hour_label, 
                            variable=self.hour_vars[hour_key]).pack(side=tk.LEFT)
             
-            # 投稿設定ラジオボタン
+            # 投稿設定チェックボックス（複数選択で同じ時間に並列実行）
             ttk.Label(hour_item_frame, text="（投稿設定：").pack(side=tk.LEFT, padx=(5, 0))
             
             self.hour_number_vars[hour_key] = tk.StringVar(value="1")
-            for num in range(1, 5):
-                ttk.Radiobutton(hour_item_frame, text=str(num), 
-                               variable=self.hour_number_vars[hour_key], 
-                               value=str(num)).pack(side=tk.LEFT, padx=(0, 2))
+            self._create_number_checks(hour_item_frame, self.hour_number_vars[hour_key])
             
             ttk.Label(hour_item_frame, text="）").pack(side=tk.LEFT)
     
+    def _create_number_checks(self, parent, number_var: tk.StringVar):
+        """投稿設定番号のチェックボックスを作成し、"1,3"形式の文字列変数と同期"""
+        check_vars = {str(num): tk.BooleanVar() for num in range(1, 5)}
+        syncing = [False]
+        
+        def on_check():
+            if syncing[0]:
+                return
+            selected = [num for num, var in check_vars.items() if var.get()]
+            if not selected:
+                # 何も選択されていない場合は設定1に戻す
+                selected = ["1"]
+            number_var.set(",".join(selected))
+        
+        def on_number_changed(*args):
+            syncing[0] = True
+            try:
+                selected = {part.strip() for part in number_var.get().split(",")}
+                for num, var in check_vars.items():
+                    var.set(num in selected)
+            finally:
+                syncing[0] = False
+        
+        for num, var in check_vars.items():
+            ttk.Checkbutton(parent, text=num, variable=var,
+                           command=on_check).pack(side=tk.LEFT, padx=(0, 2))
+        
+        number_var.trace_add("write", on_number_changed)
+        on_number_changed()
+    
     def _create_save_button(self, parent):
         """保存ボタンの作成"""
         save_frame = ttk.Frame(parent)
@@ -279,6 +306,10 @@ class ScheduleSettingsTab:
             if hasattr(self.main_gui, 'log_message'):
                 self.main_gui.log_message("スケジュール設定を保存しました。")
             
+            # スケジューラーに設定変更を通知（次回実行時刻を再計算）
+            if hasattr(self.main_gui, 'notify_schedule_changed'):
+                self.main_gui.notify_schedule_changed()
+            
             messagebox.showinfo("保存完了", "スケジュール設定を保存しました。")
             
         except Exception as e:
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Tuple
+
+try:
+    # Pillowがインストールされている場合のみ画像を加工する
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from media_buffer import MediaBuffer, READ_CHUNK_SIZE
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "eyecatch_cache")
+
+# 出力形式ごとの拡張子とPillowの保存形式
+FORMATS = {
+    "jpeg": (".jpg", "JPEG"),
+    "webp": (".webp", "WEBP"),
+}
+
+
+def process_image(source: Any, output_path: str, max_dimension: int, quality: int, output_format: str) -> int:
+    """画像を縮小・再圧縮してoutput_pathに保存し、保存したバイト数を返す
+    （プロセスプールで実行するためモジュール直下に置く）
+
+    sourceはファイルのパスか画像のbytes。大きな画像はパスで渡し、プロセス間で画像全体を
+    受け渡さないようにする。長辺をmax_dimension以下に縮小し、指定した品質で保存し直す。
+    EXIFなどのメタデータは保存時に引き継がないため取り除かれる。
+    """
+    _, pil_format = FORMATS[output_format]
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        image.load()
+        if max_dimension > 0 and max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if pil_format == "JPEG":
+            image.save(output_path, pil_format, quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(output_path, pil_format, quality=quality, method=4)
+    return os.path.getsize(output_path)
+
+
+def _read_media(path: str) -> MediaBuffer:
+    """ファイルをチャンクごとにMediaBufferへ読み込む"""
+    media = MediaBuffer()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            media.write(chunk)
+    return media.rewind()
+
+
+class ImagePreprocessor:
+    """アイキャッチ画像をアップロード前に縮小・再圧縮する
+
+    WordPress側でのサムネイル生成の負荷とアップロード時間を減らすため、アップロード前に
+    画像を設定した大きさ・品質に変換する。変換はプロセスプールで実行し、結果は元画像と
+    変換設定のハッシュをキーにキャッシュするので、同じ画像を何度も変換しない
+    （変換しても小さくならなかった画像も記録し、次回は変換せずに元の画像を使う）。
+    Pillowがない場合や変換に失敗した場合は元の画像をそのまま使う。
+    プロセスプールは終了時にshutdownで停止する（Engine.close）。
+    """
+
+    # 変換しても小さくならなかった画像の記録の拡張子
+    NO_GAIN_EXTENSION = ".nogain"
+
+    # 変換の待ち時間の上限（秒）
+    TIMEOUT = 60
+    # キャッシュに残すファイル数
+    MAX_CACHE_FILES = 1000
+
+    def __init__(self, max_dimension: int = 1280, quality: int = 82, output_format: str = "jpeg",
+                 workers: int = 2, cache_dir: Optional[str] = None):
+        self.max_dimension = max_dimension
+        self.quality = max(1, min(100, int(quality)))
+        self.output_format = output_format if output_format in FORMATS else "jpeg"
+        self.workers = max(1, int(workers))
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> Optional["ImagePreprocessor"]:
+        """設定で有効な場合のみ作成（Pillowがない場合もNone）"""
+        if not getattr(settings, "eyecatch_preprocess", False):
+            return None
+        if Image is None:
+            print("画像前処理: Pillowがインストールされていないため無効です")
+            return None
+        return cls(
+            max_dimension=getattr(settings, "eyecatch_max_dimension", 1280),
+            quality=getattr(settings, "eyecatch_quality", 82),
+            output_format=getattr(settings, "eyecatch_format", "jpeg"),
+            workers=getattr(settings, "eyecatch_workers", 2),
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _cache_key(self, media: Any) -> str:
+        digest = hashlib.sha256()
+        if isinstance(media, MediaBuffer):
+            for chunk in media.iter_chunks():
+                digest.update(chunk)
+        else:
+            digest.update(media)
+        digest.update(f"|{self.max_dimension}|{self.quality}|{self.output_format}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        extension, _ = FORMATS[self.output_format]
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    def _output_name(self, media_name: str) -> str:
+        extension, _ = FORMATS[self.output_format]
+        return os.path.splitext(media_name)[0] + extension
+
+    def process(self, media: Any, media_name: Optional[str]) -> Tuple[Any, Optional[str]]:
+        """画像を変換して (メディア, ファイル名) を返す（変換しない場合は引数をそのまま返す）"""
+        if not media or not media_name or Image is None:
+            return media, media_name
+        try:
+            key = self._cache_key(media)
+            cache_path = self._cache_path(key)
+            no_gain_path = os.path.join(self.cache_dir, key + self.NO_GAIN_EXTENSION)
+            if os.path.exists(no_gain_path):
+                print(f"画像前処理: 変換しても小さくならない画像のため元の画像を使用 {media_name}")
+                return media, media_name
+            if os.path.exists(cache_path):
+                print(f"画像前処理: キャッシュを使用 {media_name} ({os.path.getsize(cache_path)}バイト)")
+            elif not self._convert(media, cache_path, no_gain_path, media_name):
+                return media, media_name
+
+            processed = _read_media(cache_path)
+            if isinstance(media, MediaBuffer):
+                media.close()
+            return processed, self._output_name(media_name)
+        except Exception as e:
+            print(f"画像前処理エラーのため元の画像を使用: {e}")
+            return media, media_name
+
+    def _convert(self, media: Any, cache_path: str, no_gain_path: str, media_name: str) -> bool:
+        """プロセスプールで変換してキャッシュに保存（小さくならなければ記録だけしてFalse）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source_path = None
+        output_path = cache_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if isinstance(media, MediaBuffer):
+                # 画像全体をメモリに載せず、一時ファイルのパスを変換プロセスに渡す
+                fd, source_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".src")
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in media.iter_chunks():
+                        f.write(chunk)
+                media.rewind()
+            future = self._get_executor().submit(process_image, source_path or media, output_path,
+                                                 self.max_dimension, self.quality, self.output_format)
+            size = future.result(timeout=self.TIMEOUT)
+            if size >= len(media):
+                print(f"画像前処理: 変換後のほうが大きいため元の画像を使用 {media_name}")
+                self._save_cache(no_gain_path, None)
+                return False
+            self._save_cache(cache_path, output_path)
+            print(f"画像前処理: {media_name} {len(media)}バイト -> {size}バイト")
+            return True
+        finally:
+            for path in (source_path, output_path):
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _save_cache(self, path: str, source_path: Optional[str]):
+        """変換結果（source_path）をキャッシュに移す（Noneの場合は空のファイルを作成）"""
+        try:
+            if source_path:
+                os.replace(source_path, path)
+            else:
+                open(path, "wb").close()
+            self._prune_cache()
+        except Exception as e:
+            print(f"画像前処理キャッシュ保存エラー: {e}")
+
+    def _prune_cache(self):
+        """古いキャッシュファイルを削除"""
+        entries = [entry for entry in os.scandir(self.cache_dir)
+                   if entry.is_file() and not entry.name.endswith((".tmp", ".src"))]
+        if len(entries) <= self.MAX_CACHE_FILES:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.MAX_CACHE_FILES]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,251 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+
+DEFAULT_QUEUE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "job_queue.db")
+
+
+@dataclass
+class Job:
+    """キューから取り出した1件のアイテムジョブ"""
+    content_id: str
+    post_setting: str
+    item: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    """SQLiteを使ったプロセス間共有のジョブキュー
+
+    `cli.py plan` がアイテムを登録し、`cli.py worker` の各プロセスがリース付きで取り出す。
+    content_idを主キーにしているため、同じアイテムを何度登録しても1件として扱われ、
+    完了済みのアイテムが再実行されることはない。
+    リース期限を過ぎたジョブ（ワーカーが落ちた場合など）は他のワーカーが再取得できる。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_LEASED = "leased"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, db_path: Optional[str] = None, max_attempts: int = 3,
+                 lease_seconds: int = 600, retry_delay: int = 60):
+        self.db_path = db_path or DEFAULT_QUEUE_DB
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 複数プロセスからの同時アクセスを想定してWALモードで開く
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _init_database(self):
+        """データベースを初期化"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    content_id TEXT PRIMARY KEY,
+                    post_setting TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    post_id INTEGER,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, available_at)')
+        finally:
+            conn.close()
+
+    def enqueue(self, items: List[Dict[str, Any]], post_setting: str = "1") -> int:
+        """アイテムを登録し、新規に追加された件数を返す（登録済みのcontent_idは無視）"""
+        now = time.time()
+        rows = []
+        for item in items:
+            content_id = item.get("content_id")
+            if not content_id:
+                continue
+            rows.append((content_id, str(post_setting), json.dumps(item, ensure_ascii=False),
+                         self.max_attempts, now, now, now))
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO jobs (content_id, post_setting, item, max_attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+            return added
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def lease(self, worker_id: str) -> Optional[Job]:
+        """実行可能なジョブを1件リースする（なければNone）"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATEで書き込みロックを取り、複数ワーカーが同じジョブを取らないようにする
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute('''
+                SELECT content_id, post_setting, item, attempts, max_attempts FROM jobs
+                WHERE ((status = 'pending' AND available_at <= ?)
+                       OR (status = 'leased' AND lease_expires < ?))
+                  AND attempts < max_attempts
+                ORDER BY created_at
+                LIMIT 1
+            ''', (now, now)).fetchone()
+            if not row:
+                # リース切れのまま試行回数を使い切ったジョブは失敗扱いにする
+                conn.execute('''
+                    UPDATE jobs SET status = 'failed', lease_owner = NULL, updated_at = ?
+                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts
+                ''', (now, now))
+                conn.execute("COMMIT")
+                return None
+
+            content_id, post_setting, item_json, attempts, max_attempts = row
+            conn.execute('''
+                UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?,
+                                lease_expires = ?, updated_at = ?
+                WHERE content_id = ?
+            ''', (worker_id, now + self.lease_seconds, now, content_id))
+            conn.execute("COMMIT")
+            return Job(content_id=content_id, post_setting=post_setting, item=json.loads(item_json),
+                       attempts=attempts + 1, max_attempts=max_attempts)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, content_id: str, worker_id: str, post_id: Optional[int] = None) -> bool:
+        """ジョブを完了にする（リースを保持しているワーカーのみ）"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET status = 'done', post_id = ?, lease_owner = NULL, lease_expires = NULL,
+                                last_error = NULL, updated_at = ?
+                WHERE content_id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (post_id, time.time(), content_id, worker_id))
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def fail(self, content_id: str, worker_id: str, error: str) -> bool:
+        """ジョブを失敗にする。試行回数が残っていれば遅延させて再実行待ちに戻す"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET
+                    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    available_at = ? + ? * attempts,
+                    lease_owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+                WHERE content_id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (now, self.retry_delay, error[:2000], now, content_id, worker_id))
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def extend_lease(self, content_id: str, worker_id: str) -> bool:
+        """長時間の処理中にリースを延長"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET lease_expires = ? WHERE content_id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (time.time() + self.lease_seconds, content_id, worker_id))
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    @contextmanager
+    def heartbeat(self, content_id: str, worker_id: str, interval: Optional[float] = None) -> Iterator[None]:
+        """処理中のジョブのリースを別スレッドで定期的に延長する
+
+        Chromeでの取得や大きなメディアのアップロードなどでリース期限を過ぎると、
+        他のワーカーが同じジョブを取り直して二重に投稿するため、期限の1/3ごとに延長する。
+        """
+        interval = interval or max(0.1, self.lease_seconds / 3)
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(interval):
+                try:
+                    if not self.extend_lease(content_id, worker_id):
+                        print(f"ジョブキュー: {content_id} のリースを延長できませんでした")
+                        return
+                except Exception as e:
+                    print(f"ジョブキュー: {content_id} のリース延長エラー: {e}")
+
+        thread = threading.Thread(target=renew, name=f"lease-{content_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def has_remaining(self) -> bool:
+        """未完了（待機中・リース中）のジョブが残っているか"""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT COUNT(*) FROM jobs
+                WHERE status IN ('pending', 'leased') AND attempts < max_attempts
+                   OR status = 'leased' AND lease_expires >= ?
+            ''', (time.time(),)).fetchone()
+            return row[0] > 0
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        """ステータスごとの件数を取得"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+            result = {self.STATUS_PENDING: 0, self.STATUS_LEASED: 0, self.STATUS_DONE: 0, self.STATUS_FAILED: 0}
+            result.update({status: count for status, count in rows})
+            return result
+        finally:
+            conn.close()
+
+    def retry_failed(self) -> int:
+        """失敗したジョブを再実行待ちに戻す"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET status = 'pending', attempts = 0, available_at = ?, updated_at = ?
+                WHERE status = 'failed'
+            ''', (now, now))
+            return cursor.rowcount
+        finally:
+            conn.close()
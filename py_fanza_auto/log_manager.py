@@ -3,9 +3,10 @@ import logging
 import logging.handlers
 import os
 import sys
+import threading
 import traceback
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import json
@@ -42,68 +43,179 @@ class LogEntry:
     session_id: Optional[str] = None
 
 class DatabaseLogger:
-    """データベースベースのログ記録"""
+    """データベースベースのログ記録
+
+    ログは月ごとのテーブル（logs_YYYYMM）に、時刻を整数のエポック（マイクロ秒）で記録する。
+    保持期間を過ぎた月のテーブルはDROPでまとめて削除する。空いたページは次の書き込みで
+    再利用され、enable_auto_vacuumで変換済みのデータベースではインクリメンタルバキュームで
+    少しずつ解放する。これらの保守処理はstart_maintenanceで開始するバックグラウンドスレッドで
+    実行し、ログを書き込む側を待たせない。
+    旧形式のlogsテーブル（ISO文字列の時刻）が残っている場合は、保守処理で少しずつ移行する。
+    移行の完了はデータベースのuser_versionに記録し、以降は旧形式のテーブルを参照しない。
+    保守処理は別のプロセスでも動くため、月のテーブルが見つからない場合は一覧を取得し直して再試行する。
+    """
+    
+    PARTITION_PREFIX = "logs_"
+    LEGACY_TABLE = "logs"
+    # 旧形式のテーブルから1回の保守処理で移行する件数
+    MIGRATE_CHUNK = 5000
+    # 1回の保守処理で解放するページ数
+    VACUUM_PAGES = 2000
+    # 旧形式のテーブルの移行が完了したデータベースのuser_version
+    MIGRATED_VERSION = 2
     
     def __init__(self, db_path: str = "logs.db"):
         self.db_path = db_path
+        self._partitions: set = set()
+        self._legacy_migrated = False
+        self._lock = threading.Lock()
+        self._maintenance_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
         self._init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+    
     def _init_database(self):
         """データベースを初期化"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # ログテーブルを作成
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    level TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    details TEXT,
-                    error_traceback TEXT,
-                    user_id TEXT,
-                    session_id TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # インデックスを作成
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON logs(timestamp)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_level ON logs(level)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_type ON logs(type)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_id ON logs(user_id)')
-            
-            conn.commit()
+            conn = self._connect()
+            # 保守処理中も書き込みを止めないようWALにする
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._partitions = set(self._list_partitions(conn))
+            if not self._legacy_pending(conn):
+                # 新規作成・移行済みのデータベースは移行済みとして記録する
+                conn.execute(f"PRAGMA user_version = {self.MIGRATED_VERSION}")
             conn.close()
             
         except Exception as e:
             print(f"データベース初期化エラー: {e}")
     
+    @staticmethod
+    def _to_epoch(timestamp: datetime) -> int:
+        """datetimeを整数のエポック（マイクロ秒）に変換"""
+        return round(timestamp.timestamp() * 1_000_000)
+    
+    @staticmethod
+    def _from_epoch(value: int) -> datetime:
+        return datetime.fromtimestamp(value / 1_000_000)
+    
+    @classmethod
+    def _partition_name(cls, timestamp: datetime) -> str:
+        return f"{cls.PARTITION_PREFIX}{timestamp:%Y%m}"
+    
+    @classmethod
+    def _partition_month(cls, table: str) -> datetime:
+        """テーブル名からその月の初日を取得"""
+        return datetime.strptime(table[len(cls.PARTITION_PREFIX):], "%Y%m")
+    
+    @classmethod
+    def _partition_end(cls, table: str) -> datetime:
+        """テーブル名から翌月の初日を取得"""
+        month = cls._partition_month(table)
+        return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+    
+    def _list_partitions(self, conn: sqlite3.Connection) -> List[str]:
+        """月ごとのテーブル名を新しい順に取得"""
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'logs_[0-9][0-9][0-9][0-9][0-9][0-9]'"
+        ).fetchall()
+        return sorted((row[0] for row in rows), reverse=True)
+    
+    def _has_legacy_table(self, conn: sqlite3.Connection) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.LEGACY_TABLE,)
+        ).fetchone() is not None
+    
+    def _legacy_pending(self, conn: sqlite3.Connection) -> bool:
+        """旧形式のテーブルの移行が残っているか"""
+        if self._legacy_migrated:
+            return False
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self.MIGRATED_VERSION or not self._has_legacy_table(conn):
+            self._legacy_migrated = True
+            return False
+        return True
+    
+    def _refresh_partitions(self, conn: sqlite3.Connection):
+        """月のテーブルの一覧を取得し直す（別のプロセスの保守処理で削除された場合）"""
+        with self._lock:
+            self._partitions = set(self._list_partitions(conn))
+    
+    @staticmethod
+    def _is_missing_table(error: Exception) -> bool:
+        return isinstance(error, sqlite3.OperationalError) and "no such table" in str(error)
+    
+    def _ensure_partition(self, conn: sqlite3.Connection, table: str):
+        """月のテーブルがなければ作成"""
+        if table in self._partitions:
+            return
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                ts INTEGER NOT NULL,
+                level TEXT NOT NULL,
+                type TEXT NOT NULL,
+                message TEXT NOT NULL,
+                details TEXT,
+                error_traceback TEXT,
+                user_id TEXT,
+                session_id TEXT
+            )
+        ''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(ts)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_type_ts ON {table}(type, ts)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_level_ts ON {table}(level, ts)')
+        with self._lock:
+            self._partitions.add(table)
+    
+    def _insert(self, conn: sqlite3.Connection, rows: List[Tuple[datetime, tuple]]):
+        """(時刻, 残りの列) のリストを月ごとのテーブルに振り分けて記録"""
+        by_table: Dict[str, List[tuple]] = {}
+        for timestamp, values in rows:
+            by_table.setdefault(self._partition_name(timestamp), []).append((self._to_epoch(timestamp),) + values)
+        for table, table_rows in by_table.items():
+            self._ensure_partition(conn, table)
+            conn.executemany(f'''
+                INSERT INTO {table} (ts, level, type, message, details, error_traceback, user_id, session_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', table_rows)
+    
+    @staticmethod
+    def _entry_values(entry: LogEntry) -> tuple:
+        return (
+            entry.level.value,
+            entry.type.value,
+            entry.message,
+            json.dumps(entry.details) if entry.details else None,
+            entry.error_traceback,
+            entry.user_id,
+            entry.session_id
+        )
+    
     def log(self, entry: LogEntry):
         """ログエントリを記録"""
+        self.log_many([entry])
+    
+    def log_many(self, entries: List[LogEntry]):
+        """複数のログエントリを1トランザクションで記録"""
+        if not entries:
+            return
+        rows = [(entry.timestamp, self._entry_values(entry)) for entry in entries]
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO logs (timestamp, level, type, message, details, error_traceback, user_id, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                entry.timestamp.isoformat(),
-                entry.level.value,
-                entry.type.value,
-                entry.message,
-                json.dumps(entry.details) if entry.details else None,
-                entry.error_traceback,
-                entry.user_id,
-                entry.session_id
-            ))
-            
-            conn.commit()
-            conn.close()
+            conn = self._connect()
+            try:
+                try:
+                    with conn:
+                        self._insert(conn, rows)
+                except sqlite3.OperationalError as e:
+                    if not self._is_missing_table(e):
+                        raise
+                    # 保持しているテーブルが削除されていたので、一覧を取得し直して作り直す
+                    self._refresh_partitions(conn)
+                    with conn:
+                        self._insert(conn, rows)
+            finally:
+                conn.close()
             
         except Exception as e:
             print(f"ログ記録エラー: {e}")
@@ -114,74 +226,120 @@ class DatabaseLogger:
                  user_id: Optional[str] = None,
                  start_date: Optional[datetime] = None,
                  end_date: Optional[datetime] = None,
-                 limit: int = 1000) -> List[LogEntry]:
-        """ログを取得"""
+                 limit: int = 1000,
+                 keyword: Optional[str] = None) -> List[LogEntry]:
+        """ログを取得（新しい順）
+        
+        期間に重なる月のテーブルだけを新しい順に検索し、limit件に達したら打ち切る。
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM logs WHERE 1=1"
-            params = []
+            conn = self._connect()
             
+            conditions = []
+            params: List[Any] = []
             if level:
-                query += " AND level = ?"
+                conditions.append("level = ?")
                 params.append(level.value)
-            
             if type:
-                query += " AND type = ?"
+                conditions.append("type = ?")
                 params.append(type.value)
-            
             if user_id:
-                query += " AND user_id = ?"
+                conditions.append("user_id = ?")
                 params.append(user_id)
-            
-            if start_date:
-                query += " AND timestamp >= ?"
-                params.append(start_date.isoformat())
-            
-            if end_date:
-                query += " AND timestamp <= ?"
-                params.append(end_date.isoformat())
-            
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
+            if keyword:
+                conditions.append("message LIKE ?")
+                params.append(f"%{keyword}%")
+            
+            def select(table: str, ts_column: str, convert) -> List[tuple]:
+                where = list(conditions)
+                where_params = list(params)
+                if start_date:
+                    where.append(f"{ts_column} >= ?")
+                    where_params.append(convert(start_date))
+                if end_date:
+                    where.append(f"{ts_column} <= ?")
+                    where_params.append(convert(end_date))
+                query = f"SELECT {ts_column}, level, type, message, details, error_traceback, user_id, session_id FROM {table}"
+                if where:
+                    query += " WHERE " + " AND ".join(where)
+                query += f" ORDER BY {ts_column} DESC LIMIT ?"
+                return conn.execute(query, where_params + [limit]).fetchall()
+            
+            def collect() -> List[Tuple[datetime, tuple]]:
+                rows: List[Tuple[datetime, tuple]] = []
+                for table in self._list_partitions(conn):
+                    if start_date and self._partition_end(table) <= start_date:
+                        break
+                    if end_date and self._partition_month(table) > end_date:
+                        continue
+                    rows.extend((self._from_epoch(row[0]), row[1:]) for row in select(table, "ts", self._to_epoch))
+                    if len(rows) >= limit:
+                        break
+                if self._legacy_pending(conn):
+                    # 移行中の旧形式のログも含める
+                    rows.extend((datetime.fromisoformat(row[0]), row[1:]) for row in
+                                select(self.LEGACY_TABLE, "timestamp", lambda d: d.isoformat()))
+                return rows
+            
+            try:
+                try:
+                    rows = collect()
+                except sqlite3.OperationalError as e:
+                    if not self._is_missing_table(e):
+                        raise
+                    # 検索中に保守処理がテーブルを削除・移行したので、一覧を取得し直して検索し直す
+                    self._refresh_partitions(conn)
+                    rows = collect()
+            finally:
+                conn.close()
+            
+            rows.sort(key=lambda row: row[0], reverse=True)
             logs = []
-            for row in rows:
+            for timestamp, row in rows[:limit]:
                 log = LogEntry(
-                    timestamp=datetime.fromisoformat(row[1]),
-                    level=LogLevel(row[2]),
-                    type=LogType(row[3]),
-                    message=row[4],
-                    details=json.loads(row[5]) if row[5] else None,
-                    error_traceback=row[6],
-                    user_id=row[7],
-                    session_id=row[8]
+                    timestamp=timestamp,
+                    level=LogLevel(row[0]),
+                    type=LogType(row[1]),
+                    message=row[2],
+                    details=json.loads(row[3]) if row[3] else None,
+                    error_traceback=row[4],
+                    user_id=row[5],
+                    session_id=row[6]
                 )
                 logs.append(log)
-            
-            conn.close()
             return logs
             
         except Exception as e:
             print(f"ログ取得エラー: {e}")
             return []
     
-    def cleanup_old_logs(self, days: int = 30):
-        """古いログを削除"""
+    def cleanup_old_logs(self, days: int = 30) -> int:
+        """古いログを削除
+        
+        保持期間より前の月のテーブルはDROPで丸ごと削除し、境界の月だけ行単位で削除する。
+        """
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM logs WHERE timestamp < ?', (cutoff_date.isoformat(),))
-            deleted_count = cursor.rowcount
-            
-            conn.commit()
+            cutoff_table = self._partition_name(cutoff_date)
+            deleted_count = 0
+            
+            conn = self._connect()
+            for table in self._list_partitions(conn):
+                if table > cutoff_table:
+                    continue
+                with conn:
+                    if table == cutoff_table:
+                        cursor = conn.execute(f'DELETE FROM {table} WHERE ts < ?', (self._to_epoch(cutoff_date),))
+                        deleted_count += cursor.rowcount
+                    else:
+                        deleted_count += conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                        conn.execute(f'DROP TABLE {table}')
+                        with self._lock:
+                            self._partitions.discard(table)
+            if self._legacy_pending(conn):
+                with conn:
+                    cursor = conn.execute(f'DELETE FROM {self.LEGACY_TABLE} WHERE timestamp < ?', (cutoff_date.isoformat(),))
+                    deleted_count += cursor.rowcount
             conn.close()
             
             return deleted_count
@@ -189,6 +347,104 @@ class DatabaseLogger:
         except Exception as e:
             print(f"ログクリーンアップエラー: {e}")
             return 0
+    
+    def _migrate_legacy(self) -> int:
+        """旧形式のlogsテーブルからMIGRATE_CHUNK件を月ごとのテーブルに移す（空になったら削除）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if not self._legacy_pending(conn):
+                return 0
+            # 読み込みから削除までを1つの書き込みトランザクションにし、
+            # 他のスレッド・プロセスが同じ行を移行しないようにする
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._legacy_pending(conn):
+                    conn.execute("ROLLBACK")
+                    return 0
+                rows = conn.execute(f'''
+                    SELECT id, timestamp, level, type, message, details, error_traceback, user_id, session_id
+                    FROM {self.LEGACY_TABLE} ORDER BY id LIMIT ?
+                ''', (self.MIGRATE_CHUNK,)).fetchall()
+                if rows:
+                    self._insert(conn, [(datetime.fromisoformat(row[1]), tuple(row[2:])) for row in rows])
+                    conn.execute(f'DELETE FROM {self.LEGACY_TABLE} WHERE id <= ?', (rows[-1][0],))
+                if len(rows) < self.MIGRATE_CHUNK:
+                    conn.execute(f'DROP TABLE {self.LEGACY_TABLE}')
+                    conn.execute(f"PRAGMA user_version = {self.MIGRATED_VERSION}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                with self._lock:
+                    # ロールバックで作成が取り消された月のテーブルを次回作り直す
+                    self._partitions.clear()
+                raise
+            if len(rows) < self.MIGRATE_CHUNK:
+                self._legacy_migrated = True
+                print("ログ: 旧形式のテーブルの移行が完了しました")
+            return len(rows)
+        finally:
+            conn.close()
+    
+    def _incremental_vacuum(self):
+        """削除で空いたページを少しずつ解放する（インクリメンタルバキュームが有効な場合のみ）
+
+        無効なデータベースを保守処理の中でVACUUMして変換すると、大きなlogs.dbでは
+        書き込みが長時間待たされるため、変換はenable_auto_vacuumで停止中に行う。
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                conn.execute(f"PRAGMA incremental_vacuum({self.VACUUM_PAGES})").fetchall()
+        finally:
+            conn.close()
+    
+    def enable_auto_vacuum(self) -> bool:
+        """インクリメンタルバキュームを有効にするためVACUUMする（ログを書き込むプロセスを止めてから実行）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            return True
+        finally:
+            conn.close()
+    
+    def run_maintenance(self, retention_days: int = 30) -> int:
+        """保守処理（旧形式の移行・保持期間を過ぎたログの削除・領域の解放）を1回実行し、移行した件数を返す"""
+        migrated = 0
+        try:
+            migrated = self._migrate_legacy()
+            if migrated >= self.MIGRATE_CHUNK:
+                # 移行が残っている間は移行だけを続ける
+                return migrated
+            deleted = self.cleanup_old_logs(retention_days)
+            self._incremental_vacuum()
+            if migrated or deleted:
+                print(f"ログ保守: 移行 {migrated}件, 削除 {deleted}件")
+        except Exception as e:
+            print(f"ログ保守エラー: {e}")
+        return migrated
+    
+    def start_maintenance(self, retention_days: int = 30, interval_sec: float = 3600, initial_delay_sec: float = 60):
+        """保守処理を定期的に実行するバックグラウンドスレッドを開始"""
+        if self._maintenance_thread and self._maintenance_thread.is_alive():
+            return
+        self._stop_event.clear()
+        
+        def loop():
+            delay = initial_delay_sec
+            while not self._stop_event.wait(delay):
+                migrated = self.run_maintenance(retention_days)
+                # 移行が残っている間は間隔を空けずに続ける
+                delay = 1 if migrated >= self.MIGRATE_CHUNK else interval_sec
+        
+        self._maintenance_thread = threading.Thread(target=loop, name="log-maintenance", daemon=True)
+        self._maintenance_thread.start()
+    
+    def stop_maintenance(self):
+        """保守処理のスレッドを停止"""
+        self._stop_event.set()
 
 class LogManager:
     """ログ管理クラス"""
@@ -197,9 +453,11 @@ class LogManager:
                  log_dir: str = "logs",
                  db_logging: bool = True,
                  file_logging: bool = True,
-                 console_logging: bool = True):
+                 console_logging: bool = True,
+                 retention_days: int = 30):
         
         self.log_dir = Path(log_dir)
+        self.retention_days = retention_days
         self.db_logging = db_logging
         self.file_logging = file_logging
         self.console_logging = console_logging
@@ -234,6 +492,15 @@ class LogManager:
             LogType.CATEGORY: LogLevel.INFO
         }
     
+    def start_maintenance(self):
+        """保持期間を過ぎたログの削除などの保守処理をバックグラウンドで開始
+
+        同じlogs.dbを使うプロセスごとに動かさないよう、常駐するプロセス（GUI・scheduleモード）で
+        のみ呼び出す。
+        """
+        if self.db_logger:
+            self.db_logger.start_maintenance(self.retention_days)
+    
     def _setup_file_logging(self):
         """ファイルログ設定"""
         try:
@@ -363,16 +630,36 @@ class LogManager:
         """重大エラーログ"""
         self.log(LogLevel.CRITICAL, type, message, details, user_id, exception)
     
+    def log_messages(self, 
+                     type: LogType,
+                     messages: List[Tuple[datetime, str]],
+                     level: LogLevel = LogLevel.INFO):
+        """記録時刻付きメッセージをデータベースへ一括記録（標準ログには出力しない）"""
+        if not self.db_logger or not messages:
+            return
+        entries = [
+            LogEntry(
+                timestamp=timestamp,
+                level=level,
+                type=type,
+                message=message,
+                session_id=self.session_id
+            )
+            for timestamp, message in messages
+        ]
+        self.db_logger.log_many(entries)
+    
     def get_logs(self, 
                  level: Optional[LogLevel] = None,
                  type: Optional[LogType] = None,
                  user_id: Optional[str] = None,
                  start_date: Optional[datetime] = None,
                  end_date: Optional[datetime] = None,
-                 limit: int = 1000) -> List[LogEntry]:
+                 limit: int = 1000,
+                 keyword: Optional[str] = None) -> List[LogEntry]:
         """ログを取得"""
         if self.db_logger:
-            return self.db_logger.get_logs(level, type, user_id, start_date, end_date, limit)
+            return self.db_logger.get_logs(level, type, user_id, start_date, end_date, limit, keyword)
         return []
     
     def cleanup_old_logs(self, days: int = 30) -> int:
@@ -394,10 +681,11 @@ class LogManager:
                     level: Optional[LogLevel] = None,
                     type: Optional[LogType] = None,
                     start_date: Optional[datetime] = None,
-                    end_date: Optional[datetime] = None) -> bool:
+                    end_date: Optional[datetime] = None,
+                    keyword: Optional[str] = None) -> bool:
         """ログをエクスポート"""
         try:
-            logs = self.get_logs(level, type, None, start_date, end_date, 100000)
+            logs = self.get_logs(level, type, None, start_date, end_date, 100000, keyword)
             
             with open(output_file, 'w', encoding='utf-8') as f:
                 for log in logs:
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import tempfile
+from typing import Iterator, Optional
+
+
+# この大きさを超えたメディアはメモリではなく一時ファイルに保持する
+SPOOL_THRESHOLD = 1024 * 1024
+# 読み出し時のチャンクサイズ
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class MediaBuffer:
+    """ダウンロードしたメディアの保持先
+
+    チャンクを追記していき、SPOOL_THRESHOLDまではメモリ、超えたら一時ファイルに保持する。
+    bytesの連結を繰り返さないため、大きな画像でもコピーが増えず、並列実行時の
+    1件あたりのメモリ使用量も上限が決まる。
+    ファイルとして読み出せるので、requestsのdataにそのまま渡すとアップロード時も
+    全体をメモリに載せずに送信できる。
+    """
+
+    def __init__(self, spool_threshold: int = SPOOL_THRESHOLD):
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+        self._size = 0
+
+    def write(self, chunk: bytes) -> int:
+        self._file.seek(0, 2)
+        self._file.write(chunk)
+        self._size += len(chunk)
+        return len(chunk)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def spooled_to_disk(self) -> bool:
+        """一時ファイルに書き出されているか"""
+        return bool(getattr(self._file, "_rolled", False))
+
+    # ファイルとしての読み出し（requestsの送信データとして使う）
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def rewind(self) -> "MediaBuffer":
+        """先頭から読み出せるようにする"""
+        self._file.seek(0)
+        return self
+
+    def iter_chunks(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """先頭からチャンクごとに読み出す"""
+        self._file.seek(0)
+        while True:
+            chunk = self._file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def getvalue(self) -> bytes:
+        """全体をbytesとして取得（小さいメディアや互換用）"""
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "MediaBuffer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def close_media(media: Optional[object]):
+    """MediaBufferなら一時ファイルを閉じる（bytesの場合は何もしない）"""
+    if isinstance(media, MediaBuffer):
+        media.close()
@@ -0,0 +1,223 @@
+"""
+Prometheus形式の計測値エクスポーター
+DMM API・WordPress・Chrome・投稿処理の件数と所要時間をプロセス内で集計し、
+有効にした場合のみローカルのHTTPエンドポイント（/metrics）で公開する。
+集計は辞書の加算だけなので、無効のままでも処理にはほとんど影響しない。
+"""
+from __future__ import annotations
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from concurrency import budget
+
+# 所要時間のヒストグラムの区切り（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: Optional[str] = None) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """増加するだけのカウンタ"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """所要時間などの分布"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # ラベル -> (区間ごとの件数, 合計, 件数)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts, total, count = self._values.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, str(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, '+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """出力時に関数で値を取得するゲージ（関数は {ラベル: 値} を返す）"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if self.callback is None:
+            return lines
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"メトリクス取得エラー ({self.name}): {e}")
+            return lines
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """計測値の一覧とHTTPエンドポイント"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None) -> Gauge:
+        """ゲージを登録（同じ名前で登録し直すと関数を置き換える）"""
+        gauge = self._metrics.setdefault(name, Gauge(name, help_text, labelnames))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def start(self, port: int = 9464, host: str = "127.0.0.1") -> bool:
+        """/metricsを公開するHTTPサーバーをバックグラウンドで開始"""
+        with self._lock:
+            if self._server is not None:
+                return True
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/metrics", "/"):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self._server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                print(f"メトリクスエクスポーター起動エラー ({host}:{port}): {e}")
+                return False
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True).start()
+            print(f"メトリクスエクスポーターを開始: http://{host}:{port}/metrics")
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+
+
+# グローバルなレジストリと計測値
+registry = MetricsRegistry()
+
+dmm_requests = registry.counter("fanza_dmm_requests_total", "DMM APIへのリクエスト数", ("endpoint", "result"))
+dmm_request_seconds = registry.histogram("fanza_dmm_request_seconds", "DMM APIの応答時間", ("endpoint",))
+wp_requests = registry.counter("fanza_wp_requests_total", "WordPress REST APIへのリクエスト数", ("method", "status"))
+wp_request_seconds = registry.histogram("fanza_wp_request_seconds", "WordPress REST APIの応答時間", ("method",))
+browser_fetches = registry.counter("fanza_browser_fetches_total", "Chromeでのページ取得数", ("result",))
+browser_fetch_seconds = registry.histogram("fanza_browser_fetch_seconds", "Chromeでのページ取得時間（起動含む）")
+posts = registry.counter("fanza_posts_total", "投稿処理の結果ごとの件数", ("result",))
+post_seconds = registry.histogram("fanza_post_seconds", "1アイテムの投稿処理時間", buckets=(1, 2.5, 5, 10, 30, 60, 120, 300))
+
+
+def _slot_usage() -> Dict[Tuple[str, ...], float]:
+    return {
+        ("chrome", "in_use"): budget.chrome_in_use,
+        ("chrome", "max"): budget.max_chrome_instances,
+        ("wp_write", "in_use"): budget.wp_writes_in_use,
+        ("wp_write", "max"): budget.max_wp_writes,
+    }
+
+
+slots = registry.gauge("fanza_slots", "同時実行枠（Chrome・WordPress書き込み）の使用数と上限", ("slot", "kind"), _slot_usage)
+
+
+def _job_queue_counts() -> Dict[Tuple[str, ...], float]:
+    """共有のジョブキュー（config/job_queue.db）のステータスごとの件数
+
+    ワーカーは別プロセスで動き/metricsを公開しないため、公開するプロセスがキューのDBを直接読む。
+    """
+    from job_queue import DEFAULT_QUEUE_DB, JobQueue
+    if not os.path.exists(DEFAULT_QUEUE_DB):
+        return {}
+    return {(status,): count for status, count in JobQueue(DEFAULT_QUEUE_DB).stats().items()}
+
+
+job_queue_jobs = registry.gauge("fanza_job_queue_jobs", "ジョブキューのステータスごとの件数", ("status",), _job_queue_counts)
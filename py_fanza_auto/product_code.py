@@ -0,0 +1,155 @@
+"""
+既存投稿からの品番抽出
+正規表現はモジュール読み込み時に一度だけコンパイルし、チャンクごとに進捗を通知しながら
+その場で処理する（slugの検査だけなので数万件でも1秒かからない）。抽出結果は
+投稿ID→品番の対応表として保存し、slugが変わっていない投稿は次回以降抽出し直さない。
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_CODE_MAP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "product_codes.json")
+
+# 品番抽出用の正規表現パターン（上から順に優先）
+PRODUCT_CODE_PATTERNS = [
+    r'[A-Z]{2,4}-\d{3,4}',  # ABC-123, ABCD-1234
+    r'[A-Z]{2,4}\d{3,4}',   # ABC123, ABCD1234
+    r'[A-Z]{2,4}_\d{3,4}',  # ABC_123, ABCD_1234
+    r'[A-Z]{2,4}-\d{2,5}',  # ABC-12, ABCD-12345
+    r'[A-Z]{2,5}-\d{2,5}',  # ABCDE-12, ABC-12345
+    r'[A-Z]{2,5}\d{2,5}',   # ABCDE12, ABC12345
+]
+# 厳密なパターンで見つからない場合の緩いパターン
+LOOSE_PRODUCT_CODE_PATTERNS = [
+    r'[A-Z]{2,6}[-_]?\d{2,6}',  # より柔軟なパターン
+    r'[A-Z]{2,6}\s*\d{2,6}',    # スペース区切り
+]
+
+_COMPILED_PATTERNS = [re.compile(p, re.IGNORECASE) for p in PRODUCT_CODE_PATTERNS + LOOSE_PRODUCT_CODE_PATTERNS]
+# どのパターンにも一致しえないテキストを1回の検索で除外するための結合パターン
+_ANY_CODE = re.compile(r'[A-Z]{2}[-_\s]*\d', re.IGNORECASE)
+# 品番として妥当か（4〜15文字で英字と数字の両方を含む）
+_VALID_CODE = re.compile(r'(?=.*[A-Z])(?=.*\d).{4,15}', re.IGNORECASE | re.DOTALL)
+
+# 進捗を通知する1チャンクの件数
+CHUNK_SIZE = 2000
+
+
+def is_valid_product_code(code: str) -> bool:
+    """品番として妥当かチェック"""
+    return bool(code) and _VALID_CODE.fullmatch(code) is not None
+
+
+def find_product_code(text: str) -> Optional[str]:
+    """テキストから品番を検索（優先度の高いパターンから順に試す）"""
+    if not text or not _ANY_CODE.search(text):
+        return None
+    for pattern in _COMPILED_PATTERNS:
+        match = pattern.search(text)
+        if match and is_valid_product_code(match.group()):
+            return match.group()
+    return None
+
+
+def extract_code(slug: str) -> Optional[str]:
+    """投稿のslugから品番を取得（slugが品番として妥当な場合のみ）"""
+    return slug if slug and is_valid_product_code(slug) else None
+
+
+def extract_chunk(rows: List[Tuple[int, str]]) -> List[Tuple[int, str, Optional[str]]]:
+    """(投稿ID, slug) のリストから品番を抽出"""
+    return [(post_id, slug, extract_code(slug)) for post_id, slug in rows]
+
+
+class ProductCodeExtractor:
+    """投稿ID→品番の対応表を保持し、未抽出・slug変更分だけを抽出する"""
+
+    def __init__(self, map_file: Optional[str] = None):
+        self.map_file = map_file or DEFAULT_CODE_MAP_FILE
+        self._lock = threading.Lock()
+        # 投稿ID -> {"slug": slug, "code": 品番またはNone}
+        self._entries: Dict[int, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[int, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.map_file):
+                with open(self.map_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                return {int(post_id): entry for post_id, entry in data.items()}
+        except Exception as e:
+            print(f"品番対応表読み込みエラー: {e}")
+        return {}
+
+    def save(self):
+        """対応表を保存"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.map_file)), exist_ok=True)
+            with self._lock:
+                data = {str(post_id): entry for post_id, entry in self._entries.items()}
+            temp_file = self.map_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.map_file)
+        except Exception as e:
+            print(f"品番対応表保存エラー: {e}")
+
+    def get(self, post_id: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(post_id)
+            return entry.get("code") if entry else None
+
+    def set(self, post_id: int, code: Optional[str], slug: str = ""):
+        """品番を手動で設定"""
+        with self._lock:
+            self._entries[post_id] = {"slug": slug, "code": code}
+
+    def _record(self, results: Iterable[Tuple[int, str, Optional[str]]]) -> Dict[int, str]:
+        codes = {}
+        with self._lock:
+            for post_id, slug, code in results:
+                self._entries[post_id] = {"slug": slug, "code": code}
+                if code:
+                    codes[post_id] = code
+        return codes
+
+    def extract(self, posts: List[Dict[str, Any]],
+                on_progress: Optional[Callable[[Dict[int, str], int, int], None]] = None) -> Dict[int, str]:
+        """投稿から品番を抽出し、品番が見つかった投稿の {投稿ID: 品番} を返す
+
+        対応表にありslugが変わっていない投稿は抽出し直さない。on_progressには
+        チャンクごとに (そのチャンクで見つかった品番, 処理済み件数, 全件数) が渡される。
+        """
+        total = len(posts)
+        codes: Dict[int, str] = {}
+        pending: List[Tuple[int, str]] = []
+        with self._lock:
+            for post in posts:
+                post_id = post.get("id")
+                slug = post.get("slug", "") or ""
+                entry = self._entries.get(post_id)
+                if entry is not None and entry.get("slug") == slug:
+                    if entry.get("code"):
+                        codes[post_id] = entry["code"]
+                else:
+                    pending.append((post_id, slug))
+
+        done = total - len(pending)
+        print(f"品番抽出: 全{total}件中 {done}件は対応表から取得、{len(pending)}件を抽出")
+        if on_progress:
+            on_progress(dict(codes), done, total)
+
+        for i in range(0, len(pending), CHUNK_SIZE):
+            chunk = pending[i:i + CHUNK_SIZE]
+            found = self._record(extract_chunk(chunk))
+            codes.update(found)
+            done += len(chunk)
+            if on_progress:
+                on_progress(found, done, total)
+
+        if pending:
+            self.save()
+        return codes
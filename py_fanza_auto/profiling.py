@@ -0,0 +1,81 @@
+"""
+1回の実行のプロファイル取得
+cProfileで実行を計測し、実行IDごとにpstats形式のファイル（snakeviz等で開ける）と
+累積時間の上位をまとめたテキストを config/profiles に保存する。
+cProfileは呼び出したスレッドのみを計測するため、画像処理などのワーカースレッド内の
+時間は呼び出し側の待ち時間（Future.result等）として現れる。
+"""
+from __future__ import annotations
+import cProfile
+import io
+import os
+import pstats
+import uuid
+from typing import Any, Callable, List, Optional, Tuple
+
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "profiles")
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_profiled(func: Callable[..., Any], *args, **kwargs) -> Tuple[Any, cProfile.Profile]:
+    """funcをプロファイルしながら実行し、(戻り値, プロファイラ) を返す"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    return result, profiler
+
+
+def hotspots(profiler: cProfile.Profile, top: int = 15) -> List[Tuple[str, int, float, float]]:
+    """累積時間の上位（このプロジェクトの関数を優先）を (関数, 呼び出し数, 自身の時間, 累積時間) で返す"""
+    stats = pstats.Stats(profiler).stats
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.items():
+        if "_lsprof" in name:
+            continue
+        in_project = os.path.abspath(filename).startswith(_PROJECT_DIR) if not filename.startswith("<") else False
+        label = f"{os.path.basename(filename)}:{lineno}({name})" if lineno else name
+        rows.append((in_project, label, ncalls, tottime, cumtime))
+    project_rows = sorted((r for r in rows if r[0]), key=lambda r: r[4], reverse=True)
+    other_rows = sorted((r for r in rows if not r[0]), key=lambda r: r[4], reverse=True)
+    selected = project_rows[:top]
+    if len(selected) < top:
+        selected += other_rows[:top - len(selected)]
+    return [(label, ncalls, tottime, cumtime) for _, label, ncalls, tottime, cumtime in selected]
+
+
+def format_hotspots(profiler: cProfile.Profile, top: int = 15) -> str:
+    """累積時間の上位をテキストにする"""
+    rows = hotspots(profiler, top)
+    if not rows:
+        return "プロファイル結果がありません"
+    lines = ["■ 累積時間の上位（秒）", f"{'累積':>9} {'自身':>9} {'呼出数':>8}  関数"]
+    for label, ncalls, tottime, cumtime in rows:
+        lines.append(f"{cumtime:9.3f} {tottime:9.3f} {ncalls:8d}  {label}")
+    return "\n".join(lines)
+
+
+def save_profile(profiler: cProfile.Profile, run_id: Optional[str] = None, top: int = 15,
+                 profile_dir: Optional[str] = None) -> Tuple[str, str]:
+    """プロファイル結果を <実行ID>.prof と <実行ID>.txt に保存し、(profファイルのパス, 上位の要約) を返す"""
+    profile_dir = profile_dir or PROFILE_DIR
+    run_id = run_id or uuid.uuid4().hex[:12]
+    summary = format_hotspots(profiler, top)
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{run_id}.prof")
+        profiler.dump_stats(path)
+
+        # 標準のpstats出力（累積時間順）も要約と一緒に残す
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(50)
+        with open(os.path.join(profile_dir, f"{run_id}.txt"), "w", encoding="utf-8") as f:
+            f.write(summary + "\n\n" + buffer.getvalue())
+        print(f"プロファイルを保存: {path}")
+    except Exception as e:
+        print(f"プロファイル保存エラー: {e}")
+        path = ""
+    return path, summary
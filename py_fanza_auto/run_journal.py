@@ -0,0 +1,419 @@
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from media_buffer import MediaBuffer
+
+
+DEFAULT_JOURNAL_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "run_journal.db")
+
+
+class ItemState(Enum):
+    """アイテム処理の進行状態（定義順に進む）"""
+    FETCHED = "fetched"              # DMM APIから取得済み
+    RENDERED = "rendered"            # 本文・タイトル・アイキャッチ生成済み
+    POST_CREATED = "post_created"    # WordPressに投稿作成済み
+    TAXONOMY_SET = "taxonomy_set"    # カテゴリ・タグ設定済み
+    MEDIA_ATTACHED = "media_attached"  # アイキャッチ設定済み
+    DONE = "done"                    # 完了（スキップ含む）
+
+
+_STATE_ORDER = {state: index for index, state in enumerate(ItemState)}
+
+
+def _process_alive(pid: int) -> bool:
+    """同じホストのプロセスが動いているか（確認できない場合は動いているとみなす）"""
+    if os.name == "nt":
+        # Windowsのos.killはプロセスを終了させるため使わない
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JournalEntry:
+    """1アイテム分のジャーナル記録"""
+
+    def __init__(self, journal: "RunJournal", run_id: str, content_id: str, item: Dict[str, Any],
+                 state: ItemState = ItemState.FETCHED, post_id: Optional[int] = None, attempts: int = 0,
+                 media_id: Optional[int] = None):
+        self.journal = journal
+        self.run_id = run_id
+        self.content_id = content_id
+        self.item = item
+        self.state = state
+        self.post_id = post_id
+        self.attempts = attempts
+        # アップロード済みのアイキャッチのメディアID（設定前に止まった場合に再アップロードしない）
+        self.media_id = media_id
+
+    def reached(self, state: ItemState) -> bool:
+        """指定した状態まで進んでいるか"""
+        return _STATE_ORDER[self.state] >= _STATE_ORDER[state]
+
+    def mark(self, state: ItemState, post_id: Optional[int] = None):
+        """状態を進める"""
+        if post_id is not None:
+            self.post_id = post_id
+        self.state = state
+        self.journal._update_entry(self, clear_payload=state == ItemState.DONE,
+                                   clear_media=self.reached(ItemState.MEDIA_ATTACHED))
+
+    def mark_rendered(self, title: str, content: str, media_bytes: Optional[bytes], media_name: Optional[str]):
+        """生成結果を保存して、再開時に取得・生成をやり直さないようにする"""
+        self.state = ItemState.RENDERED
+        self.journal._save_rendered(self, title, content, media_bytes, media_name)
+
+    def rendered(self) -> Tuple[str, str, Optional[MediaBuffer], Optional[str]]:
+        """保存済みの生成結果を取得"""
+        return self.journal._load_rendered(self)
+
+    def mark_media_uploaded(self, media_id: int):
+        """アップロードしたメディアIDを記録し、保存していた画像ファイルを削除する"""
+        self.media_id = media_id
+        self.journal._save_media_id(self, media_id)
+
+    def mark_done(self, post_id: Optional[int] = None):
+        self.mark(ItemState.DONE, post_id)
+
+    def record_error(self, error: str):
+        """エラーを記録（状態はそのままにして再開時に続きから処理する）"""
+        self.attempts += 1
+        self.journal._record_error(self, error)
+
+
+class JournalRun:
+    """1回のrun_onceに対応する実行記録"""
+
+    def __init__(self, journal: "RunJournal", run_id: str, post_setting: str, offset: int, resumed: bool):
+        self.journal = journal
+        self.run_id = run_id
+        self.post_setting = post_setting
+        self.offset = offset
+        self.resumed = resumed
+
+    def entry(self, item: Dict[str, Any]) -> Optional[JournalEntry]:
+        """アイテムのジャーナルを取得（なければFETCHEDで作成）。content_idがない場合はNone"""
+        content_id = item.get("content_id")
+        if not content_id:
+            return None
+        return self.journal._get_or_create_entry(self.run_id, content_id, item)
+
+    def unfinished_entries(self, max_attempts: int = 3) -> List[JournalEntry]:
+        """途中で止まったアイテム（再試行回数内のもの）"""
+        return self.journal._unfinished_entries(self.run_id, max_attempts)
+
+    def created_post_ids(self) -> List[int]:
+        return self.journal._created_post_ids(self.run_id)
+
+    def set_offset(self, offset: int):
+        self.offset = offset
+        self.journal._update_run(self.run_id, offset=offset)
+
+    def finish(self):
+        self.journal._update_run(self.run_id, status="completed", finished_at=datetime.now().isoformat())
+
+
+class RunJournal:
+    """run_onceの進行状況を記録し、異常終了後に途中から再開するためのジャーナル
+
+    各アイテムの状態遷移（取得→生成→投稿作成→カテゴリ・タグ→アイキャッチ→完了）をSQLiteに
+    記録する。完了していない実行が止まったまま残っていれば、同じ投稿設定の次回実行時に
+    その実行を引き継ぎ、途中のアイテムを完了させてから中断したオフセットの続きを処理する。
+    生成したアイキャッチはデータベースには入れず、ジャーナルの隣のディレクトリにファイルとして
+    保存してパスだけを記録し、アップロード後はメディアIDを記録してファイルを削除する。
+    """
+
+    # 完了した実行の記録を保持する日数
+    RETENTION_DAYS = 30
+    # この秒数ジャーナルへの書き込みがない実行は、止まったものとして引き継ぐ
+    HEARTBEAT_TIMEOUT = 900
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DEFAULT_JOURNAL_DB
+        # 実行の所有者（ホスト名:プロセスID）
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        if self.db_path == ":memory:":
+            self.media_dir = os.path.join(tempfile.gettempdir(), f"run_journal_media-{uuid.uuid4().hex[:8]}")
+        else:
+            self.media_dir = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), "run_journal_media")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """データベースを初期化"""
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    post_setting TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'running',
+                    offset INTEGER NOT NULL DEFAULT 1,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS items (
+                    run_id TEXT NOT NULL,
+                    content_id TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    post_id INTEGER,
+                    title TEXT,
+                    content TEXT,
+                    media_name TEXT,
+                    media_bytes BLOB,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (run_id, content_id)
+                )
+            ''')
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE runs ADD COLUMN owner TEXT")
+            if "heartbeat_at" not in columns:
+                self._conn.execute("ALTER TABLE runs ADD COLUMN heartbeat_at TEXT")
+            # media_bytesは以前の版が保存していた画像（読み込みのみ）
+            item_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(items)")}
+            if "media_path" not in item_columns:
+                self._conn.execute("ALTER TABLE items ADD COLUMN media_path TEXT")
+            if "media_id" not in item_columns:
+                self._conn.execute("ALTER TABLE items ADD COLUMN media_id INTEGER")
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(post_setting, status)')
+            self._conn.commit()
+
+    def start_run(self, post_setting: str) -> JournalRun:
+        """実行を開始する。同じ投稿設定の未完了の実行が止まっていれば引き継ぐ
+
+        実行中の書き込みごとにハートビートを更新する。他のスレッド・プロセスで動いている
+        実行（ハートビートが新しく、所有者のプロセスが動いているもの）は引き継がない。
+        """
+        self.prune()
+        with self._lock:
+            now = datetime.now()
+            # 書き込みロックを取り、同時に開始した実行が同じ実行を引き継がないようにする
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute('''
+                    SELECT run_id, offset, owner, heartbeat_at FROM runs WHERE post_setting = ? AND status = 'running'
+                    ORDER BY started_at DESC
+                ''', (str(post_setting),)).fetchall()
+                for run_id, offset, owner, heartbeat_at in rows:
+                    if self._is_stale(owner, heartbeat_at, now):
+                        self._conn.execute('''
+                            UPDATE runs SET owner = ?, heartbeat_at = ? WHERE run_id = ?
+                        ''', (self.owner, now.isoformat(), run_id))
+                        self._conn.commit()
+                        return JournalRun(self, run_id, str(post_setting), offset, resumed=True)
+
+                run_id = f"{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+                self._conn.execute('''
+                    INSERT INTO runs (run_id, post_setting, started_at, owner, heartbeat_at) VALUES (?, ?, ?, ?, ?)
+                ''', (run_id, str(post_setting), now.isoformat(), self.owner, now.isoformat()))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            return JournalRun(self, run_id, str(post_setting), 1, resumed=False)
+
+    def _is_stale(self, owner: Optional[str], heartbeat_at: Optional[str], now: datetime) -> bool:
+        """引き継いでよい（止まった）実行か"""
+        if not owner or not heartbeat_at:
+            # 所有者を記録する前の実行
+            return True
+        if now - datetime.fromisoformat(heartbeat_at) > timedelta(seconds=self.HEARTBEAT_TIMEOUT):
+            return True
+        host, _, pid = owner.rpartition(":")
+        if host == socket.gethostname() and pid.isdigit() and int(pid) != os.getpid():
+            # 同じホストで所有者のプロセスが終了していれば、ハートビートを待たずに引き継ぐ
+            return not _process_alive(int(pid))
+        return False
+
+    def _touch(self, run_id: str):
+        """実行のハートビートを更新（呼び出し側でロックを取り、コミットする）"""
+        self._conn.execute("UPDATE runs SET heartbeat_at = ? WHERE run_id = ?", (datetime.now().isoformat(), run_id))
+
+    def prune(self, retention_days: Optional[int] = None):
+        """保持期間を過ぎた完了済みの実行記録を削除"""
+        cutoff = (datetime.now() - timedelta(days=self.RETENTION_DAYS if retention_days is None else retention_days)).isoformat()
+        try:
+            with self._lock:
+                paths = self._conn.execute('''
+                    SELECT media_path FROM items WHERE media_path IS NOT NULL AND run_id IN
+                        (SELECT run_id FROM runs WHERE status = 'completed' AND finished_at < ?)
+                ''', (cutoff,)).fetchall()
+                self._conn.execute('''
+                    DELETE FROM items WHERE run_id IN
+                        (SELECT run_id FROM runs WHERE status = 'completed' AND finished_at < ?)
+                ''', (cutoff,))
+                self._conn.execute("DELETE FROM runs WHERE status = 'completed' AND finished_at < ?", (cutoff,))
+                self._conn.commit()
+            for (path,) in paths:
+                self._remove_media(path)
+        except Exception as e:
+            print(f"実行ジャーナル整理エラー: {e}")
+
+    def _update_run(self, run_id: str, **fields):
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE runs SET {columns} WHERE run_id = ?", (*fields.values(), run_id))
+            self._touch(run_id)
+            self._conn.commit()
+
+    def _entry_from_row(self, run_id: str, row) -> JournalEntry:
+        content_id, item_json, state, post_id, attempts, media_id = row
+        return JournalEntry(self, run_id, content_id, json.loads(item_json), ItemState(state), post_id, attempts,
+                            media_id)
+
+    def _get_or_create_entry(self, run_id: str, content_id: str, item: Dict[str, Any]) -> JournalEntry:
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT content_id, item, state, post_id, attempts, media_id FROM items WHERE run_id = ? AND content_id = ?
+            ''', (run_id, content_id)).fetchone()
+            if row:
+                return self._entry_from_row(run_id, row)
+            self._conn.execute('''
+                INSERT INTO items (run_id, content_id, item, state, updated_at) VALUES (?, ?, ?, ?, ?)
+            ''', (run_id, content_id, json.dumps(item, ensure_ascii=False), ItemState.FETCHED.value,
+                  datetime.now().isoformat()))
+            self._touch(run_id)
+            self._conn.commit()
+            return JournalEntry(self, run_id, content_id, item)
+
+    def _unfinished_entries(self, run_id: str, max_attempts: int) -> List[JournalEntry]:
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT content_id, item, state, post_id, attempts, media_id FROM items
+                WHERE run_id = ? AND state != ? AND attempts < ?
+                ORDER BY updated_at
+            ''', (run_id, ItemState.DONE.value, max_attempts)).fetchall()
+        return [self._entry_from_row(run_id, row) for row in rows]
+
+    def _created_post_ids(self, run_id: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT post_id FROM items WHERE run_id = ? AND state = ? AND post_id IS NOT NULL
+                ORDER BY updated_at
+            ''', (run_id, ItemState.DONE.value)).fetchall()
+        return [row[0] for row in rows]
+
+    def _update_entry(self, entry: JournalEntry, clear_payload: bool = False, clear_media: bool = False):
+        sets = ["state = ?", "post_id = ?", "updated_at = ?"]
+        if clear_payload:
+            sets += ["content = NULL", "media_bytes = NULL", "media_path = NULL"]
+        elif clear_media:
+            sets += ["media_bytes = NULL", "media_path = NULL"]
+        with self._lock:
+            path = self._media_path(entry) if clear_payload or clear_media else None
+            self._conn.execute(f'''
+                UPDATE items SET {", ".join(sets)} WHERE run_id = ? AND content_id = ?
+            ''', (entry.state.value, entry.post_id, datetime.now().isoformat(), entry.run_id, entry.content_id))
+            self._touch(entry.run_id)
+            self._conn.commit()
+        self._remove_media(path)
+
+    def _media_path(self, entry: JournalEntry) -> Optional[str]:
+        """保存している画像ファイルのパス（呼び出し側でロックを取る）"""
+        row = self._conn.execute('''
+            SELECT media_path FROM items WHERE run_id = ? AND content_id = ?
+        ''', (entry.run_id, entry.content_id)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _remove_media(path: Optional[str]):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"実行ジャーナル: 画像ファイルの削除エラー: {e}")
+
+    def _write_media(self, entry: JournalEntry, media, media_name: Optional[str]) -> Optional[str]:
+        """生成した画像をファイルに保存してパスを返す（MediaBufferは全体をbytesにせずに書き込む）"""
+        if not media:
+            return None
+        os.makedirs(self.media_dir, exist_ok=True)
+        suffix = os.path.splitext(media_name or "")[1]
+        name = re.sub(r'[^A-Za-z0-9_-]', '_', f"{entry.run_id}-{entry.content_id}")
+        path = os.path.join(self.media_dir, f"{name}{suffix}")
+        with open(path, "wb") as f:
+            if hasattr(media, "iter_chunks"):
+                for chunk in media.iter_chunks():
+                    f.write(chunk)
+            else:
+                f.write(media)
+        return path
+
+    def _save_rendered(self, entry: JournalEntry, title: str, content: str,
+                       media_bytes: Optional[bytes], media_name: Optional[str]):
+        media_path = self._write_media(entry, media_bytes, media_name)
+        with self._lock:
+            old_path = self._media_path(entry)
+            self._conn.execute('''
+                UPDATE items SET state = ?, title = ?, content = ?, media_bytes = NULL, media_path = ?, media_name = ?,
+                                 updated_at = ?
+                WHERE run_id = ? AND content_id = ?
+            ''', (entry.state.value, title, content, media_path, media_name, datetime.now().isoformat(),
+                  entry.run_id, entry.content_id))
+            self._touch(entry.run_id)
+            self._conn.commit()
+        if old_path != media_path:
+            self._remove_media(old_path)
+
+    def _load_rendered(self, entry: JournalEntry) -> Tuple[str, str, Optional[MediaBuffer], Optional[str]]:
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT title, content, media_path, media_bytes, media_name FROM items WHERE run_id = ? AND content_id = ?
+            ''', (entry.run_id, entry.content_id)).fetchone()
+        if not row:
+            return "", "", None, None
+        title, content, media_path, legacy_bytes, media_name = row
+        media = None
+        if media_path and os.path.exists(media_path):
+            media = MediaBuffer()
+            with open(media_path, "rb") as f:
+                shutil.copyfileobj(f, media)
+        elif legacy_bytes:
+            media = MediaBuffer()
+            media.write(legacy_bytes)
+        return title or "", content or "", media.rewind() if media else None, media_name
+
+    def _save_media_id(self, entry: JournalEntry, media_id: int):
+        with self._lock:
+            path = self._media_path(entry)
+            self._conn.execute('''
+                UPDATE items SET media_id = ?, media_bytes = NULL, media_path = NULL, updated_at = ?
+                WHERE run_id = ? AND content_id = ?
+            ''', (media_id, datetime.now().isoformat(), entry.run_id, entry.content_id))
+            self._touch(entry.run_id)
+            self._conn.commit()
+        self._remove_media(path)
+
+    def _record_error(self, entry: JournalEntry, error: str):
+        with self._lock:
+            self._conn.execute('''
+                UPDATE items SET attempts = ?, last_error = ?, updated_at = ? WHERE run_id = ? AND content_id = ?
+            ''', (entry.attempts, error[:2000], datetime.now().isoformat(), entry.run_id, entry.content_id))
+            self._touch(entry.run_id)
+            self._conn.commit()
@@ -0,0 +1,353 @@
+"""
+実行ごとの計測値の記録と集計
+1回の実行（run_once・ワーカー）ごとに件数のカウンタと段階ごとの所要時間の
+ヒストグラムを集計し、実行終了時に1回だけDBへ書き込む。日別の集計から
+処理速度（件/分）・重複率・段階ごとのp95をレポートとして表示する。
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+
+DEFAULT_METRICS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "run_metrics.db")
+
+# 所要時間のヒストグラムの区切り（ミリ秒、最後の区間は上限なし）
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+class StageHistogram:
+    """1段階分の所要時間のヒストグラム"""
+
+    def __init__(self, counts: Optional[List[int]] = None, total_ms: float = 0.0, max_ms: float = 0.0):
+        self.counts = list(counts) if counts else [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = total_ms
+        self.max_ms = max_ms
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, elapsed_ms: float):
+        index = len(BUCKETS_MS)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def merge(self, other: "StageHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, ratio: float) -> float:
+        """パーセンタイル（ミリ秒、区間内は線形に補間し、最大値を超えないようにする）"""
+        total = self.count
+        if total == 0:
+            return 0.0
+        target = ratio * total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = float(BUCKETS_MS[i - 1]) if i > 0 else 0.0
+                upper = float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+                value = lower + (upper - lower) * (target - seen) / count
+                return min(value, self.max_ms)
+            seen += count
+        return self.max_ms
+
+
+class RunMetrics:
+    """1回の実行の計測値（複数スレッドから更新できる）"""
+
+    def __init__(self, kind: str, post_setting: str = "", run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.post_setting = post_setting
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.counters: Dict[str, int] = {}
+        self.stages: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage: str, elapsed_ms: float):
+        with self._lock:
+            self.stages.setdefault(stage, StageHistogram()).observe(elapsed_ms)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with内の所要時間を段階nameとして記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    @property
+    def duration_sec(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class NullMetrics:
+    """計測中でないときに使う何もしない計測値"""
+
+    def count(self, name: str, amount: int = 1):
+        pass
+
+    def observe(self, stage: str, elapsed_ms: float):
+        pass
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsStore:
+    """実行ごとの計測値をSQLiteに保存する"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DEFAULT_METRICS_DB
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    post_setting TEXT,
+                    started_at INTEGER NOT NULL,
+                    duration_sec REAL NOT NULL,
+                    scanned INTEGER NOT NULL DEFAULT 0,
+                    duplicates INTEGER NOT NULL DEFAULT 0,
+                    created INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    counters TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS run_stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    total_ms REAL NOT NULL,
+                    max_ms REAL NOT NULL,
+                    buckets TEXT NOT NULL,
+                    PRIMARY KEY (run_id, stage)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS run_profiles (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    path TEXT,
+                    hotspots TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"計測DB初期化エラー: {e}")
+
+    def record(self, metrics: RunMetrics):
+        """実行の計測値を保存（実行終了時に1回だけ呼ぶ）"""
+        if metrics.finished_at is None:
+            metrics.finish()
+        try:
+            with metrics._lock:
+                counters = dict(metrics.counters)
+                stages = {name: StageHistogram(h.counts, h.total_ms, h.max_ms) for name, h in metrics.stages.items()}
+            conn = self._connect()
+            with conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO runs (run_id, kind, post_setting, started_at, duration_sec,
+                                                 scanned, duplicates, created, failed, counters)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    metrics.run_id,
+                    metrics.kind,
+                    metrics.post_setting,
+                    int(metrics.started_at),
+                    metrics.duration_sec,
+                    counters.get("scanned", 0),
+                    counters.get("duplicates", 0),
+                    counters.get("created", 0),
+                    counters.get("failed", 0),
+                    json.dumps(counters),
+                ))
+                conn.executemany('''
+                    INSERT OR REPLACE INTO run_stages (run_id, stage, count, total_ms, max_ms, buckets)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [
+                    (metrics.run_id, name, h.count, h.total_ms, h.max_ms, json.dumps(h.counts))
+                    for name, h in stages.items()
+                ])
+            conn.close()
+            print(f"実行計測を記録: {metrics.run_id} {metrics.duration_sec:.1f}秒 {counters}")
+        except Exception as e:
+            print(f"実行計測記録エラー: {e}")
+
+    def record_profile(self, run_id: str, kind: str, path: str, hotspots: List[Any]):
+        """プロファイルを取得した実行の累積時間の上位を保存"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO run_profiles (run_id, kind, created_at, path, hotspots)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (run_id, kind, int(time.time()), path, json.dumps(hotspots, ensure_ascii=False)))
+            conn.close()
+        except Exception as e:
+            print(f"プロファイル記録エラー: {e}")
+
+    def recent_profiles(self, days: int = 14, limit: int = 5) -> List[Dict[str, Any]]:
+        """直近のプロファイル（新しい順）"""
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT run_id, kind, created_at, path, hotspots FROM run_profiles
+                WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?
+            ''', (since, limit)).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"run_id": run_id, "kind": kind, "created_at": created_at, "path": path, "hotspots": json.loads(hotspots)}
+            for run_id, kind, created_at, path, hotspots in rows
+        ]
+
+    def daily_summary(self, days: int = 14) -> List[Dict[str, Any]]:
+        """日別の集計（古い順）
+
+        各日について実行数・件数・処理速度（件/分）・重複率・段階ごとのp95（ミリ秒）を返す。
+        """
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        conn = self._connect()
+        try:
+            runs = conn.execute('''
+                SELECT run_id, started_at, duration_sec, scanned, duplicates, created, failed
+                FROM runs WHERE started_at >= ? ORDER BY started_at
+            ''', (since,)).fetchall()
+            stage_rows = conn.execute('''
+                SELECT s.run_id, s.stage, s.total_ms, s.max_ms, s.buckets
+                FROM run_stages s JOIN runs r ON r.run_id = s.run_id
+                WHERE r.started_at >= ?
+            ''', (since,)).fetchall()
+        finally:
+            conn.close()
+
+        stages_by_run: Dict[str, Dict[str, StageHistogram]] = {}
+        for run_id, stage, total_ms, max_ms, buckets in stage_rows:
+            stages_by_run.setdefault(run_id, {})[stage] = StageHistogram(json.loads(buckets), total_ms, max_ms)
+
+        days_map: Dict[str, Dict[str, Any]] = {}
+        for run_id, started_at, duration_sec, scanned, duplicates, created, failed in runs:
+            day = datetime.fromtimestamp(started_at).strftime("%Y-%m-%d")
+            summary = days_map.setdefault(day, {
+                "day": day, "runs": 0, "duration_sec": 0.0,
+                "scanned": 0, "duplicates": 0, "created": 0, "failed": 0, "stages": {},
+            })
+            summary["runs"] += 1
+            summary["duration_sec"] += duration_sec
+            summary["scanned"] += scanned
+            summary["duplicates"] += duplicates
+            summary["created"] += created
+            summary["failed"] += failed
+            for stage, histogram in stages_by_run.get(run_id, {}).items():
+                if stage in summary["stages"]:
+                    summary["stages"][stage].merge(histogram)
+                else:
+                    summary["stages"][stage] = histogram
+
+        results = []
+        for summary in days_map.values():
+            minutes = summary["duration_sec"] / 60
+            summary["items_per_min"] = summary["scanned"] / minutes if minutes > 0 else 0.0
+            summary["duplicate_ratio"] = summary["duplicates"] / summary["scanned"] if summary["scanned"] else 0.0
+            summary["stage_p95_ms"] = {stage: h.percentile(0.95) for stage, h in summary.pop("stages").items()}
+            results.append(summary)
+        return results
+
+
+def _bar(value: float, max_value: float, width: int = 30) -> str:
+    if max_value <= 0:
+        return ""
+    return "#" * max(1 if value > 0 else 0, round(value / max_value * width))
+
+
+def _format_profiles(profiles: List[Dict[str, Any]], top: int) -> List[str]:
+    lines = []
+    for profile in profiles:
+        created = datetime.fromtimestamp(profile["created_at"]).strftime("%Y-%m-%d %H:%M")
+        lines.append("")
+        lines.append(f"■ プロファイル {profile['run_id']}（{profile['kind']} {created}）累積時間の上位（秒）")
+        for label, ncalls, tottime, cumtime in profile["hotspots"][:top]:
+            lines.append(f"{cumtime:9.3f} {ncalls:8d}  {label}")
+        if profile.get("path"):
+            lines.append(f"  {profile['path']}")
+    return lines
+
+
+def format_report(summaries: List[Dict[str, Any]], profiles: Optional[List[Dict[str, Any]]] = None,
+                  top: int = 5) -> str:
+    """日別の集計をテキストのグラフにする（profilesがあれば各実行の累積時間の上位も付ける）"""
+    if not summaries:
+        return "\n".join(["計測された実行がありません"] + _format_profiles(profiles or [], top))
+    lines = []
+
+    lines.append("■ 処理速度（件/分）")
+    max_rate = max(s["items_per_min"] for s in summaries)
+    for s in summaries:
+        lines.append(f"{s['day']} {s['items_per_min']:8.1f} {_bar(s['items_per_min'], max_rate)}")
+
+    lines.append("")
+    lines.append("■ 重複率")
+    for s in summaries:
+        lines.append(f"{s['day']} {s['duplicate_ratio'] * 100:7.1f}% {_bar(s['duplicate_ratio'], 1.0)}")
+
+    lines.append("")
+    lines.append("■ 件数（実行 / 取得 / 重複 / 作成 / 失敗）")
+    for s in summaries:
+        lines.append(f"{s['day']} {s['runs']:4d} / {s['scanned']:6d} / {s['duplicates']:6d} / "
+                     f"{s['created']:6d} / {s['failed']:6d}")
+
+    stages = sorted({stage for s in summaries for stage in s["stage_p95_ms"]})
+    for stage in stages:
+        lines.append("")
+        lines.append(f"■ {stage} p95（ミリ秒）")
+        max_p95 = max(s["stage_p95_ms"].get(stage, 0.0) for s in summaries)
+        for s in summaries:
+            p95 = s["stage_p95_ms"].get(stage)
+            if p95 is None:
+                lines.append(f"{s['day']} {'-':>8}")
+            else:
+                lines.append(f"{s['day']} {p95:8.0f} {_bar(p95, max_p95)}")
+
+    lines.extend(_format_profiles(profiles or [], top))
+    return "\n".join(lines)
@@ -3,12 +3,15 @@ import schedule
 import time
 import threading
 from datetime import datetime, timedelta
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple
 import logging
 import os
 from dataclasses import dataclass
 from enum import Enum
+import heapq
 import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrency import budget
 
 # ログ設定
 logging.basicConfig(
@@ -43,16 +46,29 @@ class ScheduleConfig:
     target_posts: int = 10
 
 
+# 時間別スケジュール設定ファイル（GUIの保存先と同じ場所）
+DEFAULT_SCHEDULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "schedule_settings.json")
+# 最後に実行したスロットを記録するファイル
+DEFAULT_SCHEDULE_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "schedule_state.json")
+
+
+class CatchupPolicy(Enum):
+    """実行できなかったスロットの扱い"""
+    LATEST = "latest"  # 猶予時間内の最新スロットのみ実行
+    ALL = "all"        # 猶予時間内のスロットをすべて実行
+    NONE = "none"      # 遅延したスロットは実行しない
+
+
 class HourlyScheduleConfig:
     """時間別スケジュール設定"""
-    def __init__(self, config_file: str = "config/schedule_settings.json"):
-        self.config_file = config_file
+    def __init__(self, config_file: Optional[str] = None):
+        self.config_file = config_file or DEFAULT_SCHEDULE_FILE
         self.config = {}
         self.last_modified = 0
         self._load_config()
     
     def _load_config(self) -> Dict[str, Any]:
-        """設定ファイルを読み込み"""
+        """設定ファイルを読み込み（更新されている場合のみ）"""
         try:
             if os.path.exists(self.config_file):
                 # ファイルの更新時刻をチェック
@@ -66,10 +82,14 @@ class HourlyScheduleConfig:
             logger.error(f"時間別スケジュール設定読み込みエラー: {e}")
         return self.config
     
+    def reload_if_changed(self) -> bool:
+        """設定ファイルが更新されていれば再読み込みし、更新の有無を返す"""
+        previous = self.last_modified
+        self._load_config()
+        return self.last_modified != previous
+    
     def is_enabled(self) -> bool:
         """自動実行が有効かチェック"""
-        # 設定ファイルを再読み込み
-        self._load_config()
         return self.config.get('AUTO_ON', 'off') == 'on'
     
     def get_execution_minute(self) -> int:
@@ -79,6 +99,20 @@ class HourlyScheduleConfig:
         except ValueError:
             return 0
     
+    def get_catchup_policy(self) -> CatchupPolicy:
+        """取りこぼしたスロットの実行ポリシーを取得"""
+        try:
+            return CatchupPolicy(self.config.get('CATCHUP_POLICY', CatchupPolicy.LATEST.value))
+        except ValueError:
+            return CatchupPolicy.LATEST
+    
+    def get_catchup_grace(self) -> timedelta:
+        """取りこぼしたスロットを実行する猶予時間を取得"""
+        try:
+            return timedelta(minutes=int(self.config.get('CATCHUP_GRACE_MIN', '60')))
+        except ValueError:
+            return timedelta(minutes=60)
+    
     def get_active_hours(self) -> Dict[str, str]:
         """有効な時間と投稿設定番号を取得"""
         active_hours = {}
@@ -90,21 +124,42 @@ class HourlyScheduleConfig:
                 active_hours[hour_key] = post_setting
         return active_hours
     
-    def should_run_now(self) -> Optional[str]:
-        """現在時刻で実行すべきかチェック"""
-        # 設定ファイルを再読み込み
-        self._load_config()
+    def slots_between(self, start: datetime, end: datetime) -> List[Tuple[datetime, str]]:
+        """start < 実行時刻 <= end となるスロット（実行時刻, 投稿設定番号）を古い順に取得"""
+        active_hours = self.get_active_hours()
+        if not active_hours or end <= start:
+            return []
         
+        # 長期停止後でも走査量を抑えるため、遡るのは最大7日分
+        start = max(start, end - timedelta(days=7))
+        minute = self.get_execution_minute()
+        slots = []
+        cursor = start.replace(minute=minute, second=0, microsecond=0)
+        if cursor > start:
+            cursor -= timedelta(hours=1)
+        while cursor <= end:
+            if start < cursor:
+                hour_key = f"h{cursor.hour:02d}"
+                if hour_key in active_hours:
+                    slots.append((cursor, active_hours[hour_key]))
+            cursor += timedelta(hours=1)
+        return slots
+    
+    def next_slot(self, after: datetime) -> Optional[Tuple[datetime, str]]:
+        """after より後の最初のスロットを取得"""
+        slots = self.slots_between(after, after + timedelta(hours=25))
+        return slots[0] if slots else None
+    
+    def should_run_now(self) -> Optional[str]:
+        """現在時刻で実行すべきかチェック（後方互換用。スケジューラーはnext_slotを使用）"""
         now = datetime.now()
-        current_minute = now.minute
-        current_hour = now.hour
         
         # 実行分と一致するかチェック
-        if current_minute != self.get_execution_minute():
+        if now.minute != self.get_execution_minute():
             return None
         
         # 現在の時間が有効かチェック
-        hour_key = f"h{current_hour:02d}"
+        hour_key = f"h{now.hour:02d}"
         if self.config.get(hour_key, False):
             number_key = f"{hour_key}_number"
             return self.config.get(number_key, '1')
@@ -112,15 +167,131 @@ class HourlyScheduleConfig:
         return None
 
 
+class ScheduleState:
+    """実行済みスロットの永続化（再起動後の取りこぼし検出用）
+
+    last_firedまでのスロットはすべて終了済みで、それより後に終了したスロットはfinishedに記録する。
+    スロットは並列に実行されて終わる順番が前後するため、実行中のスロットより後のスロットが
+    先に終わってもlast_firedは実行中のスロットを越えない（再起動後に実行中だったスロットを再実行する）。
+    """
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file or DEFAULT_SCHEDULE_STATE_FILE
+        self.last_fired: Optional[datetime] = None
+        self.finished: set = set()
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('last_fired'):
+                    self.last_fired = datetime.fromisoformat(data['last_fired'])
+                self.finished = {datetime.fromisoformat(value) for value in data.get('finished', [])}
+        except Exception as e:
+            logger.error(f"スケジュール状態読み込みエラー: {e}")
+    
+    def is_finished(self, fire_time: datetime) -> bool:
+        """スロットが終了済みか"""
+        with self._lock:
+            return bool(self.last_fired and fire_time <= self.last_fired) or fire_time in self.finished
+    
+    def mark_fired(self, fire_time: datetime, pending_from: Optional[datetime] = None):
+        """スロットの実行完了を記録（並列実行のワーカースレッドからも呼ばれる）
+        
+        pending_fromには実行中（または取り消された）スロットのうち最も古い実行時刻を渡す。
+        last_firedはそれより前に終わったスロットまでしか進めない。
+        """
+        with self._lock:
+            if self.last_fired and fire_time <= self.last_fired:
+                return
+            self.finished.add(fire_time)
+            done = [value for value in self.finished if pending_from is None or value < pending_from]
+            if done:
+                self.last_fired = max(done)
+                self.finished = {value for value in self.finished if value > self.last_fired}
+            try:
+                os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+                temp_file = self.state_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump({'last_fired': self.last_fired.isoformat() if self.last_fired else None,
+                               'finished': sorted(value.isoformat() for value in self.finished)}, f)
+                os.replace(temp_file, self.state_file)
+            except Exception as e:
+                logger.error(f"スケジュール状態保存エラー: {e}")
+
+
+class TimerHeap:
+    """実行時刻順に並んだタイマー（最も早いものから取り出す）"""
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, str, Callable[[], None]]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+    
+    def push(self, when: datetime, key: str, callback: Callable[[], None]):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (when, self._seq, key, callback))
+    
+    def pop_due(self, now: datetime) -> List[Tuple[datetime, str, Callable[[], None]]]:
+        """実行時刻を過ぎたタイマーを取り出す"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, key, callback = heapq.heappop(self._heap)
+                due.append((when, key, callback))
+        return due
+    
+    def next_time(self) -> Optional[datetime]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+    
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+
 class Scheduler:
-    """投稿スケジュール管理クラス"""
+    """投稿スケジュール管理クラス
+    
+    次の実行時刻をTimerHeapで管理し、その時刻まで待機する。
+    設定ファイルはnotify_config_changed()による通知時と、最大CONFIG_CHECK_INTERVAL秒ごとの
+    更新時刻チェックで変更があった場合のみ再読み込みする。
+    """
+    
+    # 外部エディタでの設定変更を検出するための最大待機時間（秒）
+    CONFIG_CHECK_INTERVAL = 300
+    # 遅延とみなさない許容時間
+    ON_TIME_TOLERANCE = timedelta(minutes=2)
+    # スキップしたスロットを保持する件数
+    SKIP_HISTORY = 100
     
     def __init__(self, config: ScheduleConfig = None, engine=None):
         self.engine = engine
         self.config = config
         self.hourly_config = HourlyScheduleConfig()
+        self.state = ScheduleState()
+        self.timers = TimerHeap()
         self.running = False
         self.thread = None
+        self._wakeup = threading.Event()
+        # 投稿設定の並列実行用
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight_lock = threading.Lock()
+        self._in_flight: Dict[str, datetime] = {}
+        self._pending_slots: Dict[datetime, int] = {}
+        # 停止時に取り消したスロット（実行中の他のスロットが終わっても記録を越えさせない）
+        self._cancelled_slots: set = set()
+        # スキップしたスロット {実行時刻: {投稿設定番号: 理由}}
+        self.skipped_slots: Dict[datetime, Dict[str, str]] = {}
+        # 自動監視の停止中は時間別スケジュールだけを止める（従来のスケジュールは継続）
+        self._hourly_paused = False
+        self._dispatched_until: Optional[datetime] = None
         self._setup_schedule()
     
     def _setup_schedule(self):
@@ -136,26 +307,179 @@ class Scheduler:
     def _setup_hourly_schedule(self):
         """時間別スケジュールを設定"""
         try:
-            # 毎分チェックするスケジュールを設定（scheduleライブラリではなく、独自のチェック）
-            logger.info("時間別スケジュールを設定しました")
+            logger.info(f"時間別スケジュールを設定しました: 有効時間 {self.hourly_config.get_active_hours()}, 実行分 {self.hourly_config.get_execution_minute()}")
         except Exception as e:
             logger.error(f"時間別スケジュール設定エラー: {e}")
     
-    def _check_hourly_schedule(self):
-        """時間別スケジュールをチェック"""
-        try:
-            # デバッグログを追加
-            now = datetime.now()
-            logger.debug(f"時間別スケジュールチェック: {now.strftime('%H:%M:%S')}")
-            
-            post_setting = self.hourly_config.should_run_now()
-            if post_setting:
-                logger.info(f"時間別スケジュール実行: 投稿設定{post_setting}")
-                self._run_hourly_task(post_setting)
+    def _rebuild_timers(self):
+        """現在の設定からタイマーを組み直す"""
+        self.timers.clear()
+        now = datetime.now()
+        
+        if self._hourly_active():
+            if self.state.last_fired is None:
+                # 初回起動時は過去分を遡らない
+                self.state.mark_fired(now)
+            with self._in_flight_lock:
+                self._cancelled_slots.clear()
+            missed = self._unfinished_slots(self.state.last_fired, now)
+            if missed:
+                # 取りこぼしたスロットがあれば即時にキャッチアップ
+                self.timers.push(now, "hourly", self._fire_hourly)
             else:
-                logger.debug(f"時間別スケジュール: 実行条件を満たしていません (現在: {now.strftime('%H:%M')}, 実行分: {self.hourly_config.get_execution_minute()}, 有効時間: {self.hourly_config.get_active_hours()})")
-        except Exception as e:
-            logger.error(f"時間別スケジュールチェックエラー: {e}")
+                self._schedule_next_hourly(now)
+        
+        idle = schedule.idle_seconds() if schedule.get_jobs() else None
+        if idle is not None:
+            self.timers.push(now + timedelta(seconds=max(0, idle)), "legacy", self._fire_legacy)
+        
+        next_run = self.timers.next_time()
+        logger.info(f"次回実行予定: {next_run.strftime('%Y-%m-%d %H:%M') if next_run else 'なし'}")
+    
+    def _hourly_active(self) -> bool:
+        """時間別スケジュールが有効で、一時停止されていないか"""
+        return self.hourly_config.is_enabled() and not self._hourly_paused
+    
+    def _unfinished_slots(self, start: datetime, end: datetime) -> List[Tuple[datetime, str]]:
+        """start < 実行時刻 <= end のスロットのうち、終了を記録していないもの"""
+        return [slot for slot in self.hourly_config.slots_between(start, end) if not self.state.is_finished(slot[0])]
+    
+    def _earliest_pending(self) -> Optional[datetime]:
+        """実行中・取り消されたスロットのうち最も古い実行時刻（_in_flight_lockを取って呼ぶ）"""
+        return min([*self._pending_slots, *self._cancelled_slots], default=None)
+    
+    def _schedule_next_hourly(self, after: datetime):
+        """次の時間別スロットをタイマーに登録"""
+        next_slot = self.hourly_config.next_slot(after)
+        if next_slot:
+            self.timers.push(next_slot[0], "hourly", self._fire_hourly)
+    
+    def _apply_catchup_policy(self, slots: List[Tuple[datetime, str]], now: datetime) -> List[Tuple[datetime, str]]:
+        """取りこぼしたスロットから実行対象を選ぶ"""
+        on_time = [slot for slot in slots if now - slot[0] <= self.ON_TIME_TOLERANCE]
+        late = [slot for slot in slots if now - slot[0] > self.ON_TIME_TOLERANCE]
+        if not late:
+            return on_time
+        
+        policy = self.hourly_config.get_catchup_policy()
+        grace = self.hourly_config.get_catchup_grace()
+        within_grace = [slot for slot in late if now - slot[0] <= grace]
+        skipped = len(late) - len(within_grace)
+        
+        if policy == CatchupPolicy.ALL:
+            selected = within_grace
+        elif policy == CatchupPolicy.LATEST:
+            selected = within_grace[-1:] if not on_time else []
+            skipped += len(within_grace) - len(selected)
+        else:
+            selected = []
+            skipped += len(within_grace)
+        
+        if skipped:
+            logger.warning(f"時間別スケジュール: 取りこぼした{skipped}件のスロットをスキップします (ポリシー: {policy.value})")
+        if selected:
+            logger.info(f"時間別スケジュール: 取りこぼした{len(selected)}件のスロットを実行します (ポリシー: {policy.value})")
+        return selected + on_time
+    
+    @staticmethod
+    def _parse_post_settings(value: str) -> List[str]:
+        """スロットの投稿設定番号（"1" や "1,3"）をリストに変換"""
+        settings = []
+        for part in str(value).split(','):
+            part = part.strip()
+            if part and part not in settings:
+                settings.append(part)
+        return settings
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """投稿設定を並列実行するスレッドプールを取得"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=budget.max_parallel_posts,
+                                                thread_name_prefix="hourly-post")
+        return self._executor
+    
+    def _fire_hourly(self):
+        """期限を迎えた時間別スロットを実行
+        
+        スロット内の各投稿設定はスレッドプールで並列に実行する。前回の実行が終わっていない
+        投稿設定は重複して起動しない。
+        """
+        if self._hourly_paused:
+            return
+        now = datetime.now()
+        start = self.state.last_fired or now
+        if self._dispatched_until and self._dispatched_until > start:
+            # 実行中のスロットを再度投入しない
+            start = self._dispatched_until
+        slots = self._unfinished_slots(start, now)
+        
+        selected = self._apply_catchup_policy(slots, now)
+        for fire_time, post_setting in selected:
+            overlapped = []
+            for setting_num in self._parse_post_settings(post_setting):
+                with self._in_flight_lock:
+                    if setting_num in self._in_flight:
+                        started = self._in_flight[setting_num]
+                        logger.warning(f"時間別スケジュール: 投稿設定{setting_num}は {started.strftime('%H:%M')} の実行が継続中のためスキップします")
+                        overlapped.append(setting_num)
+                        continue
+                    self._in_flight[setting_num] = fire_time
+                    self._pending_slots[fire_time] = self._pending_slots.get(fire_time, 0) + 1
+                logger.info(f"時間別スケジュール実行: {fire_time.strftime('%H:%M')} 投稿設定{setting_num}")
+                future = self._get_executor().submit(self._run_hourly_task, setting_num)
+                future.add_done_callback(
+                    lambda f, t=fire_time, n=setting_num: self._on_slot_task_done(t, n, f.cancelled()))
+            if overlapped:
+                self._record_skip(fire_time, overlapped, "前回の実行が継続中")
+        
+        # キャッチアップのポリシーで実行しないスロットもスキップとして記録する
+        for fire_time, post_setting in slots:
+            if (fire_time, post_setting) not in selected:
+                self._record_skip(fire_time, self._parse_post_settings(post_setting), "取りこぼし")
+        
+        if slots:
+            self._dispatched_until = slots[-1][0]
+        self._schedule_next_hourly(datetime.now())
+    
+    def _record_skip(self, fire_time: datetime, settings: List[str], reason: str):
+        """スロットでスキップした投稿設定を記録する
+        
+        スロットの投稿設定がすべてスキップされた場合は、実行を待たずにスロットを終了済みにする
+        （実行中の前のスロットがあれば、ScheduleStateはそのスロットを越えて記録しない）。
+        """
+        with self._in_flight_lock:
+            self.skipped_slots[fire_time] = {setting: reason for setting in settings}
+            while len(self.skipped_slots) > self.SKIP_HISTORY:
+                self.skipped_slots.pop(min(self.skipped_slots))
+            dispatched = fire_time in self._pending_slots
+            pending_from = self._earliest_pending()
+        logger.info(f"時間別スケジュール: {fire_time.strftime('%H:%M')} の投稿設定{','.join(settings)}をスキップしました（{reason}）")
+        if not dispatched:
+            self.state.mark_fired(fire_time, pending_from)
+    
+    def _on_slot_task_done(self, fire_time: datetime, setting_num: str, cancelled: bool):
+        """投稿設定の実行終了時に呼ばれ、スロットの全設定が終わったら記録"""
+        with self._in_flight_lock:
+            self._in_flight.pop(setting_num, None)
+            remaining = self._pending_slots.get(fire_time, 1) - 1
+            if remaining > 0:
+                self._pending_slots[fire_time] = remaining
+            else:
+                self._pending_slots.pop(fire_time, None)
+            if cancelled:
+                self._cancelled_slots.add(fire_time)
+            finished = remaining <= 0 and fire_time not in self._cancelled_slots
+            pending_from = self._earliest_pending()
+        if finished:
+            # 実行後に記録するため、途中で停止した場合は再起動後に再実行される
+            self.state.mark_fired(fire_time, pending_from)
+    
+    def _fire_legacy(self):
+        """従来のスケジュール（scheduleライブラリ）のジョブを実行"""
+        schedule.run_pending()
+        idle = schedule.idle_seconds() if schedule.get_jobs() else None
+        if idle is not None:
+            self.timers.push(datetime.now() + timedelta(seconds=max(0, idle)), "legacy", self._fire_legacy)
     
     def _run_hourly_task(self, post_setting: str):
         """時間別スケジュールタスクを実行"""
@@ -163,16 +487,13 @@ class Scheduler:
             logger.info(f"時間別スケジュールタスク開始: 設定{post_setting}")
             
             if self.engine:
-                # エンジンの設定を一時的に更新
-                original_target = getattr(self.engine.settings, 'target_new_posts', 10)
-                setattr(self.engine.settings, 'target_new_posts', 10)
+                # 設定ファイルが変更されていれば最新の設定に差し替える
+                if hasattr(self.engine, 'refresh_settings'):
+                    self.engine.refresh_settings()
                 
-                # 投稿実行
+                # 投稿実行（並列実行されるため共有設定は書き換えない）
                 created_posts = self.engine.run_once(post_setting)
                 
-                # 設定を元に戻す
-                setattr(self.engine.settings, 'target_new_posts', original_target)
-                
                 logger.info(f"時間別スケジュールタスク完了: {len(created_posts)}件の投稿を作成")
             else:
                 logger.warning("エンジンが設定されていないため、時間別スケジュールを実行できません")
@@ -262,15 +583,8 @@ class Scheduler:
         try:
             logger.info(f"スケジュールタスク開始: 設定{post_setting_num}, 目標{target_posts}件")
             
-            # エンジンの設定を一時的に更新
-            original_target = self.engine.settings.target_new_posts
-            self.engine.settings.target_new_posts = target_posts
-            
-            # 投稿実行
-            created_posts = self.engine.run_once(post_setting_num)
-            
-            # 設定を元に戻す
-            self.engine.settings.target_new_posts = original_target
+            # 目標投稿数は引数で渡す（共有の設定は書き換えない）
+            created_posts = self.engine.run_once(post_setting_num, target_count=target_posts or None)
             
             logger.info(f"スケジュールタスク完了: {len(created_posts)}件の投稿を作成")
             
@@ -284,11 +598,12 @@ class Scheduler:
             return
         
         # 時間別スケジュールまたは従来のスケジュールが有効かチェック
-        if not self.hourly_config.is_enabled() and (not self.config or not self.config.enabled):
+        if not self._hourly_active() and (not self.config or not self.config.enabled):
             logger.info("スケジュールが無効のため、スケジューラーを開始しません")
             return
         
         self.running = True
+        self._wakeup.clear()
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         logger.info("スケジューラーを開始しました")
@@ -299,32 +614,88 @@ class Scheduler:
             return
         
         self.running = False
+        self._wakeup.set()
         if self.thread:
             self.thread.join(timeout=5)
+        if self._executor:
+            # 実行中の投稿は完了まで継続させ、待機中のものは取り消す
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._dispatched_until = None
         logger.info("スケジューラーを停止しました")
     
+    def pause_hourly(self):
+        """時間別スケジュールのタイマーだけを止める（従来のスケジュールと実行中の投稿は継続）"""
+        self._hourly_paused = True
+        if self.running:
+            self._wakeup.set()
+        logger.info("時間別スケジュールを一時停止しました")
+    
+    def resume_hourly(self):
+        """pause_hourlyで止めた時間別スケジュールを再開する"""
+        self._hourly_paused = False
+        self.notify_config_changed()
+    
+    def notify_config_changed(self):
+        """スケジュール設定ファイルの変更を通知"""
+        if self.running:
+            self._wakeup.set()
+            return
+        # 停止中に有効化された場合はここで開始する
+        if self.hourly_config.reload_if_changed():
+            self._setup_schedule()
+        self.start()
+    
+    def _reload_config(self):
+        """設定を再読み込みしてタイマーを組み直す"""
+        if self.hourly_config.reload_if_changed():
+            self._setup_schedule()
+        if not self._hourly_active() and (not self.config or not self.config.enabled):
+            logger.info("スケジュールが無効になったため、スケジューラーを停止します")
+            self.running = False
+            return
+        self._rebuild_timers()
+    
     def _run_scheduler(self):
         """スケジューラーのメインループ"""
+        self._rebuild_timers()
         while self.running:
             try:
-                # 従来のスケジュールをチェック
-                schedule.run_pending()
+                next_time = self.timers.next_time()
+                timeout = self.CONFIG_CHECK_INTERVAL
+                if next_time:
+                    timeout = min(timeout, max(0.0, (next_time - datetime.now()).total_seconds()))
                 
-                # 時間別スケジュールを毎分チェック
-                if self.hourly_config.is_enabled():
-                    self._check_hourly_schedule()
+                notified = self._wakeup.wait(timeout)
+                if not self.running:
+                    break
+                if notified:
+                    self._wakeup.clear()
+                    self._reload_config()
+                    continue
+                if self.hourly_config.reload_if_changed():
+                    self._setup_schedule()
+                    self._rebuild_timers()
+                    continue
                 
-                time.sleep(60)  # 1分ごとにチェック
+                for fire_time, key, callback in self.timers.pop_due(datetime.now()):
+                    logger.debug(f"タイマー発火: {key} (予定 {fire_time.strftime('%H:%M:%S')})")
+                    callback()
             except Exception as e:
                 logger.error(f"スケジューラーエラー: {e}")
-                time.sleep(60)
+                self._wakeup.wait(60)
     
     def get_next_run(self) -> Optional[datetime]:
         """次の実行時刻を取得"""
         try:
-            next_run = schedule.next_run()
+            next_run = self.timers.next_time()
             if next_run:
                 return next_run
+            if self._hourly_active():
+                next_slot = self.hourly_config.next_slot(datetime.now())
+                if next_slot:
+                    return next_slot[0]
+            return schedule.next_run()
         except Exception as e:
             logger.error(f"次回実行時刻取得エラー: {e}")
         return None
@@ -2,9 +2,13 @@ from __future__ import annotations
 from typing import List, Tuple, Optional, Dict, Any
 import requests
 import re
-from bs4 import BeautifulSoup
-from browser import BrowserFetcher
+from lxml import html as lxml_html
 from config import Settings
+from concurrency import budget
+from extract_profile import (
+    get_profile, find_description_in_scripts, find_longest_text, parse_streaming, open_elements,
+    element_text, CompiledSelector, StreamResolver, MIN_DESCRIPTION_LENGTH,
+)
 
 
 HEADERS = {"Referer": "https://www.dmm.co.jp", "Cookie": "age_check_done=1"}
@@ -13,60 +17,120 @@ HEADERS = {"Referer": "https://www.dmm.co.jp", "Cookie": "age_check_done=1"}
 def fetch_html(url: str, timeout: int = 30, settings: Optional[Settings] = None) -> str:
     if settings and getattr(settings, "use_browser", False):
         print(f"DEBUG: Chrome設定詳細 - use_browser={settings.use_browser}, headless={settings.headless}, page_wait_sec={settings.page_wait_sec}, click_xpath={settings.click_xpath}")
+        # selenium の読み込みは重いので、Chromeで取得するときだけ読み込む
+        from browser import BrowserFetcher
         bf = BrowserFetcher(headless=settings.headless, page_wait_sec=settings.page_wait_sec)
-        return bf.fetch_after_click(url, settings.click_xpath)
+        # 並列実行時もChromeの同時起動数を制限
+        with budget.chrome_slot():
+            return bf.fetch_after_click(url, settings.click_xpath)
     res = requests.get(url, headers=HEADERS, timeout=timeout)
     res.raise_for_status()
     return res.text
 
 
-def extract_description_and_images(html: str) -> Tuple[str, List[str], List[str]]:
-    soup = BeautifulSoup(html, "lxml")
+def fetch_html_conditional(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                           timeout: int = 30) -> Tuple[int, str, Optional[str], Optional[str]]:
+    """条件付きGETでHTMLを取得し、(ステータス, HTML, ETag, Last-Modified) を返す
+
+    保存済みの版から変わっていなければステータス304で、HTMLは空文字を返す。
+    """
+    headers = dict(HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    res = requests.get(url, headers=headers, timeout=timeout)
+    if res.status_code == 304:
+        return 304, "", etag, last_modified
+    res.raise_for_status()
+    return res.status_code, res.text, res.headers.get("ETag"), res.headers.get("Last-Modified")
+
+
+# 説明文の候補（上から順に試す）
+DESCRIPTION_CANDIDATES = [
+    ("p.mg-b20", "mono"),
+    ("p.text-overflow", "pcgame"),
+    ("meta[name=description]", "desc_meta"),
+    ("p.tx-productComment", "monthly"),
+    ("p.summary__txt", "doujin"),
+]
+_description_candidates = [(CompiledSelector(sel), kind) for sel, kind in DESCRIPTION_CANDIDATES]
+
+
+def _candidate_text(compiled: CompiledSelector, element, kind: str) -> str:
+    if kind == "desc_meta":
+        return element.get("content") or ""
+    return element_text(element, strip=False).strip()
+
+
+def _jpg_images(root, limit: Optional[int] = None) -> List[str]:
+    images = []
+    for img in root.iter("img"):
+        src = img.get("src") or ""
+        if src.endswith(".jpg") or src.endswith(".jpeg"):
+            images.append(src)
+            if limit is not None and len(images) >= limit:
+                break
+    return images
+
+
+def extract_description_and_images(html: str, max_images: Optional[int] = None) -> Tuple[str, List[str], List[str]]:
+    """説明文と画像URLを抽出
+
+    max_imagesを指定した場合は、説明文が確定してmax_images件の画像が集まった時点で
+    HTMLの解析を打ち切る（Noneの場合は全画像を集めるため最後まで解析する）。
+    """
+    def resolved(root) -> bool:
+        if len(_jpg_images(root, max_images)) < max_images:
+            return False
+        opened = open_elements(root)
+        for compiled, kind in _description_candidates:
+            element = compiled.first(root)
+            if element is None or element in opened:
+                return False
+            if _candidate_text(compiled, element, kind):
+                return True
+        return False
+
     text = ""
+    large: List[str] = []
+    small: List[str] = []
+    try:
+        root, _ = parse_streaming(html, resolved if max_images is not None else None)
+    except Exception as e:
+        print(f"extract_description_and_images: HTML解析エラー: {e}")
+        return text, large, small
+
     # try multiple selectors
-    candidates = [
-        ("p.mg-b20", "mono"),
-        ("p.text-overflow", "pcgame"),
-        ("meta[name=description]", "desc_meta"),
-        ("p.tx-productComment", "monthly"),
-        ("p.summary__txt", "doujin"),
-    ]
-    for sel, kind in candidates:
-        if kind == "desc_meta":
-            tag = soup.select_one(sel)
-            if tag and tag.get("content"):
-                text = tag.get("content")
-                break
-        else:
-            tag = soup.select_one(sel)
-            if tag and tag.text.strip():
-                text = tag.text.strip()
+    for compiled, kind in _description_candidates:
+        element = compiled.first(root)
+        if element is not None:
+            text = _candidate_text(compiled, element, kind)
+            if text:
                 break
 
     # try images generously
-    large: List[str] = []
-    small: List[str] = []
-    for img in soup.select("img"):
-        src = img.get("src") or ""
-        if not src:
-            continue
-        if src.endswith(".jpg") or src.endswith(".jpeg"):
-            small.append(src)
-            # try to convert js- to jp- when applicable
-            lsrc = src.replace("js-", "jp-")
-            lsrc = lsrc.replace("jm.jpg", "jp.jpg").replace("js.jpg", "jp.jpg")
-            large.append(lsrc)
+    for src in _jpg_images(root, max_images):
+        small.append(src)
+        # try to convert js- to jp- when applicable
+        lsrc = src.replace("js-", "jp-")
+        lsrc = lsrc.replace("jm.jpg", "jp.jpg").replace("js.jpg", "jp.jpg")
+        large.append(lsrc)
     return text, large, small
 
 
-def extract_specific_elements(html: str, settings: Optional[Settings] = None) -> Tuple[str, str]:
+def extract_specific_elements(html: str, settings: Optional[Settings] = None, profile: Optional[str] = None,
+                              streaming: bool = True) -> Tuple[str, str]:
     """
     特定の要素のテキストを抽出し、取得場所を表示
     1. 説明文の取得
     2. レビューの取得
-    """
-    soup = BeautifulSoup(html, "lxml")
     
+    profileにはフロア・サイト名を指定する。同じプロファイルではコンパイル済みのセレクタを
+    再利用し、ヒット率の高いセレクタから試行する。
+    streaming=Trueの場合はHTMLを少しずつ解析し、説明文とレビューの結果が確定した時点で
+    残りの解析を打ち切る（最長テキストの検索が必要な場合などは最後まで解析する）。
+    """
     # デフォルトのセレクタ
     default_description_selectors = [
         "meta[name=description]",
@@ -90,142 +154,55 @@ def extract_specific_elements(html: str, settings: Optional[Settings] = None) ->
     # 設定からセレクタを取得
     description_selectors = getattr(settings, 'description_selectors', default_description_selectors) if settings else default_description_selectors
     review_selectors = getattr(settings, 'review_selectors', default_review_selectors) if settings else default_review_selectors
+    extraction = get_profile(profile, description_selectors, review_selectors)
+    resolver = StreamResolver(extraction)
+    
+    try:
+        if not html or not html.strip():
+            root = None
+        elif streaming:
+            root, stopped = parse_streaming(html, resolver.resolved)
+            if stopped:
+                print(f"extract_specific_elements: 説明文・レビューが確定したため解析を打ち切りました")
+        else:
+            root = lxml_html.document_fromstring(html)
+    except Exception as e:
+        print(f"extract_specific_elements: HTML解析エラー: {e}")
+        root = None
     
     # 1つ目の要素（説明文）の取得
     element1_text = ""
     element1_source = ""
     
     try:
-        # まず、指定されたXPathパスのJSONから説明文を取得を試行
-        print(f"extract_specific_elements: XPathパス /html/body/div[2]/main/div[3]/div[2]/div/script[1] からJSON取得を試行")
-        
-        # XPathパスに対応する要素を探す
-        script_elements = soup.find_all("script")
-        target_script = None
-        
-        # 指定されたパスに近い位置のscriptタグを探す
-        for script in script_elements:
-            if script.string and ("product" in script.string.lower() or "description" in script.string.lower() or "comment" in script.string.lower()):
-                target_script = script
-                print(f"extract_specific_elements: 対象のscriptタグを発見")
-                break
-        
-        if target_script and target_script.string:
-            try:
-                # JSONデータを抽出
-                script_content = target_script.string.strip()
-                print(f"extract_specific_elements: script内容の最初の200文字: {script_content[:200]}...")
-                
-                # JSONオブジェクトを探す
-                json_start = script_content.find('{')
-                json_end = script_content.rfind('}')
-                
-                if json_start != -1 and json_end != -1 and json_end > json_start:
-                    json_str = script_content[json_start:json_end + 1]
-                    print(f"extract_specific_elements: JSON文字列を抽出: {json_str[:200]}...")
-                    
-                    # JSONをパース
-                    import json
-                    try:
-                        json_data = json.loads(json_str)
-                        print(f"extract_specific_elements: JSONパース成功")
-                        
-                        # 説明文の可能性があるフィールドを探す
-                        description_fields = ['description', 'comment', 'summary', 'text', 'content', 'detail', 'info']
-                        for field in description_fields:
-                            if field in json_data and json_data[field]:
-                                element1_text = str(json_data[field])
-                                element1_source = f"JSON - {field}"
-                                print(f"extract_specific_elements: JSONから説明文を取得: {field} = {element1_text[:100]}...")
-                                break
-                        
-                        # 説明文が見つからない場合、ネストされたオブジェクトも探す
-                        if not element1_text:
-                            for key, value in json_data.items():
-                                if isinstance(value, dict):
-                                    for sub_field in description_fields:
-                                        if sub_field in value and value[sub_field]:
-                                            element1_text = str(value[sub_field])
-                                            element1_source = f"JSON - {key}.{sub_field}"
-                                            print(f"extract_specific_elements: ネストされたJSONから説明文を取得: {key}.{sub_field} = {element1_text[:100]}...")
-                                            break
-                                    if element1_text:
-                                        break
-                        
-                    except json.JSONDecodeError as e:
-                        print(f"extract_specific_elements: JSONパースエラー: {e}")
-                        
-            except Exception as e:
-                print(f"extract_specific_elements: JSON処理エラー: {e}")
-        
-        # JSONから説明文が取得できない場合は、従来の方法を試行
-        if not element1_text:
-            print(f"extract_specific_elements: JSONから説明文が取得できないため、従来の方法を試行")
-            
-            # 設定されたセレクタを試行
-            for selector in description_selectors:
-                if selector.startswith("meta"):
-                    tag = soup.select_one(selector)
-                    if tag and tag.get("content"):
-                        element1_text = tag.get("content")
-                        element1_source = f"{selector} - meta description"
-                        print(f"extract_specific_elements: meta description found: {element1_text[:100]}...")
-                        break
-                else:
-                    tag = soup.select_one(selector)
-                    if tag and tag.get_text(strip=True):
-                        element1_text = tag.get_text(strip=True)
-                        element1_source = f"{selector} - found"
-                        print(f"extract_specific_elements: selector {selector} found: {element1_text[:100]}...")
-                        break
+        if root is not None:
+            # まず、商品情報のscriptタグのJSONから説明文を取得を試行
+            element1_text, element1_source = find_description_in_scripts(root)
+            if element1_text:
+                print(f"extract_specific_elements: JSONから説明文を取得: {element1_source} = {element1_text[:100]}...")
             
-            # 上記で見つからない場合は、より詳細な説明文を探す
-            if not element1_text or len(element1_text) < 50:  # 短すぎる場合は再検索
-                print(f"extract_specific_elements: 短い説明文または見つからないため、詳細検索を実行")
+            # JSONから説明文が取得できない場合は、設定されたセレクタを試行
+            if not element1_text:
+                element1_text, selector = extraction.match("description", root, selectors=resolver.description)
+                if element1_text:
+                    element1_source = f"{selector} - found"
+                    print(f"extract_specific_elements: selector {selector} found: {element1_text[:100]}...")
                 
-                # より具体的なセレクタを試行
-                detailed_selectors = [
-                    "div.productComment",
-                    "div.product-comment", 
-                    "div.product_comment",
-                    "div.comment",
-                    "div.description",
-                    "div.detail",
-                    "div.info",
-                    "div.content",
-                    "p.comment",
-                    "p.description",
-                    "p.detail",
-                    "p.info"
-                ]
+                # 上記で見つからない、または短すぎる場合は、より詳細な説明文を探す
+                if not element1_text or len(element1_text) < MIN_DESCRIPTION_LENGTH:
+                    text, selector = extraction.match("detailed", root, min_length=MIN_DESCRIPTION_LENGTH,
+                                                      selectors=resolver.detailed)
+                    if text:
+                        element1_text = text
+                        element1_source = f"{selector} - detailed search"
+                        print(f"extract_specific_elements: detailed selector {selector} found: {element1_text[:100]}...")
                 
-                for selector in detailed_selectors:
-                    tag = soup.select_one(selector)
-                    if tag:
-                        text = tag.get_text(strip=True)
-                        if text and len(text) > 50:  # より長いテキストを優先
-                            element1_text = text
-                            element1_source = f"{selector} - detailed search"
-                            print(f"extract_specific_elements: detailed selector {selector} found: {element1_text[:100]}...")
-                            break
-                
-                # それでも見つからない場合は、長いテキストを含む要素を探す
-                if not element1_text or len(element1_text) < 50:
-                    print(f"extract_specific_elements: 長いテキストを含む要素を検索中...")
-                    all_divs = soup.find_all(["div", "p", "span"])
-                    
-                    # テキストの長さでソートして、最も長いものを選択
-                    text_elements = []
-                    for elem in all_divs:
-                        text = elem.get_text(strip=True)
-                        if text and len(text) > 50 and not any(skip in text.lower() for skip in ['copyright', '利用規約', 'プライバシー', 'cookie']):
-                            text_elements.append((text, elem.name, len(text)))
-                    
-                    if text_elements:
-                        # 長さでソートして最長のものを選択
-                        text_elements.sort(key=lambda x: x[2], reverse=True)
-                        element1_text = text_elements[0][0]
-                        element1_source = f"{text_elements[0][1]} - longest text ({text_elements[0][2]} chars)"
+                # それでも見つからない場合は、長いテキストを含む要素を探す（1回の走査）
+                if not element1_text or len(element1_text) < MIN_DESCRIPTION_LENGTH:
+                    text, tag, length = find_longest_text(root)
+                    if text:
+                        element1_text = text
+                        element1_source = f"{tag} - longest text ({length} chars)"
                         print(f"extract_specific_elements: longest text found: {element1_text[:100]}...")
         
         # 説明文が見つからない場合
@@ -246,13 +223,10 @@ def extract_specific_elements(html: str, settings: Optional[Settings] = None) ->
     element2_source = ""
     
     try:
-        # 設定されたレビューセレクタを試行
-        for selector in review_selectors:
-            tag = soup.select_one(selector)
-            if tag and tag.get_text(strip=True):
-                element2_text = tag.get_text(strip=True)
+        if root is not None:
+            element2_text, selector = extraction.match("review", root, selectors=resolver.review)
+            if element2_text:
                 element2_source = f"{selector} - found"
-                break
         
         if not element2_text:
             element2_text = "レビューが見つかりません"
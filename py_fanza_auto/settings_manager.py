@@ -4,6 +4,7 @@ import shutil
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 import logging
+from backup_store import get_backup_store
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
@@ -23,19 +24,21 @@ class SettingsManager:
         # ディレクトリが存在しない場合は作成
         os.makedirs(self.config_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
+        self.backup_store = get_backup_store(self.backup_dir)
         
         # 初期設定ファイルが存在しない場合は作成
         if not os.path.exists(self.settings_file):
             logger.info("設定ファイルが存在しません。デフォルト設定を作成します")
             self._create_default_settings()
         else:
-            # 既存の設定ファイルのバックアップを作成
-            self._create_backup()
             # 設定ファイルの整合性をチェック
             try:
                 logger.info("既存の設定ファイルの整合性をチェック中...")
                 settings = self.load_settings()
                 logger.info(f"設定ファイルの読み込みに成功しました: {len(settings)}件の設定")
+                self._configure_backup_retention(settings)
+                # 既存の設定ファイルのバックアップを作成（前回から変更がなければ書き込まない）
+                self._create_backup()
                 
                 # 設定が空の場合はデフォルト設定を作成
                 if not settings:
@@ -79,6 +82,38 @@ class SettingsManager:
             "HEADLESS": True,
             "CLICK_XPATH": '//*[@id=":R6:"]/div[2]/div[2]/div[3]/div[1]/a',
             
+            # 設定バックアップの保持
+            "BACKUP_MAX_VERSIONS": 30,
+            "BACKUP_MAX_AGE_DAYS": 90,
+            
+            # 並列実行設定
+            "MAX_PARALLEL_POSTS": 3,
+            "MAX_CHROME_INSTANCES": 2,
+            "MAX_WP_WRITES": 2,
+            "DMM_REQUESTS_PER_SEC": 1.0,
+            
+            # 詳細ページキャッシュ
+            "DETAIL_CACHE_ENABLED": True,
+            "DETAIL_CACHE_TTL_HOURS": 24,
+            
+            # アイキャッチ画像の前処理
+            "EYECATCH_PREPROCESS": False,
+            "EYECATCH_MAX_DIMENSION": 1280,
+            "EYECATCH_QUALITY": 82,
+            "EYECATCH_FORMAT": "jpeg",
+            "EYECATCH_WORKERS": 2,
+            
+            # WordPressへのHTTP/2接続
+            "WP_HTTP2": False,
+            
+            # 起動スナップショット
+            "WARM_STATE_ENABLED": True,
+            
+            # メトリクス公開
+            "METRICS_EXPORTER_ENABLED": False,
+            "METRICS_EXPORTER_PORT": 9464,
+            "METRICS_EXPORTER_HOST": "127.0.0.1",
+            
             # スクレイピング設定
             "DESCRIPTION_SELECTORS": [
                 "meta[name=description]",
@@ -237,16 +272,26 @@ class SettingsManager:
         except Exception as e:
             logger.error(f"破損ファイルのバックアップエラー: {e}")
     
-    def _create_backup(self) -> None:
-        """設定ファイルのバックアップを作成"""
+    def _configure_backup_retention(self, settings: Dict[str, Any]) -> None:
+        """設定からバックアップの保持件数・保持日数を反映"""
         try:
-            if os.path.exists(self.settings_file):
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_path = os.path.join(self.backup_dir, f"settings_{timestamp}.json")
-                shutil.copy2(self.settings_file, backup_path)
-                logger.info(f"設定ファイルをバックアップ: {backup_path}")
+            self.backup_store.configure(
+                max_versions=settings.get("BACKUP_MAX_VERSIONS"),
+                max_age_days=settings.get("BACKUP_MAX_AGE_DAYS"),
+            )
         except Exception as e:
-            logger.error(f"バックアップ作成エラー: {e}")
+            logger.error(f"バックアップ保持設定エラー: {e}")
+    
+    def _create_backup(self) -> Optional[Dict[str, Any]]:
+        """設定ファイルのバックアップを作成（内容が前回と同じなら書き込まない）"""
+        return self.backup_store.save(self.settings_file)
+    
+    def create_backup(self) -> Optional[str]:
+        """設定ファイルのバックアップを作成し、バックアップのパスを返す"""
+        entry = self._create_backup()
+        if not entry:
+            return None
+        return self.backup_store.get_path(entry["id"])
     
     def _is_locked(self) -> bool:
         """設定ファイルがロックされているかチェック"""
@@ -310,7 +355,8 @@ class SettingsManager:
                 return False
             
             try:
-                # 保存前にバックアップを作成
+                # 保存前にバックアップを作成（前回のバックアップから変更がなければ書き込まない）
+                self._configure_backup_retention(settings)
                 self._create_backup()
                 
                 # 最終更新日時を更新
@@ -331,6 +377,9 @@ class SettingsManager:
                     os.rename(temp_file, self.settings_file)
                     
                     logger.info("設定を保存しました")
+                    # 共有の設定スナップショットに変更を即時反映
+                    from settings_snapshot import settings_snapshot
+                    settings_snapshot.invalidate()
                     return True
                     
                 except Exception as e:
@@ -477,17 +526,9 @@ class SettingsManager:
             return False
     
     def get_backup_files(self) -> List[str]:
-        """バックアップファイルの一覧を取得"""
+        """バックアップの一覧を取得（新しい順の版ID）"""
         try:
-            if not os.path.exists(self.backup_dir):
-                return []
-            
-            backup_files = []
-            for file in os.listdir(self.backup_dir):
-                if file.endswith(".json"):
-                    backup_files.append(file)
-            
-            return sorted(backup_files, reverse=True)
+            return [entry["id"] for entry in self.backup_store.list_versions()]
         except Exception as e:
             logger.error(f"バックアップファイル一覧取得エラー: {e}")
             return []
@@ -495,7 +536,10 @@ class SettingsManager:
     def restore_from_backup(self, backup_filename: str) -> bool:
         """指定されたバックアップから復元"""
         try:
-            backup_path = os.path.join(self.backup_dir, backup_filename)
+            backup_path = self.backup_store.get_path(backup_filename)
+            if not backup_path:
+                # 破損時のバックアップなどストア外のファイル
+                backup_path = os.path.join(self.backup_dir, backup_filename)
             if not os.path.exists(backup_path):
                 logger.error(f"バックアップファイルが存在しません: {backup_filename}")
                 return False
@@ -505,6 +549,8 @@ class SettingsManager:
             
             # バックアップファイルをコピー
             shutil.copy2(backup_path, self.settings_file)
+            from settings_snapshot import settings_snapshot
+            settings_snapshot.invalidate()
             
             logger.info(f"バックアップから復元しました: {backup_filename}")
             return True
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Settings
+from settings_manager import SettingsManager
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """ある時点の設定内容
+
+    settingsは変更できないSettings（frozen）をそのまま共有し、post_settingsは
+    取得するたびにコピーを返すので、呼び出し側が変更しても他に影響しない。
+    """
+    version: int
+    settings: Settings
+    post_settings_data: Dict[str, Any] = field(default_factory=dict)
+    settings_hash: str = ""
+    post_settings_hash: str = ""
+
+    @property
+    def post_settings(self) -> Dict[str, Any]:
+        return copy.deepcopy(self.post_settings_data)
+
+
+class SettingsSnapshotService:
+    """プロセス全体で共有する設定スナップショット
+
+    settings.json / post_settings.json を一度だけ読み込んで保持し、ファイルの更新時刻・サイズが
+    変わり、かつ内容のハッシュが変わった場合のみ再構築する。更新チェックはCHECK_INTERVAL秒に
+    1回までなので、アイテムごとの設定取得は保持中のスナップショットを返すだけになる。
+    """
+
+    # ファイルの更新チェック間隔（秒）
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.settings_file = os.path.join(self.base_dir, "config", "settings.json")
+        self.post_settings_file = os.path.join(self.base_dir, "config", "post_settings.json")
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SettingsSnapshot] = None
+        self._stats: Tuple[Any, Any] = (None, None)
+        self._last_check = 0.0
+        self._initialized = False
+        self._listeners: List[Callable[[SettingsSnapshot], None]] = []
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read(path: str) -> Tuple[bytes, str]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        return data, hashlib.sha256(data).hexdigest()
+
+    def get(self) -> SettingsSnapshot:
+        """現在のスナップショットを取得"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.CHECK_INTERVAL:
+            return snapshot
+        return self._refresh()
+
+    def settings(self) -> Settings:
+        return self.get().settings
+
+    def post_settings(self) -> Dict[str, Any]:
+        return self.get().post_settings
+
+    def invalidate(self):
+        """次回取得時にファイルの更新チェックを強制する"""
+        self._last_check = 0.0
+        self._stats = (None, None)
+
+    def add_listener(self, callback: Callable[[SettingsSnapshot], None]):
+        """設定が変わったときに呼ばれるコールバックを登録"""
+        self._listeners.append(callback)
+
+    def _refresh(self) -> SettingsSnapshot:
+        with self._lock:
+            if not self._initialized:
+                # 初回のみ設定ファイルの作成・整合性チェックを行う
+                SettingsManager(self.base_dir)
+                self._initialized = True
+
+            self._last_check = time.monotonic()
+            stats = (self._stat(self.settings_file), self._stat(self.post_settings_file))
+            if self._snapshot is not None and stats == self._stats:
+                return self._snapshot
+
+            settings_data, settings_hash = self._read(self.settings_file)
+            post_data, post_hash = self._read(self.post_settings_file)
+            self._stats = stats
+            previous = self._snapshot
+            if previous is not None and previous.settings_hash == settings_hash and previous.post_settings_hash == post_hash:
+                # 更新時刻だけが変わった場合は再構築しない
+                return previous
+
+            parsed_settings = self._parse(settings_data)
+            parsed_post = self._parse(post_data)
+            if previous is not None and (parsed_settings is None or parsed_post is None):
+                # 書き込み途中などで読めない場合は前回の内容を使い、次回再チェックする
+                self._stats = (None, None)
+                return previous
+
+            snapshot = SettingsSnapshot(
+                version=(previous.version + 1) if previous else 1,
+                settings=Settings.from_data(parsed_settings or {}),
+                post_settings_data=parsed_post or {},
+                settings_hash=settings_hash,
+                post_settings_hash=post_hash,
+            )
+            self._snapshot = snapshot
+            print(f"設定スナップショットを更新しました: version {snapshot.version}")
+
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"設定変更通知エラー: {e}")
+        return snapshot
+
+    @staticmethod
+    def _parse(data: bytes) -> Optional[Dict[str, Any]]:
+        """JSONを解析（解析できない場合はNone）"""
+        if not data.strip():
+            return {}
+        try:
+            parsed = json.loads(data.decode("utf-8"))
+            return parsed if isinstance(parsed, dict) else {}
+        except Exception as e:
+            print(f"設定スナップショット読み込みエラー: {e}")
+            return None
+
+
+# グローバルな設定スナップショット
+settings_snapshot = SettingsSnapshotService()
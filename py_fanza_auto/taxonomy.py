@@ -0,0 +1,201 @@
+from __future__ import annotations
+import html
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from category_manager import make_slug
+from wp_client import WordPressClient
+
+
+TAXONOMIES = ("categories", "tags")
+
+# ターム名か (ターム名, スラッグ) のタプル
+Term = Union[str, Tuple[str, str]]
+
+
+def term_key(name: str) -> str:
+    """ターム名の比較用キー（WordPressが返す名前はHTMLエスケープされている）"""
+    return html.unescape(name or "").strip().lower()
+
+
+def split_term(term: Term) -> Tuple[str, str]:
+    """タームを (ターム名, スラッグ) に分ける（スラッグがなければmake_slugで求める）"""
+    if isinstance(term, str):
+        name, slug = term, ""
+    else:
+        name, slug = term
+    name = html.unescape(name or "").strip()
+    return name, (slug or make_slug(name)).lower()
+
+
+class TaxonomyBatcher:
+    """カテゴリ・タグの作成と割り当てをまとめて行う
+
+    既存のタームは最初に一覧を1回だけ取得してスラッグ→IDで保持する。prepareで
+    バッチ内のアイテムが使うタームをまとめて渡すと、未作成のものだけを重複なく
+    max_workers件ずつ並列にスラッグ付きで作成する。スラッグを指定せずに作成された
+    既存のタームを重複して作成しないよう、名前→IDも合わせて保持する。割り当ては投稿の作成・更新データに
+    categories・tagsとして含めるため、投稿ごとの追加のリクエストは発生しない。
+    """
+
+    def __init__(self, wp: WordPressClient, max_workers: int = 4):
+        self.wp = wp
+        self.max_workers = max(1, max_workers)
+        self._ids: Dict[str, Dict[str, int]] = {taxonomy: {} for taxonomy in TAXONOMIES}
+        self._names: Dict[str, Dict[str, int]] = {taxonomy: {} for taxonomy in TAXONOMIES}
+        self._loaded: set = set()
+        # WordPressから一覧を取得したタクソノミー（スナップショットから読み込んだだけのものは含まない）
+        self.fetched: set = set()
+        self._lock = threading.Lock()
+        # 並列実行中の別の投稿設定が同じタームを二重に作成しないよう、作成処理は1つずつ行う
+        self._create_lock = threading.Lock()
+
+    def _ensure_loaded(self, taxonomy: str):
+        if taxonomy in self._loaded:
+            return
+        slugs, names = self._fetch(taxonomy)
+        with self._lock:
+            self._ids[taxonomy].update(slugs)
+            for key, term_id in names.items():
+                self._names[taxonomy].setdefault(key, term_id)
+        count = len(slugs)
+        self._loaded.add(taxonomy)
+        self.fetched.add(taxonomy)
+        print(f"タクソノミー: 既存の{taxonomy} {count}件を読み込み")
+
+    def _fetch(self, taxonomy: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """一覧を取得し、(スラッグ→ID, 名前→ID) を返す"""
+        slugs: Dict[str, int] = {}
+        names: Dict[str, int] = {}
+        for term in self.wp.iter_terms(taxonomy):
+            term_id = int(term["id"])
+            if term.get("slug"):
+                slugs.setdefault(str(term["slug"]).lower(), term_id)
+            names.setdefault(term_key(term.get("name", "")), term_id)
+        return slugs, names
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """読み込み済みのタクソノミーの {タクソノミー: {"slugs": {...}, "names": {...}}}（起動スナップショット用）"""
+        with self._lock:
+            return {taxonomy: {"slugs": dict(self._ids[taxonomy]), "names": dict(self._names[taxonomy])}
+                    for taxonomy in self._loaded}
+
+    def load_snapshot(self, ids_by_taxonomy: Dict[str, Dict[str, Dict[str, int]]]):
+        """起動スナップショットのIDを読み込み、一覧の取得を省略する
+
+        名前だけをキーにしていた以前の形式のものは読み込まず、一覧を取得し直す。
+        """
+        with self._lock:
+            for taxonomy, ids in ids_by_taxonomy.items():
+                if taxonomy not in self._ids or not isinstance(ids.get("slugs"), dict):
+                    continue
+                self._ids[taxonomy].update({key: int(term_id) for key, term_id in ids["slugs"].items()})
+                self._names[taxonomy].update({key: int(term_id) for key, term_id in (ids.get("names") or {}).items()})
+                self._loaded.add(taxonomy)
+
+    def refresh(self, taxonomy: str) -> int:
+        """一覧を取得し直してIDを更新し、件数を返す
+
+        取得中に作成されたタームを失わないよう、取得結果にないIDも残す。
+        """
+        fresh, names = self._fetch(taxonomy)
+        with self._lock:
+            self._ids[taxonomy].update(fresh)
+            self._names[taxonomy].update(names)
+            self._loaded.add(taxonomy)
+            self.fetched.add(taxonomy)
+        return len(fresh)
+
+    def _reload(self, taxonomy: str) -> int:
+        """一覧を取得し直してIDを置き換え、件数を返す（呼び出し側で_create_lockを保持する）
+
+        refreshと違い取得結果にないIDは削除されたタームとして捨てる。WordPressは
+        存在しないタームのIDを割り当てから黙って除くため、古いIDを残さない。
+        """
+        fresh, names = self._fetch(taxonomy)
+        with self._lock:
+            self._ids[taxonomy] = fresh
+            self._names[taxonomy] = names
+            self._loaded.add(taxonomy)
+            self.fetched.add(taxonomy)
+        return len(fresh)
+
+    def _create(self, taxonomy: str, name: str, slug: str) -> Tuple[Optional[int], bool]:
+        """タームを作成し、(ID, 既に存在したか) を返す"""
+        try:
+            term = self.wp.create_term(taxonomy, name, slug=slug or None)
+            if not term or not term.get("id"):
+                return None, False
+            return int(term["id"]), bool(term.get("term_exists"))
+        except Exception as e:
+            print(f"タクソノミー: {taxonomy} 「{name}」の作成エラー: {e}")
+            return None, False
+
+    def _lookup(self, taxonomy: str, name: str, slug: str) -> Optional[int]:
+        """保持しているIDをスラッグ、なければ名前で探す（呼び出し側で_lockを保持する）"""
+        return self._ids[taxonomy].get(slug) or self._names[taxonomy].get(term_key(name))
+
+    def prepare(self, taxonomy: str, terms: Iterable[Term]) -> int:
+        """未作成のタームをまとめて作成し、作成した件数を返す"""
+        with self._create_lock:
+            self._ensure_loaded(taxonomy)
+            missing: Dict[str, Tuple[str, str]] = {}
+            with self._lock:
+                for term in terms:
+                    name, slug = split_term(term)
+                    if slug and slug not in missing and not self._lookup(taxonomy, name, slug):
+                        missing[slug] = (name, slug)
+            if not missing:
+                return 0
+
+            print(f"タクソノミー: {taxonomy} {len(missing)}件を作成")
+            results: Dict[str, int] = {}
+            existed = False
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                for slug, (term_id, exists) in zip(missing, executor.map(lambda term: self._create(taxonomy, *term), missing.values())):
+                    if term_id:
+                        results[slug] = term_id
+                        existed = existed or exists
+            with self._lock:
+                self._ids[taxonomy].update(results)
+            if existed:
+                # 一覧にないタームが既に存在した＝保持しているID（起動スナップショット）が古いので取得し直す
+                print(f"タクソノミー: {taxonomy} の一覧が古いため取得し直します")
+                try:
+                    self._reload(taxonomy)
+                    with self._lock:
+                        self._ids[taxonomy].update(results)
+                except Exception as e:
+                    print(f"タクソノミー: {taxonomy} の再取得エラー: {e}")
+                    # 古いスナップショットを取得し直したものとして保存しない
+                    with self._lock:
+                        self.fetched.discard(taxonomy)
+            return len(results)
+
+    def prepare_items(self, terms_by_taxonomy: Dict[str, Iterable[Term]]):
+        """{タクソノミー: ターム} をまとめて作成（prepareを参照）"""
+        for taxonomy, terms in terms_by_taxonomy.items():
+            self.prepare(taxonomy, terms)
+
+    def ids_for(self, taxonomy: str, terms: Iterable[Term]) -> List[int]:
+        """タームをIDに変換（未作成のものはその場で作成する）"""
+        terms = [split_term(term) for term in terms]
+        terms = [(name, slug) for name, slug in terms if slug]
+        self.prepare(taxonomy, terms)
+        ids: List[int] = []
+        with self._lock:
+            for name, slug in terms:
+                term_id = self._lookup(taxonomy, name, slug)
+                if term_id and term_id not in ids:
+                    ids.append(term_id)
+        return ids
+
+    def payload(self, terms_by_taxonomy: Dict[str, Iterable[Term]]) -> Dict[str, Any]:
+        """投稿の作成・更新データに含める {"categories": [...], "tags": [...]} を作成"""
+        data: Dict[str, Any] = {}
+        for taxonomy, terms in terms_by_taxonomy.items():
+            ids = self.ids_for(taxonomy, terms)
+            if ids:
+                data[taxonomy] = ids
+        return data
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設定バックアップストアのテスト
+同じ内容を重複して保存しないこと、保持件数を超えた版の削除、
+同じディレクトリを使う複数のストアで版が失われないことを確認する。
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backup_store import BackupStore, get_backup_store
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def test_same_content_is_not_duplicated():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "settings.json")
+        store = BackupStore(os.path.join(tmp, "backups"))
+        _write(source, {"A": 1})
+        first = store.save(source)
+        second = store.save(source)
+        assert first["id"] == second["id"]
+        assert len(store.list_versions()) == 1
+        assert len(os.listdir(store.objects_dir)) == 1
+
+
+def test_prune_keeps_max_versions():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "settings.json")
+        store = BackupStore(os.path.join(tmp, "backups"), max_versions=3)
+        for i in range(5):
+            _write(source, {"A": i})
+            store.save(source)
+        versions = store.list_versions()
+        assert len(versions) == 3
+        # 残った版の本体だけが残る
+        assert {v["hash"] + ".json" for v in versions} == set(os.listdir(store.objects_dir))
+        restored = os.path.join(tmp, "restored.json")
+        assert store.restore(versions[0]["id"], restored)
+        with open(restored, encoding="utf-8") as f:
+            assert json.load(f) == {"A": 4}
+
+
+def test_two_stores_on_same_dir_keep_all_versions():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "settings.json")
+        backup_dir = os.path.join(tmp, "backups")
+        # 別プロセスのストアを想定して、共有せずに2つ作る
+        store_a = BackupStore(backup_dir, max_versions=2)
+        store_b = BackupStore(backup_dir, max_versions=2)
+        _write(source, {"A": 1})
+        store_a.save(source)
+        _write(source, {"A": 2})
+        store_b.save(source)
+        assert len(store_a.list_versions()) == 2
+        _write(source, {"A": 3})
+        store_a.save(source)
+        versions = store_b.list_versions()
+        assert len(versions) == 2
+        for version in versions:
+            assert store_b.get_path(version["id"]) is not None
+
+
+def test_legacy_files_are_migrated():
+    with tempfile.TemporaryDirectory() as tmp:
+        backup_dir = os.path.join(tmp, "backups")
+        os.makedirs(backup_dir)
+        _write(os.path.join(backup_dir, "settings_20240101_000000.json"), {"A": 1})
+        _write(os.path.join(backup_dir, "settings_20240102_000000.json"), {"A": 1})
+        _write(os.path.join(backup_dir, "settings_20240103_000000.json"), {"A": 2})
+        store = BackupStore(backup_dir, max_age_days=0)
+        assert len(store.list_versions()) == 2
+        assert not [name for name in os.listdir(backup_dir) if name.startswith("settings_")]
+
+
+def test_get_backup_store_shares_instance():
+    with tempfile.TemporaryDirectory() as tmp:
+        backup_dir = os.path.join(tmp, "backups")
+        assert get_backup_store(backup_dir) is get_backup_store(os.path.join(backup_dir, "."))
+
+
+if __name__ == "__main__":
+    test_same_content_is_not_duplicated()
+    test_prune_keeps_max_versions()
+    test_two_stores_on_same_dir_keep_all_versions()
+    test_legacy_files_are_migrated()
+    test_get_backup_store_shares_instance()
+    print("バックアップストアのテストが成功しました")
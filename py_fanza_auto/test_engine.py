@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投稿処理のテスト
+WordPressの代わりにメモリ上の投稿一覧を使い、ジョブキューのワーカーが
+更新に失敗したジョブを完了にしないこと、投稿に含めるカテゴリ・タグが
+CategoryManagerと同じ決め方になることなどを確認する。
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from category_manager import CategoryManager, make_slug
+from engine import Engine, PostingSettings
+from job_queue import JobQueue
+from log_manager import LogManager
+from run_metrics import RunMetrics
+from taxonomy import TaxonomyBatcher
+
+
+class _FakeWP:
+    """投稿の作成・更新・スラッグ検索とタームの一覧・作成だけを持つWordPressの代わり"""
+
+    def __init__(self, fail_updates=False, delay=0.0):
+        self.posts = {}
+        self.terms = {"categories": [], "tags": []}
+        self.fail_updates = fail_updates
+        self.delay = delay
+
+    def iter_terms(self, taxonomy):
+        yield from self.terms[taxonomy]
+
+    def create_term(self, taxonomy, name, slug=None):
+        term = {"id": len(self.terms[taxonomy]) + 1, "name": name, "slug": slug}
+        self.terms[taxonomy].append(term)
+        return term
+
+    def term_slugs(self, taxonomy, ids):
+        return [term["slug"] for term in self.terms[taxonomy] if term["id"] in ids]
+
+    def get_post_by_slug(self, slug):
+        for post in self.posts.values():
+            if post["slug"] == slug:
+                return post
+        return None
+
+    def create_post(self, title, content, status="publish", slug=None, **taxonomy):
+        time.sleep(self.delay)
+        post_id = len(self.posts) + 100
+        self.posts[post_id] = dict(taxonomy, id=post_id, slug=slug, title=title, status=status)
+        return {"id": post_id}
+
+    def update_post(self, post_id, data):
+        if self.fail_updates:
+            response = requests.Response()
+            response.status_code = 500
+            raise requests.exceptions.HTTPError("500 Server Error", response=response)
+        self.posts[post_id].update(data)
+        return self.posts[post_id]
+
+
+class _AsyncWP:
+    """_FakeWPのメソッドをコルーチンとして呼ぶ非同期クライアントの代わり"""
+
+    def __init__(self, wp):
+        self.wp = wp
+
+    def __getattr__(self, name):
+        method = getattr(self.wp, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class _VartagGUI:
+    """LLM変数タグの処理に渡された説明文を記録するGUIの代わり"""
+
+    def __init__(self):
+        self.descriptions = {}
+
+    def process_llm_vartags(self, content, item, description):
+        self.descriptions[item["content_id"]] = description
+        return content + "（処理済み）"
+
+
+def _engine(tmp, wp, **fields):
+    fields.setdefault("category_manager", None)
+    engine = Engine(settings=None, dmm=None, wp=wp, renderer=None, settings_manager=None, scheduler=None,
+                    log_manager=LogManager(log_dir=os.path.join(tmp, "logs"), db_logging=False,
+                                           file_logging=False, console_logging=False),
+                    **fields)
+    engine._build_content_timed = lambda item, settings: (item["title"], "本文", None, None)
+    return engine
+
+
+def _items(count):
+    return [{"content_id": f"abc{i:03d}", "title": f"作品{i}"} for i in range(count)]
+
+
+def test_worker_completes_new_posts():
+    with tempfile.TemporaryDirectory() as tmp:
+        wp = _FakeWP()
+        engine = _engine(tmp, wp)
+        engine._load_posting_settings = lambda num: PostingSettings()
+        queue = JobQueue(os.path.join(tmp, "job_queue.db"))
+        queue.enqueue(_items(3))
+        created = engine.run_worker(queue, "w1")
+        assert sorted(created) == [100, 101, 102]
+        assert queue.stats()[JobQueue.STATUS_DONE] == 3
+        # 投稿済みのアイテムは重複としてスキップし、失敗にはしない
+        queue.retry_failed()
+        assert engine.post_one(_items(1)[0], PostingSettings()) is None
+        assert engine.last_post_error is None
+
+
+def test_worker_retries_failed_update():
+    with tempfile.TemporaryDirectory() as tmp:
+        wp = _FakeWP(fail_updates=True)
+        wp.create_post("既存", "本文", slug="abc000")
+        engine = _engine(tmp, wp)
+        engine._load_posting_settings = lambda num: PostingSettings(overwrite_existing=True)
+        queue = JobQueue(os.path.join(tmp, "job_queue.db"), max_attempts=2, retry_delay=0)
+        queue.enqueue(_items(1))
+        assert engine.run_worker(queue, "w1") == []
+        stats = queue.stats()
+        assert stats[JobQueue.STATUS_DONE] == 0
+        assert stats[JobQueue.STATUS_FAILED] == 1
+
+
+def test_worker_keeps_lease_during_slow_post():
+    with tempfile.TemporaryDirectory() as tmp:
+        wp = _FakeWP(delay=1.5)
+        engine = _engine(tmp, wp)
+        engine._load_posting_settings = lambda num: PostingSettings()
+        queue = JobQueue(os.path.join(tmp, "job_queue.db"), lease_seconds=1)
+        queue.enqueue(_items(1))
+        leased_by_other = []
+        original = wp.create_post
+
+        def create_post(*args, **kwargs):
+            # 投稿中に別のワーカーが同じジョブを取れないこと
+            result = original(*args, **kwargs)
+            leased_by_other.append(queue.lease("w2"))
+            return result
+
+        wp.create_post = create_post
+        assert engine.run_worker(queue, "w1") == [100]
+        assert leased_by_other == [None]
+        assert len(wp.posts) == 1
+
+
+def test_async_post_passes_chrome_description_to_vartags():
+    with tempfile.TemporaryDirectory() as tmp:
+        wp = _FakeWP()
+        gui = _VartagGUI()
+        engine = _engine(tmp, wp, main_gui=gui)
+
+        def build(item, settings):
+            # Chromeの詳細説明はスレッドごとに保持される
+            engine._chrome_description = f"説明{item['content_id']}"
+            time.sleep(0.01)
+            return item["title"], "本文", None, None
+
+        engine._build_content_timed = build
+        items = _items(8)
+        metrics = RunMetrics("async", "1")
+
+        async def post_all():
+            return await asyncio.gather(*[
+                engine._post_one_async(item, PostingSettings(), None, None, _AsyncWP(wp), metrics)
+                for item in items])
+
+        assert sorted(asyncio.run(post_all())) == list(range(100, 108))
+        for item in items:
+            assert f"詳細説明: 説明{item['content_id']}" in gui.descriptions[item["content_id"]]
+        assert all(post["title"] for post in wp.posts.values())
+
+
+def test_taxonomy_payload_matches_category_manager():
+    with tempfile.TemporaryDirectory() as tmp:
+        wp = _FakeWP()
+        engine = _engine(tmp, wp, category_manager=CategoryManager(wp), taxonomy=TaxonomyBatcher(wp))
+        japanese = {"content_id": "abc001", "title": "作品", "jancode": "4512345678901",
+                    "actress": [{"name": "さくら"}], "director": [{"name": "ナナミ"}],
+                    "maker": [{"name": "メーカー"}]}
+        imported = {"content_id": "abc002", "title": "作品2", "jancode": "0012345678905",
+                    "director": [{"name": "ナナミ"}]}
+        engine._prepare_taxonomy([japanese, imported], PostingSettings(category="jan"))
+        created = len(wp.terms["tags"])
+        for item in (japanese, imported):
+            engine.post_one(item, PostingSettings(category="jan"))
+        # 投稿ごとにタームを作成し直さない
+        assert len(wp.terms["tags"]) == created
+
+        first, second = wp.posts[100], wp.posts[101]
+        assert wp.term_slugs("categories", first["categories"]) == ["japan-made"]
+        assert wp.term_slugs("categories", second["categories"]) == ["imported"]
+        assert wp.term_slugs("tags", first["tags"]) == [
+            f"actress-{make_slug('さくら')}", f"director-{make_slug('ナナミ')}",
+            f"maker-{make_slug('メーカー')}", "content-id-abc001", "jancode-4512345678901"]
+        # 監督タグは同じタームを使う
+        assert f"director-{make_slug('ナナミ')}" in wp.term_slugs("tags", second["tags"])
+        assert wp.term_slugs("tags", first["tags"]) == [
+            slug for _, slug in CategoryManager(wp).tag_terms_for_item(japanese)]
+
+
+if __name__ == "__main__":
+    test_worker_completes_new_posts()
+    test_worker_retries_failed_update()
+    test_worker_keeps_lease_during_slow_post()
+    test_async_post_passes_chrome_description_to_vartags()
+    test_taxonomy_payload_matches_category_manager()
+    print("投稿処理のテストが成功しました")
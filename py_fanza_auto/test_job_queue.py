@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ジョブキューのテスト
+リース期限切れのジョブの再取得、失敗時の遅延と試行回数の上限、
+リースを持つワーカーだけが完了・失敗にできること、未完了ジョブの判定を
+一時ファイルのデータベースで確認する。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from job_queue import JobQueue
+
+
+def _queue(tmp, **kwargs):
+    return JobQueue(os.path.join(tmp, "job_queue.db"), **kwargs)
+
+
+def test_enqueue_ignores_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        assert queue.enqueue([{"content_id": "a"}, {"content_id": "b"}, {"title": "no id"}]) == 2
+        assert queue.enqueue([{"content_id": "a"}]) == 0
+        assert queue.stats()[JobQueue.STATUS_PENDING] == 2
+
+
+def test_lease_is_exclusive_until_expired():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        queue.enqueue([{"content_id": "a"}])
+        job = queue.lease("w1")
+        assert job.content_id == "a" and job.attempts == 1
+        assert queue.lease("w2") is None
+
+        # リース期限を過ぎたジョブは別のワーカーが取り直せる
+        expired = _queue(tmp, lease_seconds=-1)
+        expired.enqueue([{"content_id": "b"}])
+        assert expired.lease("w1").content_id == "b"
+        job = expired.lease("w2")
+        assert job.content_id == "b" and job.attempts == 2
+        # 元のワーカーは完了にできない
+        assert not expired.complete("b", "w1")
+        assert expired.complete("b", "w2", post_id=10)
+
+
+def test_complete_requires_lease_owner():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        queue.enqueue([{"content_id": "a"}])
+        assert not queue.complete("a", "w1")
+        queue.lease("w1")
+        assert not queue.complete("a", "w2")
+        assert not queue.fail("a", "w2", "error")
+        assert queue.complete("a", "w1", post_id=10)
+        # 完了済みのジョブは取り直せず、登録し直しても再実行されない
+        assert not queue.complete("a", "w1")
+        assert queue.enqueue([{"content_id": "a"}]) == 0
+        assert queue.lease("w1") is None
+        assert queue.stats()[JobQueue.STATUS_DONE] == 1
+
+
+def test_fail_delays_retry():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp, retry_delay=60)
+        queue.enqueue([{"content_id": "a"}])
+        queue.lease("w1")
+        assert queue.fail("a", "w1", "error")
+        # 再実行は遅延するが、未完了として残る
+        assert queue.lease("w1") is None
+        assert queue.has_remaining()
+        assert queue.stats()[JobQueue.STATUS_PENDING] == 1
+
+
+def test_fail_stops_after_max_attempts():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp, max_attempts=2, retry_delay=0)
+        queue.enqueue([{"content_id": "a"}])
+        for attempt in (1, 2):
+            job = queue.lease("w1")
+            assert job.attempts == attempt
+            assert queue.fail("a", "w1", f"error {attempt}")
+        assert queue.lease("w1") is None
+        assert not queue.has_remaining()
+        assert queue.stats()[JobQueue.STATUS_FAILED] == 1
+        assert queue.retry_failed() == 1
+        assert queue.lease("w1").attempts == 1
+
+
+def test_expired_lease_without_attempts_is_failed():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp, max_attempts=1, lease_seconds=-1)
+        queue.enqueue([{"content_id": "a"}])
+        assert queue.lease("w1").content_id == "a"
+        # ワーカーが落ちたまま試行回数を使い切ったジョブは残りに数えない
+        assert not queue.has_remaining()
+        assert queue.lease("w2") is None
+        assert queue.stats()[JobQueue.STATUS_FAILED] == 1
+
+
+def test_has_remaining_counts_active_lease():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp, max_attempts=1)
+        assert not queue.has_remaining()
+        queue.enqueue([{"content_id": "a"}])
+        assert queue.has_remaining()
+        queue.lease("w1")
+        # 最後の試行中のジョブも、リース期限内なら未完了
+        assert queue.has_remaining()
+        queue.complete("a", "w1")
+        assert not queue.has_remaining()
+
+
+if __name__ == "__main__":
+    test_enqueue_ignores_duplicates()
+    test_lease_is_exclusive_until_expired()
+    test_complete_requires_lease_owner()
+    test_fail_delays_retry()
+    test_fail_stops_after_max_attempts()
+    test_expired_lease_without_attempts_is_failed()
+    test_has_remaining_counts_active_lease()
+    print("ジョブキューのテストが成功しました")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+データベースログのテスト
+月ごとのテーブルへの振り分け、保持期間を過ぎたログの削除、
+旧形式のlogsテーブルからの移行、別のプロセスが月のテーブルを削除した場合の再試行を
+一時ファイルのデータベースで確認する。
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from log_manager import DatabaseLogger, LogEntry, LogLevel, LogType
+
+
+def _entry(timestamp, message="test", level=LogLevel.INFO):
+    return LogEntry(timestamp=timestamp, level=level, type=LogType.SYSTEM, message=message)
+
+
+def _months_ago(months):
+    now = datetime.now().replace(day=15, hour=12, minute=0, second=0, microsecond=0)
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return now.replace(year=year, month=month + 1)
+
+
+def _create_legacy_table(db_path, count, timestamp):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL, level TEXT NOT NULL, type TEXT NOT NULL, message TEXT NOT NULL,
+            details TEXT, error_traceback TEXT, user_id TEXT, session_id TEXT
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO logs (timestamp, level, type, message) VALUES (?, 'INFO', 'system', ?)",
+        [(timestamp.isoformat(), f"legacy {i}") for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def test_entries_are_routed_to_monthly_tables():
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, "logs.db"))
+        this_month, last_month = _months_ago(0), _months_ago(1)
+        later = this_month + timedelta(minutes=1)
+        logger.log_many([_entry(this_month, "now"), _entry(last_month, "before"), _entry(later, "later")])
+        conn = sqlite3.connect(logger.db_path)
+        partitions = logger._list_partitions(conn)
+        assert partitions == [f"logs_{this_month:%Y%m}", f"logs_{last_month:%Y%m}"]
+        assert conn.execute(f"SELECT COUNT(*) FROM {partitions[0]}").fetchone()[0] == 2
+        conn.close()
+        logs = logger.get_logs()
+        assert [log.message for log in logs] == ["later", "now", "before"]
+        assert logs[1].timestamp == this_month
+        assert [log.message for log in logger.get_logs(start_date=this_month - timedelta(days=1))] == ["later", "now"]
+
+
+def test_cleanup_drops_old_partitions():
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, "logs.db"))
+        logger.log_many([_entry(_months_ago(0)), _entry(_months_ago(3)), _entry(_months_ago(4))])
+        deleted = logger.cleanup_old_logs(days=45)
+        assert deleted == 2
+        conn = sqlite3.connect(logger.db_path)
+        assert logger._list_partitions(conn) == [f"logs_{_months_ago(0):%Y%m}"]
+        conn.close()
+        # 削除したテーブルの月にも再び書き込める
+        logger.log(_entry(_months_ago(4)))
+        assert len(logger.get_logs()) == 2
+
+
+def test_legacy_table_is_migrated():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "logs.db")
+        _create_legacy_table(db_path, 12, _months_ago(1))
+        logger = DatabaseLogger(db_path)
+        logger.MIGRATE_CHUNK = 5
+        # 移行中も旧形式のログを読める
+        assert len(logger.get_logs()) == 12
+        migrated = [logger._migrate_legacy() for _ in range(3)]
+        assert migrated == [5, 5, 2]
+        conn = sqlite3.connect(db_path)
+        assert not logger._has_legacy_table(conn)
+        conn.close()
+        assert len(logger.get_logs()) == 12
+
+
+def test_legacy_table_is_skipped_after_migration():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "logs.db")
+        _create_legacy_table(db_path, 3, _months_ago(1))
+        logger = DatabaseLogger(db_path)
+        assert logger._migrate_legacy() == 3
+        # 移行の完了後に古いバージョンが旧形式のテーブルを作り直しても参照しない
+        _create_legacy_table(db_path, 2, _months_ago(1))
+        for reader in (logger, DatabaseLogger(db_path)):
+            assert len(reader.get_logs()) == 3
+            assert reader._migrate_legacy() == 0
+
+
+def test_dropped_partition_is_recreated():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "logs.db")
+        logger = DatabaseLogger(db_path)
+        logger.log(_entry(_months_ago(0), "first"))
+        # 別のプロセスの保守処理が月のテーブルを削除した
+        conn = sqlite3.connect(db_path)
+        conn.execute(f"DROP TABLE logs_{_months_ago(0):%Y%m}")
+        conn.commit()
+        conn.close()
+        logger.log(_entry(_months_ago(0), "second"))
+        assert [log.message for log in logger.get_logs()] == ["second"]
+
+
+def test_get_logs_retries_when_partition_is_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "logs.db")
+        logger = DatabaseLogger(db_path)
+        logger.log_many([_entry(_months_ago(0), "now"), _entry(_months_ago(3), "old")])
+        list_partitions = logger._list_partitions
+        listed = []
+
+        def drop_after_listing(conn):
+            # 一覧を取得した直後に、別のプロセスが古い月のテーブルを削除する
+            tables = list_partitions(conn)
+            if not listed:
+                other = sqlite3.connect(db_path)
+                other.execute(f"DROP TABLE logs_{_months_ago(3):%Y%m}")
+                other.commit()
+                other.close()
+            listed.append(tables)
+            return tables
+
+        logger._list_partitions = drop_after_listing
+        assert [log.message for log in logger.get_logs()] == ["now"]
+        assert len(listed) > 1 and f"logs_{_months_ago(3):%Y%m}" not in listed[-1]
+
+
+def test_concurrent_migration_copies_each_row_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "logs.db")
+        _create_legacy_table(db_path, 40, _months_ago(1))
+        loggers = [DatabaseLogger(db_path) for _ in range(4)]
+        for logger in loggers:
+            logger.MIGRATE_CHUNK = 3
+
+        def migrate(logger):
+            while logger._migrate_legacy():
+                pass
+
+        threads = [threading.Thread(target=migrate, args=(logger,)) for logger in loggers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        messages = [log.message for log in loggers[0].get_logs()]
+        assert sorted(messages) == sorted(f"legacy {i}" for i in range(40))
+
+
+def test_maintenance_does_not_vacuum_online():
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, "logs.db"))
+        logger.log(_entry(_months_ago(0)))
+        logger.run_maintenance()
+        conn = sqlite3.connect(logger.db_path)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        conn.close()
+        assert logger.enable_auto_vacuum()
+        assert not logger.enable_auto_vacuum()
+
+
+if __name__ == "__main__":
+    test_entries_are_routed_to_monthly_tables()
+    test_cleanup_drops_old_partitions()
+    test_legacy_table_is_migrated()
+    test_legacy_table_is_skipped_after_migration()
+    test_dropped_partition_is_recreated()
+    test_get_logs_retries_when_partition_is_dropped()
+    test_concurrent_migration_copies_each_row_once()
+    test_maintenance_does_not_vacuum_online()
+    print("データベースログのテストが成功しました")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+実行ジャーナルのテスト
+止まった実行だけを引き継ぎ、他のスレッド・プロセスで動いている実行は
+引き継がないこと、引き継いだ実行が途中のアイテムから再開すること、
+生成した画像をデータベースに入れずファイルとメディアIDで記録することを確認する。
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from media_buffer import MediaBuffer
+from run_journal import ItemState, RunJournal
+
+
+def _set_run(db_path, run_id, **fields):
+    conn = sqlite3.connect(db_path)
+    columns = ", ".join(f"{key} = ?" for key in fields)
+    conn.execute(f"UPDATE runs SET {columns} WHERE run_id = ?", (*fields.values(), run_id))
+    conn.commit()
+    conn.close()
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_live_run_is_not_shared():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        # 手動実行とスケジュール実行が同じ投稿設定を同時に開始した場合
+        manual = RunJournal(db_path).start_run("1")
+        scheduled = RunJournal(db_path).start_run("1")
+        assert not scheduled.resumed
+        assert scheduled.run_id != manual.run_id
+        # 別のホストで動いている実行も引き継がない
+        _set_run(db_path, manual.run_id, owner="other-host:1")
+        _set_run(db_path, scheduled.run_id, owner="other-host:2")
+        assert not RunJournal(db_path).start_run("1").resumed
+
+
+def test_stale_run_is_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        journal = RunJournal(db_path)
+        run = journal.start_run("1")
+        entry = run.entry({"content_id": "abc001", "title": "作品"})
+        entry.mark(ItemState.POST_CREATED, post_id=10)
+        run.set_offset(101)
+        stale = (datetime.now() - timedelta(seconds=RunJournal.HEARTBEAT_TIMEOUT + 1)).isoformat()
+        _set_run(db_path, run.run_id, owner="other-host:1", heartbeat_at=stale)
+
+        resumed = RunJournal(db_path).start_run("1")
+        assert resumed.resumed and resumed.run_id == run.run_id
+        assert resumed.offset == 101
+        [unfinished] = resumed.unfinished_entries()
+        assert unfinished.content_id == "abc001" and unfinished.post_id == 10
+        # 引き継いだ実行は新しい所有者のものになり、他からは引き継げない
+        assert not RunJournal(db_path).start_run("1").resumed
+
+
+def test_run_of_dead_process_is_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        journal = RunJournal(db_path)
+        run = journal.start_run("1")
+        _set_run(db_path, run.run_id, owner=f"{journal.owner.rpartition(':')[0]}:{_dead_pid()}")
+        resumed = RunJournal(db_path).start_run("1")
+        if os.name != "nt":
+            assert resumed.resumed and resumed.run_id == run.run_id
+
+
+def test_legacy_run_without_owner_is_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        run = RunJournal(db_path).start_run("1")
+        _set_run(db_path, run.run_id, owner=None, heartbeat_at=None)
+        assert RunJournal(db_path).start_run("1").run_id == run.run_id
+
+
+def test_finished_run_is_not_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        journal = RunJournal(db_path)
+        run = journal.start_run("1")
+        run.finish()
+        _set_run(db_path, run.run_id, heartbeat_at=None)
+        assert not journal.start_run("1").resumed
+
+
+def test_rendered_media_is_not_stored_in_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        journal = RunJournal(db_path)
+        run = journal.start_run("1")
+        entry = run.entry({"content_id": "abc001", "title": "作品"})
+        media = MediaBuffer(spool_threshold=4)
+        media.write(b"image-bytes")
+        entry.mark_rendered("タイトル", "本文", media, "abc001.jpg")
+
+        conn = sqlite3.connect(db_path)
+        media_bytes, media_path = conn.execute("SELECT media_bytes, media_path FROM items").fetchone()
+        conn.close()
+        assert media_bytes is None
+        assert os.path.dirname(media_path) == journal.media_dir and media_path.endswith(".jpg")
+        title, content, loaded, name = entry.rendered()
+        assert (title, content, loaded.read(), name) == ("タイトル", "本文", b"image-bytes", "abc001.jpg")
+
+        # アップロード後はメディアIDだけを残し、ファイルを削除する
+        entry.mark_media_uploaded(55)
+        assert not os.path.exists(media_path)
+        stale = (datetime.now() - timedelta(seconds=RunJournal.HEARTBEAT_TIMEOUT + 1)).isoformat()
+        _set_run(db_path, run.run_id, heartbeat_at=stale)
+        [resumed] = RunJournal(db_path).start_run("1").unfinished_entries()
+        assert resumed.media_id == 55
+        assert resumed.rendered()[2] is None
+
+
+def test_legacy_media_blob_is_still_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "run_journal.db")
+        run = RunJournal(db_path).start_run("1")
+        entry = run.entry({"content_id": "abc001"})
+        entry.mark_rendered("タイトル", "本文", None, None)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE items SET media_bytes = ?, media_name = 'a.jpg'", (b"old",))
+        conn.commit()
+        conn.close()
+        assert entry.rendered()[2].read() == b"old"
+        entry.mark(ItemState.MEDIA_ATTACHED)
+        assert entry.rendered()[2] is None
+
+
+if __name__ == "__main__":
+    test_live_run_is_not_shared()
+    test_stale_run_is_resumed()
+    test_run_of_dead_process_is_resumed()
+    test_legacy_run_without_owner_is_resumed()
+    test_finished_run_is_not_resumed()
+    test_rendered_media_is_not_stored_in_database()
+    test_legacy_media_blob_is_still_read()
+    print("実行ジャーナルのテストが成功しました")
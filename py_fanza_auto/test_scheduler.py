@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+時間別スケジュールのテスト
+並列に実行したスロットが前後して終わっても、実行中のスロットを終了済みとして
+記録しないこと（再起動後に再実行されること）、前回の実行が継続中でスキップした
+スロットの記録、自動監視の停止で従来のスケジュールが残ることを一時ファイルで確認する。
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import schedule
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from scheduler import HourlyScheduleConfig, ScheduleState, Scheduler
+
+
+class _BlockingEngine:
+    """投稿設定ごとに、テストから終了させるまで実行を止めておくエンジンの代わり"""
+
+    def __init__(self):
+        self.started = {}
+        self.release = {}
+        self._lock = threading.Lock()
+
+    def event(self, table, setting):
+        with self._lock:
+            return table.setdefault(setting, threading.Event())
+
+    def run_once(self, post_setting, target_count=None):
+        self.event(self.started, post_setting).set()
+        self.event(self.release, post_setting).wait(10)
+        return []
+
+
+def _write_config(path, hours, number=None):
+    config = {"AUTO_ON": "on", "EXE_MIN": "0", "CATCHUP_POLICY": "all", "CATCHUP_GRACE_MIN": "600"}
+    for hour in hours:
+        config[f"h{hour:02d}"] = True
+        config[f"h{hour:02d}_number"] = number or str(hour)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+
+def _scheduler(tmp, engine, number=None):
+    scheduler = Scheduler(engine=engine)
+    config_file = os.path.join(tmp, "schedule_settings.json")
+    now = datetime.now()
+    slots = [now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=offset) for offset in (2, 1)]
+    _write_config(config_file, [slot.hour for slot in slots], number)
+    scheduler.hourly_config = HourlyScheduleConfig(config_file)
+    scheduler.state = ScheduleState(os.path.join(tmp, "schedule_state.json"))
+    scheduler.state.mark_fired(slots[0] - timedelta(minutes=30))
+    return scheduler, slots
+
+
+def _wait_done(scheduler):
+    scheduler._get_executor().shutdown(wait=True)
+    scheduler._executor = None
+
+
+def test_state_does_not_pass_running_slot():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schedule_state.json")
+        base = datetime(2024, 1, 1, 9)
+        state = ScheduleState(path)
+        state.mark_fired(base)
+        early, late = base + timedelta(hours=1), base + timedelta(hours=2)
+        state.mark_fired(late, pending_from=early)
+        assert state.last_fired == base
+        restarted = ScheduleState(path)
+        assert restarted.is_finished(late) and not restarted.is_finished(early)
+        restarted.mark_fired(early)
+        assert restarted.last_fired == late and not restarted.finished
+
+
+def test_later_slot_finishing_first_keeps_earlier_slot():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _BlockingEngine()
+        scheduler, (early, late) = _scheduler(tmp, engine)
+        scheduler._fire_hourly()
+        for slot in (early, late):
+            assert engine.event(engine.started, str(slot.hour)).wait(5)
+
+        # 後のスロットが先に終わっても、前のスロットは未終了のまま
+        engine.event(engine.release, str(late.hour)).set()
+        for _ in range(100):
+            if scheduler.state.is_finished(late):
+                break
+            threading.Event().wait(0.05)
+        restarted = ScheduleState(scheduler.state.state_file)
+        assert restarted.is_finished(late)
+        assert not restarted.is_finished(early)
+        # 異常終了して再起動した場合は、前のスロットだけを再実行する
+        rescheduled = Scheduler(engine=engine)
+        rescheduled.hourly_config = scheduler.hourly_config
+        rescheduled.state = restarted
+        assert [slot for slot, _ in rescheduled._unfinished_slots(restarted.last_fired, datetime.now())] == [early]
+
+        engine.event(engine.release, str(early.hour)).set()
+        _wait_done(scheduler)
+        assert scheduler.state.last_fired == late
+        assert not scheduler.state.finished
+
+
+def test_overlap_skip_is_recorded():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _BlockingEngine()
+        # 2つのスロットが同じ投稿設定を使う
+        scheduler, (early, late) = _scheduler(tmp, engine, number="1")
+        scheduler._fire_hourly()
+        assert engine.event(engine.started, "1").wait(5)
+        # 後のスロットは前の実行が継続中のためスキップとして記録し、実行したことにはしない
+        assert scheduler.skipped_slots == {late: {"1": "前回の実行が継続中"}}
+        assert scheduler.state.is_finished(late)
+        assert not scheduler.state.is_finished(early)
+        assert scheduler.state.last_fired < early
+
+        engine.event(engine.release, "1").set()
+        _wait_done(scheduler)
+        assert scheduler.state.last_fired == late
+
+
+def test_pause_hourly_keeps_legacy_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler, _ = _scheduler(tmp, _BlockingEngine())
+        job = schedule.every().day.at("03:00").do(lambda: None)
+        try:
+            scheduler._rebuild_timers()
+            assert {key for _, key, _ in scheduler.timers.pop_due(datetime.now() + timedelta(days=2))} == {"hourly", "legacy"}
+            scheduler.pause_hourly()
+            scheduler._rebuild_timers()
+            assert job in schedule.get_jobs()
+            assert [key for _, key, _ in scheduler.timers.pop_due(datetime.now() + timedelta(days=2))] == ["legacy"]
+            scheduler._fire_hourly()
+            assert scheduler._executor is None
+        finally:
+            schedule.cancel_job(job)
+
+
+if __name__ == "__main__":
+    test_state_does_not_pass_running_slot()
+    test_later_slot_finishing_first_keeps_earlier_slot()
+    test_overlap_skip_is_recorded()
+    test_pause_hourly_keeps_legacy_jobs()
+    print("時間別スケジュールのテストが成功しました")
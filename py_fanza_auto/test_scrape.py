@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+詳細ページの抽出のテスト
+商品情報のJSONの短い説明文をそのまま使うこと、HTMLを少しずつ解析した場合と
+最後まで解析した場合で結果が変わらないこと、説明文と画像の抽出を必要な画像が
+集まった時点で打ち切っても同じ結果になることを確認する。
+"""
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from scrape import extract_description_and_images, extract_specific_elements
+
+LONG_TEXT = "長い本文です。" * 40
+
+PAGE_WITH_JSON = f"""
+<html><head>
+<script type="application/ld+json">{{"@type": "Product", "description": "短い説明"}}</script>
+</head><body>
+<div class="detail-area">{LONG_TEXT}</div>
+<div id="review">レビュー本文</div>
+</body></html>
+"""
+
+PAGE_WITHOUT_JSON = f"""
+<html><body>
+<p class="tx-productComment">商品の説明</p>
+<div class="detail-area">{LONG_TEXT}</div>
+<div id="review">レビュー本文</div>
+{"<p>埋め草</p>" * 2000}
+</body></html>
+"""
+
+
+def test_short_json_description_is_used_as_is():
+    for streaming in (True, False):
+        description, review = extract_specific_elements(PAGE_WITH_JSON, profile="test", streaming=streaming)
+        assert description == "短い説明"
+        assert review == "レビュー本文"
+
+
+def test_streaming_matches_full_parse():
+    for html in (PAGE_WITH_JSON, PAGE_WITHOUT_JSON):
+        assert extract_specific_elements(html, profile="test", streaming=True) == \
+            extract_specific_elements(html, profile="test", streaming=False)
+
+
+PAGE_WITH_IMAGES = f"""
+<html><body>
+<p class="mg-b20">作品の説明</p>
+{"".join(f'<img src="https://example.com/sample-{i}js.jpg">' for i in range(5))}
+<img src="https://example.com/banner.gif">
+{"<p>埋め草</p>" * 2000}
+</body></html>
+"""
+
+
+def test_description_and_images_stop_early():
+    text, large, small = extract_description_and_images(PAGE_WITH_IMAGES, max_images=3)
+    assert text == "作品の説明"
+    assert small == [f"https://example.com/sample-{i}js.jpg" for i in range(3)]
+    assert large == [f"https://example.com/sample-{i}jp.jpg" for i in range(3)]
+    # 打ち切らない場合は全画像を集める
+    full_text, full_large, full_small = extract_description_and_images(PAGE_WITH_IMAGES)
+    assert full_text == text and full_small[:3] == small and len(full_small) == 5
+
+
+if __name__ == "__main__":
+    test_short_json_description_is_used_as_is()
+    test_streaming_matches_full_parse()
+    test_description_and_images_stop_early()
+    print("詳細ページの抽出のテストが成功しました")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スラッグ生成のテスト
+かな・全角英数字の変換、同じ名前から常に同じスラッグになること、
+ローマ字にできない名前同士が同じスラッグにならないことを確認する。
+"""
+
+import hashlib
+import sys
+import unicodedata
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from category_manager import make_slug, MAX_SLUG_LENGTH
+
+
+def test_kana_and_ascii_are_converted():
+    assert make_slug("さくら") == "sakura"
+    assert make_slug("サクラ") == "sakura"
+    assert make_slug("ナナミー") == "nanami"
+    assert make_slug("あい・うえ") == "ai-ue"
+    assert make_slug("ＡＢＣ　123") == "abc-123"
+    assert make_slug("Hello,  World!") == "hello-world"
+    assert make_slug("") == ""
+
+
+def test_slug_is_stable():
+    # キャッシュに依存せず、プロセスをまたいでも同じ値になる（ハッシュはsha1で求める）
+    name = "山田花子"
+    digest = hashlib.sha1(unicodedata.normalize("NFKC", name).encode("utf-8")).hexdigest()[:8]
+    assert make_slug(name) == digest
+    make_slug.cache_clear()
+    assert make_slug(name) == digest
+    assert make_slug("さくら山田") == f"sakura-{hashlib.sha1('さくら山田'.encode('utf-8')).hexdigest()[:8]}"
+
+
+def test_unmapped_names_do_not_collide():
+    names = ["山田花子", "山田太郎", "さくら山田", "さくら田中"]
+    slugs = [make_slug(name) for name in names]
+    assert len(set(slugs)) == len(names)
+    # ローマ字の部分は残し、末尾にハッシュを付ける
+    assert slugs[2].startswith("sakura-") and slugs[3].startswith("sakura-")
+
+
+def test_long_names_are_truncated():
+    assert len(make_slug("a" * 500)) == MAX_SLUG_LENGTH
+    slug = make_slug("a" * 500 + "漢")
+    assert len(slug) == MAX_SLUG_LENGTH + 9
+    assert slug != make_slug("a" * 500 + "字")
+
+
+if __name__ == "__main__":
+    test_kana_and_ascii_are_converted()
+    test_slug_is_stable()
+    test_unmapped_names_do_not_collide()
+    test_long_names_are_truncated()
+    print("スラッグ生成のテストが成功しました")
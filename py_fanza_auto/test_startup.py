@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間のテスト
+cli.py の once/test 実行に必要なモジュールの読み込みで、Chrome（selenium）や
+APSchedulerなどの重いモジュールが読み込まれないこと、読み込み時間が目安以内であることを確認する。
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+
+# cli + engine の読み込み時間の目安（秒）
+IMPORT_BUDGET_SEC = 1.0
+
+# 実際に使うときだけ読み込むモジュール
+LAZY_MODULES = ["selenium", "webdriver_manager", "apscheduler", "browser"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import cli, engine
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(m.split(".")[0] for m in sys.modules)}))
+"""
+
+
+def _probe():
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=str(project_root),
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_heavy_modules_are_lazy():
+    modules = set(_probe()["modules"])
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    assert not loaded, f"起動時に読み込まれたモジュール: {loaded}"
+
+
+def test_import_time_budget():
+    # 初回はバイトコードの作成などで遅くなるため、数回の最小値で判定する
+    elapsed = min(_probe()["elapsed"] for _ in range(3))
+    print(f"cli + engine の読み込み時間: {elapsed:.3f}秒（目安 {IMPORT_BUDGET_SEC}秒）")
+    assert elapsed < IMPORT_BUDGET_SEC
+
+
+if __name__ == "__main__":
+    test_heavy_modules_are_lazy()
+    test_import_time_budget()
+    print("起動時間のテストが成功しました")
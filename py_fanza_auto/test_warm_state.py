@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動スナップショットのテスト
+削除された投稿のスラッグを忘れること、既存タームがスナップショットにない場合に
+タームの一覧を取得し直すこと、タームをスラッグ付きで作成することを一時ファイルで確認する。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from category_manager import make_slug
+from taxonomy import TaxonomyBatcher
+from warm_state import WarmState
+
+
+class _TermSite:
+    """iter_terms・create_termだけを持つWordPressの代わり（termsは {名前: ID}、スラッグは名前から求める）"""
+
+    def __init__(self, terms, slugs=None):
+        self.terms = dict(terms)
+        self.slugs = {name: make_slug(name) for name in self.terms}
+        self.slugs.update(slugs or {})
+        self.listed = 0
+        self.created = []
+
+    def iter_terms(self, taxonomy):
+        self.listed += 1
+        for name, term_id in self.terms.items():
+            yield {"id": term_id, "name": name, "slug": self.slugs[name]}
+
+    def create_term(self, taxonomy, name, slug=None):
+        if name in self.terms:
+            return {"id": self.terms[name], "name": name, "term_exists": True}
+        self.created.append((name, slug))
+        self.terms[name] = max(self.terms.values(), default=0) + 1
+        self.slugs[name] = slug or name
+        return {"id": self.terms[name], "name": name, "slug": self.slugs[name]}
+
+
+def _snapshot(terms):
+    return {"slugs": {make_slug(name): term_id for name, term_id in terms.items()},
+            "names": dict(terms)}
+
+
+def test_forget_post_is_saved():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "warm_state.json")
+        state = WarmState(path)
+        state.remember_post("abc001", 10)
+        state.remember_post("abc002", 11)
+        state.save()
+        state.forget_post("abc001")
+        state.forget_post("unknown")
+        state.save()
+        reloaded = WarmState(path)
+        assert reloaded.known_post("abc001") is None
+        assert reloaded.known_post("abc002") == 11
+
+
+def test_stale_term_snapshot_is_reloaded():
+    site = _TermSite({"old": 1, "added elsewhere": 7})
+    batcher = TaxonomyBatcher(site)
+    # スナップショットには削除済みのID 3 があり、別の場所で作成されたタームがない
+    batcher.load_snapshot({"tags": _snapshot({"old": 1, "deleted": 3})})
+    assert batcher.ids_for("tags", ["old", "added elsewhere"]) == [1, 7]
+    assert site.listed == 1
+    assert "tags" in batcher.fetched
+    assert batcher.snapshot()["tags"] == _snapshot({"old": 1, "added elsewhere": 7})
+
+
+def test_new_terms_keep_snapshot():
+    site = _TermSite({"old": 1})
+    batcher = TaxonomyBatcher(site)
+    batcher.load_snapshot({"tags": _snapshot({"old": 1})})
+    assert batcher.ids_for("tags", ["old", "new"]) == [1, 2]
+    assert site.listed == 0
+    assert "tags" not in batcher.fetched
+
+
+def test_terms_are_created_with_slug():
+    # スラッグを指定せずに作成された既存のタームは名前で見つける
+    site = _TermSite({"既存": 1}, slugs={"既存": "%e6%97%a2%e5%ad%98"})
+    batcher = TaxonomyBatcher(site)
+    assert batcher.ids_for("tags", ["既存", "さくら", ("ナナミ", "actress-nanami")]) == [1, 2, 3]
+    assert site.created == [("さくら", make_slug("さくら")), ("ナナミ", "actress-nanami")]
+    # 作成したタームはスラッグで保持し、二重に作成しない
+    assert batcher.snapshot()["tags"]["slugs"]["actress-nanami"] == 3
+    assert batcher.ids_for("tags", [("ナナミ", "actress-nanami"), "さくら"]) == [3, 2]
+    assert len(site.created) == 2 and site.listed == 1
+
+
+def test_legacy_term_snapshot_is_ignored():
+    # 名前だけをキーにしていた以前の形式は読み込まず、一覧を取得し直す
+    site = _TermSite({"old": 1})
+    batcher = TaxonomyBatcher(site)
+    batcher.load_snapshot({"tags": {"old": 1}})
+    assert batcher.ids_for("tags", ["old"]) == [1]
+    assert site.listed == 1 and not site.created
+
+
+if __name__ == "__main__":
+    test_forget_post_is_saved()
+    test_stale_term_snapshot_is_reloaded()
+    test_new_terms_keep_snapshot()
+    test_terms_are_created_with_slug()
+    test_legacy_term_snapshot_is_ignored()
+    print("起動スナップショットのテストが成功しました")
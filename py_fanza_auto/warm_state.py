@@ -0,0 +1,124 @@
+"""
+起動時に読み込む状態のスナップショット
+フロア一覧・カテゴリ/タグのID・投稿済みスラッグを1つのファイルに保存し、
+次のプロセスの起動時に読み込む。短時間で終わるcron実行でも、これらを
+取得し直さずにすぐ投稿を始められる。
+
+コンポーネントごとに有効期限（TTL）を持ち、期限を過ぎたものもMAX_STALE以内なら
+そのまま使って、起動後にバックグラウンドで取得し直す。
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+DEFAULT_WARM_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "warm_state.json")
+
+# ファイル形式のバージョン（変えた場合は古いスナップショットを読み込まない）
+WARM_STATE_VERSION = 1
+
+# コンポーネントごとの有効期限（秒）
+DEFAULT_TTLS = {
+    "floors": 24 * 3600,
+    "terms": 6 * 3600,
+    "posted_slugs": 24 * 3600,
+}
+
+# 期限切れでも取得し直すまでの間は使う上限（秒）
+MAX_STALE = 7 * 24 * 3600
+
+
+class WarmState:
+    """起動時に読み込む状態のスナップショット（複数スレッドから使える）"""
+
+    def __init__(self, path: Optional[str] = None, ttls: Optional[Dict[str, float]] = None):
+        self.path = path or DEFAULT_WARM_STATE_FILE
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict[str, Any]] = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != WARM_STATE_VERSION:
+                    print(f"起動スナップショットのバージョンが異なるため使用しません: {data.get('version')}")
+                    return {}
+                return data.get("components", {})
+        except Exception as e:
+            print(f"起動スナップショット読み込みエラー: {e}")
+        return {}
+
+    def get(self, component: str) -> Tuple[Optional[Any], bool]:
+        """(データ, 有効期限内か) を返す（ない場合やMAX_STALEを過ぎた場合はデータがNone）"""
+        with self._lock:
+            entry = self._components.get(component)
+        if not entry:
+            return None, False
+        age = time.time() - entry.get("saved_at", 0)
+        if age > MAX_STALE:
+            return None, False
+        return entry.get("data"), age <= self.ttls.get(component, 0)
+
+    def put(self, component: str, data: Any, fetched: bool = True):
+        """データを記録（fetched=Falseの場合は取得し直したものではないので、保存時刻を引き継ぐ）"""
+        with self._lock:
+            entry = self._components.get(component)
+            saved_at = entry.get("saved_at", time.time()) if entry and not fetched else time.time()
+            self._components[component] = {"saved_at": saved_at, "data": data}
+            self._dirty = True
+
+    def known_post(self, slug: str) -> Optional[int]:
+        """投稿済みとして記録したスラッグの投稿ID（期限切れや未記録はNone）"""
+        with self._lock:
+            entry = self._components.get("posted_slugs")
+            record = entry["data"].get(slug) if entry else None
+        if not record:
+            return None
+        post_id, recorded_at = record
+        if time.time() - recorded_at > self.ttls["posted_slugs"]:
+            return None
+        return post_id
+
+    def remember_post(self, slug: str, post_id: int):
+        """投稿済みのスラッグを記録"""
+        if not slug or not post_id:
+            return
+        with self._lock:
+            entry = self._components.setdefault("posted_slugs", {"saved_at": time.time(), "data": {}})
+            entry["data"][slug] = [post_id, time.time()]
+            self._dirty = True
+
+    def forget_post(self, slug: str):
+        """記録したスラッグを削除（WordPress側で投稿が削除・ゴミ箱移動されていた場合）"""
+        with self._lock:
+            entry = self._components.get("posted_slugs")
+            if entry and entry["data"].pop(slug, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """変更があればファイルに保存（期限切れの投稿済みスラッグは削除）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            posted = self._components.get("posted_slugs")
+            if posted:
+                ttl = self.ttls["posted_slugs"]
+                posted["data"] = {slug: record for slug, record in posted["data"].items() if now - record[1] <= ttl}
+                posted["saved_at"] = now
+            data = {"version": WARM_STATE_VERSION, "components": self._components}
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                temp_file = self.path + ".tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.path)
+                self._dirty = False
+            except Exception as e:
+                print(f"起動スナップショット保存エラー: {e}")
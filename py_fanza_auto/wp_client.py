@@ -1,32 +1,69 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional, List
+from typing import Any, BinaryIO, Dict, Iterator, Optional, List, Sequence, Tuple, Union
 import base64
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from category_manager import make_slug
+from concurrency import budget
+import metrics_exporter
+from wp_transport import WPTransport
+
+
+def _record_response(response: requests.Response, *args, **kwargs) -> None:
+    """レスポンスごとにメトリクスを記録（requestsのフック）"""
+    method = response.request.method if response.request is not None else ""
+    metrics_exporter.wp_requests.inc(method, str(response.status_code))
+    metrics_exporter.wp_request_seconds.observe(response.elapsed.total_seconds(), method)
+
+
+HOOKS = {"response": _record_response}
+
+
+# 一覧取得で返すフィールド（本文などの重いフィールドは含めない）
+POST_LIST_FIELDS = ("id", "slug", "title", "date", "modified", "link", "status")
 
 
 class WordPressClient:
-    def __init__(self, base_url: str, username: str, application_password: str, timeout: int = 30) -> None:
+    def __init__(self, base_url: str, username: str, application_password: str, timeout: int = 30,
+                 http2: bool = False) -> None:
         self.base_url = base_url.rstrip('/')
         self.timeout = timeout
+        # 接続はリクエスト間で使い回す（http2=TrueでHTTP/2、使えなければHTTP/1.1）
+        self.http = WPTransport(http2=http2)
         token = f"{username}:{application_password}".encode("utf-8")
         self.headers = {
             "Authorization": "Basic " + base64.b64encode(token).decode("utf-8"),
         }
 
-    def create_post(self, title: str, content: str, status: str = "publish", slug: Optional[str] = None, excerpt: Optional[str] = None) -> Dict[str, Any]:
+    def create_post(self, title: str, content: str, status: str = "publish", slug: Optional[str] = None, excerpt: Optional[str] = None,
+                    categories: Optional[List[int]] = None, tags: Optional[List[int]] = None) -> Dict[str, Any]:
+        data = self.post_data(title, content, status, slug, excerpt, categories, tags)
+        url = f"{self.base_url}/wp-json/wp/v2/posts"
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=self.headers, json=data, timeout=self.timeout, hooks=HOOKS)
+        res.raise_for_status()
+        return res.json()
+
+    @staticmethod
+    def post_data(title: str, content: str, status: str = "publish", slug: Optional[str] = None, excerpt: Optional[str] = None,
+                  categories: Optional[List[int]] = None, tags: Optional[List[int]] = None) -> Dict[str, Any]:
+        """投稿作成のデータを作成（非同期クライアントと共通）"""
         data: Dict[str, Any] = {"title": title, "content": content, "status": status}
         if slug:
             data["slug"] = slug
         if excerpt is not None:
             data["excerpt"] = excerpt
-        url = f"{self.base_url}/wp-json/wp/v2/posts"
-        res = requests.post(url, headers=self.headers, json=data, timeout=self.timeout)
-        res.raise_for_status()
-        return res.json()
+        # カテゴリ・タグは作成時にまとめて割り当てる
+        if categories:
+            data["categories"] = categories
+        if tags:
+            data["tags"] = tags
+        return data
 
     def get_post_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
         url = f"{self.base_url}/wp-json/wp/v2/posts"
-        res = requests.get(url, headers=self.headers, params={"slug": slug}, timeout=self.timeout)
+        res = self.http.get(url, headers=self.headers, params={"slug": slug}, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         data = res.json()
         if isinstance(data, list) and data:
@@ -37,7 +74,7 @@ class WordPressClient:
         """投稿IDで投稿を取得する"""
         url = f"{self.base_url}/wp-json/wp/v2/posts/{post_id}"
         try:
-            res = requests.get(url, headers=self.headers, timeout=self.timeout)
+            res = self.http.get(url, headers=self.headers, timeout=self.timeout, hooks=HOOKS)
             res.raise_for_status()
             return res.json()
         except requests.exceptions.HTTPError as e:
@@ -45,20 +82,38 @@ class WordPressClient:
                 return None
             raise
 
-    def upload_media(self, filename: str, bytes_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    def upload_media(self, filename: str, bytes_data: Union[bytes, BinaryIO], mime_type: Optional[str] = None) -> Dict[str, Any]:
+        """メディアをアップロードする
+
+        bytes_dataにはbytesのほか、MediaBufferなどのファイルオブジェクトも渡せる。
+        ファイルオブジェクトは先頭から読み出しながら送信するため、全体をメモリに載せない。
+        """
         url = f"{self.base_url}/wp-json/wp/v2/media"
+        if hasattr(bytes_data, "seek"):
+            # リトライなどで同じオブジェクトを再送する場合に備えて先頭に戻す
+            bytes_data.seek(0)
+        headers = self.media_headers(filename, mime_type)
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=headers, data=bytes_data, timeout=self.timeout, hooks=HOOKS)
+        res.raise_for_status()
+        return res.json()
+
+    def media_headers(self, filename: str, mime_type: Optional[str] = None) -> Dict[str, str]:
+        """メディアアップロードのヘッダーを作成（非同期クライアントと共通）"""
+        if not mime_type:
+            # 指定がなければファイル名から判定（不明な場合はJPEG）
+            mime_type = mimetypes.guess_type(filename)[0] or "image/jpeg"
         headers = dict(self.headers)
         headers.update({
             "Content-Disposition": f"attachment; filename={filename}",
             "Content-Type": mime_type,
         })
-        res = requests.post(url, headers=headers, data=bytes_data, timeout=self.timeout)
-        res.raise_for_status()
-        return res.json()
+        return headers
 
     def set_featured_media(self, post_id: int, media_id: int) -> Dict[str, Any]:
         url = f"{self.base_url}/wp-json/wp/v2/posts/{post_id}"
-        res = requests.post(url, headers=self.headers, json={"featured_media": media_id}, timeout=self.timeout)
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=self.headers, json={"featured_media": media_id}, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json()
 
@@ -66,28 +121,30 @@ class WordPressClient:
         """投稿を削除する"""
         url = f"{self.base_url}/wp-json/wp/v2/posts/{post_id}"
         params = {"force": force}
-        res = requests.delete(url, headers=self.headers, params=params, timeout=self.timeout)
+        with budget.wp_write_slot():
+            res = self.http.delete(url, headers=self.headers, params=params, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json()
 
     def update_post(self, post_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
         """投稿を更新する"""
         url = f"{self.base_url}/wp-json/wp/v2/posts/{post_id}"
-        res = requests.put(url, headers=self.headers, json=data, timeout=self.timeout)
+        with budget.wp_write_slot():
+            res = self.http.put(url, headers=self.headers, json=data, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json()
 
     def get_categories(self) -> List[Dict[str, Any]]:
         """カテゴリ一覧を取得する"""
         url = f"{self.base_url}/wp-json/wp/v2/categories"
-        res = requests.get(url, headers=self.headers, timeout=self.timeout)
+        res = self.http.get(url, headers=self.headers, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json()
 
     def get_tags(self) -> List[Dict[str, Any]]:
         """タグ一覧を取得する"""
         url = f"{self.base_url}/wp-json/wp/v2/tags"
-        res = requests.get(url, headers=self.headers, timeout=self.timeout)
+        res = self.http.get(url, headers=self.headers, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json()
 
@@ -101,7 +158,8 @@ class WordPressClient:
         # カテゴリが存在しない場合は作成
         url = f"{self.base_url}/wp-json/wp/v2/categories"
         data = {"name": category_name}
-        res = requests.post(url, headers=self.headers, json=data, timeout=self.timeout)
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=self.headers, json=data, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         return res.json().get('id')
 
@@ -120,7 +178,7 @@ class WordPressClient:
         print(f"WordPress API呼び出し: {url}")
         print(f"パラメータ: {params}")
         
-        res = requests.get(url, headers=self.headers, params=params, timeout=self.timeout)
+        res = self.http.get(url, headers=self.headers, params=params, timeout=self.timeout, hooks=HOOKS)
         
         print(f"レスポンスステータス: {res.status_code}")
         if res.status_code != 200:
@@ -129,6 +187,98 @@ class WordPressClient:
         res.raise_for_status()
         return res.json()
 
+    def _get_post_page(self, params: Dict[str, Any], page: int) -> Tuple[List[Dict[str, Any]], int, int]:
+        """投稿一覧の1ページを取得し、(投稿, 総ページ数, 総件数) を返す"""
+        url = f"{self.base_url}/wp-json/wp/v2/posts"
+        res = self.http.get(url, headers=self.headers, params=dict(params, page=page), timeout=self.timeout, hooks=HOOKS)
+        if res.status_code == 400 and page > 1:
+            # 取得中に投稿が減ってページがなくなった場合
+            return [], 0, 0
+        res.raise_for_status()
+        total_pages = int(res.headers.get("X-WP-TotalPages", 1) or 1)
+        total = int(res.headers.get("X-WP-Total", 0) or 0)
+        return res.json(), total_pages, total
+
+    def iter_post_pages(self, status: str = "publish", fields: Optional[Sequence[str]] = POST_LIST_FIELDS,
+                        per_page: int = 100, modified_after: Optional[str] = None,
+                        max_workers: int = 4) -> Iterator[Tuple[int, int, List[Dict[str, Any]]]]:
+        """全投稿をページ単位で順に返す（(ページ番号, 総ページ数, 投稿) のイテレータ）
+
+        1ページ目のX-WP-TotalPagesで総ページ数を調べ、残りのページはmax_workers件ずつ
+        並列に取得する。fieldsを指定すると_fieldsで返すフィールドを絞る（Noneなら全フィールド）。
+        modified_after（ISO8601）を指定すると、それ以降に更新された投稿だけを取得する。
+        """
+        params: Dict[str, Any] = {"per_page": per_page, "orderby": "id", "order": "asc"}
+        if status:
+            params["status"] = status
+        if fields:
+            params["_fields"] = ",".join(fields)
+        if modified_after:
+            params["modified_after"] = modified_after
+
+        posts, total_pages, total = self._get_post_page(params, 1)
+        print(f"投稿一覧取得: 全{total}件 / {total_pages}ページ")
+        yield 1, total_pages, posts
+        if total_pages <= 1:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # 先読みするページ数をmax_workersに抑えて、ページ順に返す
+            pending = []
+            next_page = 2
+            while pending or next_page <= total_pages:
+                while next_page <= total_pages and len(pending) < max_workers:
+                    pending.append((next_page, executor.submit(self._get_post_page, params, next_page)))
+                    next_page += 1
+                page, future = pending.pop(0)
+                posts, _, _ = future.result()
+                yield page, total_pages, posts
+
+    def iter_posts(self, status: str = "publish", fields: Optional[Sequence[str]] = POST_LIST_FIELDS,
+                   per_page: int = 100, modified_after: Optional[str] = None,
+                   max_workers: int = 4) -> Iterator[Dict[str, Any]]:
+        """全投稿を1件ずつ返す（iter_post_pagesを参照）"""
+        for _, _, posts in self.iter_post_pages(status, fields, per_page, modified_after, max_workers):
+            yield from posts
+
+    def iter_terms(self, taxonomy: str, per_page: int = 100) -> Iterator[Dict[str, Any]]:
+        """カテゴリ・タグ（taxonomyは"categories"か"tags"）を全件返す（id・name・slugのみ）"""
+        url = f"{self.base_url}/wp-json/wp/v2/{taxonomy}"
+        params: Dict[str, Any] = {"per_page": per_page, "_fields": "id,name,slug", "hide_empty": "false"}
+        page = 1
+        while True:
+            res = self.http.get(url, headers=self.headers, params=dict(params, page=page), timeout=self.timeout, hooks=HOOKS)
+            if res.status_code == 400 and page > 1:
+                break
+            res.raise_for_status()
+            yield from res.json()
+            if page >= int(res.headers.get("X-WP-TotalPages", 1) or 1):
+                break
+            page += 1
+
+    def create_term(self, taxonomy: str, name: str, slug: Optional[str] = None) -> Dict[str, Any]:
+        """カテゴリ・タグを作成する（既に存在する場合は既存のIDを返す）
+
+        slugを省略した場合はmake_slugで名前から求める（同じ名前は常に同じスラッグになる）。
+        """
+        url = f"{self.base_url}/wp-json/wp/v2/{taxonomy}"
+        data: Dict[str, Any] = {"name": name}
+        slug = slug or make_slug(name)
+        if slug:
+            data["slug"] = slug
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=self.headers, json=data, timeout=self.timeout, hooks=HOOKS)
+        if res.status_code == 400:
+            # 同名のタームがある場合、エラーレスポンスに既存のIDが含まれる
+            try:
+                error = res.json()
+            except ValueError:
+                error = {}
+            if error.get("code") == "term_exists" and error.get("data", {}).get("term_id"):
+                return {"id": error["data"]["term_id"], "name": name, "term_exists": True}
+        res.raise_for_status()
+        return res.json()
+
     def get_or_create_tag(self, tag_name: str) -> int:
         """タグ名からIDを取得、存在しない場合は作成"""
         tags = self.get_tags()
@@ -139,7 +289,8 @@ class WordPressClient:
         # タグが存在しない場合は作成
         create_data = {"name": tag_name}
         url = f"{self.base_url}/wp-json/wp/v2/tags"
-        res = requests.post(url, headers=self.headers, json=create_data, timeout=self.timeout)
+        with budget.wp_write_slot():
+            res = self.http.post(url, headers=self.headers, json=create_data, timeout=self.timeout, hooks=HOOKS)
         res.raise_for_status()
         new_tag = res.json()
         return new_tag.get('id')
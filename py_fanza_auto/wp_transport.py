@@ -0,0 +1,170 @@
+"""
+WordPress REST APIへの接続（HTTP/2対応）
+WordPressClientのリクエストはすべてこの接続を経由し、接続をリクエスト間で使い回す。
+
+WP_HTTP2を有効にし、httpx（h2付き）がインストールされている場合はHTTP/2で接続し、
+一覧の並列取得・重複チェック・タームの作成など小さなリクエストを1本の接続に多重化する。
+サーバーがHTTP/2に対応していない場合はhttpxがHTTP/1.1で接続し、HTTP/2での接続自体に
+失敗した場合はrequestsのセッション（HTTP/1.1のkeep-alive接続）に切り替え、
+HTTP2_RETRY_COOLDOWN秒後にもう一度HTTP/2を試す。
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import timedelta
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpxのHTTP/2に必要
+except ImportError:
+    httpx = None
+
+
+# 接続プールの大きさ（一覧の並列取得数より大きくする）
+DEFAULT_POOL_SIZE = 8
+
+# HTTP/2の接続に失敗してからHTTP/2を試し直すまでの秒数
+HTTP2_RETRY_COOLDOWN = 300
+
+# 送信済みかもしれないリクエストをやり直してもよいメソッド
+# （POSTはWordPress側で投稿・メディアが作成済みの場合があるため、やり直さない）
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _no_cookies() -> DefaultCookiePolicy:
+    # アプリケーションパスワードで認証するため、Cookieは保存しない
+    # （ログインCookieが送られるとWordPressがnonceを要求する）
+    return DefaultCookiePolicy(allowed_domains=[])
+
+
+class Http2Response:
+    """httpxのレスポンスをrequestsと同じように扱うためのラッパー"""
+
+    def __init__(self, response: Any):
+        self._response = response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    @property
+    def elapsed(self) -> timedelta:
+        return self._response.elapsed
+
+    def raise_for_status(self):
+        if self._response.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self._response.status_code} Error: {self._response.url}", response=self)
+
+
+class WPTransport:
+    """WordPressへのHTTP接続（HTTP/2が使えない場合はHTTP/1.1に戻る）"""
+
+    def __init__(self, http2: bool = False, pool_size: int = DEFAULT_POOL_SIZE):
+        if http2 and httpx is None:
+            print("HTTP/2にはhttpx[http2]が必要です。HTTP/1.1で接続します")
+        self.http2 = bool(http2 and httpx is not None)
+        self.pool_size = max(1, pool_size)
+        self._lock = threading.Lock()
+        self._client = None
+        self._http2_retry_at = 0.0
+        self._session = requests.Session()
+        self._session.cookies.set_policy(_no_cookies())
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    @property
+    def protocol(self) -> str:
+        return "HTTP/2" if self._use_http2() else "HTTP/1.1"
+
+    def _use_http2(self) -> bool:
+        return self.http2 and time.monotonic() >= self._http2_retry_at
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+                self._client.cookies.jar.set_policy(_no_cookies())
+            return self._client
+
+    def _fallback(self, error: Exception):
+        """HTTP/2での接続に失敗したので、HTTP2_RETRY_COOLDOWN秒の間はHTTP/1.1を使う"""
+        with self._lock:
+            if time.monotonic() < self._http2_retry_at:
+                return
+            print(f"HTTP/2の接続エラーのため{HTTP2_RETRY_COOLDOWN}秒間HTTP/1.1に切り替えます: {error}")
+            self._http2_retry_at = time.monotonic() + HTTP2_RETRY_COOLDOWN
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def _http2_request(self, method: str, url: str, headers, params, json, data, timeout) -> Http2Response:
+        kwargs: Dict[str, Any] = {"headers": dict(headers or {}), "params": params, "json": json, "timeout": timeout}
+        if data is not None:
+            if hasattr(data, "iter_chunks"):
+                # MediaBufferは全体をメモリに載せずにチャンクごとに送信する
+                kwargs["headers"].setdefault("Content-Length", str(len(data)))
+                kwargs["content"] = data.iter_chunks()
+            elif hasattr(data, "read"):
+                kwargs["content"] = data.read()
+            else:
+                kwargs["content"] = data
+        return Http2Response(self._get_client().request(method, url, **kwargs))
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                params: Optional[Dict[str, Any]] = None, json: Any = None, data: Any = None,
+                timeout: float = 30, hooks: Optional[Dict[str, Callable]] = None):
+        """リクエストを送信（requestsと同じ引数・同じように使えるレスポンス）"""
+        if self._use_http2():
+            try:
+                response = self._http2_request(method, url, headers, params, json, data, timeout)
+                for hook in _as_list((hooks or {}).get("response")):
+                    hook(response)
+                return response
+            except (httpx.ConnectError, httpx.ProtocolError) as e:
+                self._fallback(e)
+                # 接続できなかった場合は未送信なのでHTTP/1.1でやり直す。接続後のプロトコルエラーは
+                # 送信済みの可能性があるため、やり直してよいメソッドだけやり直す
+                if not isinstance(e, httpx.ConnectError) and method.upper() not in IDEMPOTENT_METHODS:
+                    raise requests.exceptions.ConnectionError(f"{e}: {url}") from e
+                if data is not None and hasattr(data, "seek"):
+                    data.seek(0)
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(f"{e}: {url}") from e
+            except httpx.TransportError as e:
+                raise requests.exceptions.ConnectionError(f"{e}: {url}") from e
+        return self._session.request(method, url, headers=headers, params=params, json=json, data=data,
+                                     timeout=timeout, hooks=hooks)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+        self._session.close()
+
+
+def _as_list(value) -> List[Callable]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]